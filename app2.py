@@ -10,10 +10,19 @@ from flask import Flask, request, jsonify, render_template, send_from_directory,
 from flask_cors import CORS
 
 # Import your modules
-from chat_working import chat_with_agent, redis_memory
-from tools.product_search_tool import ProductSearchTool
-from conversation_db import ConversationDB
-from memory_utils import MemoryTracker, check_memory_limit, log_memory_usage
+from chat_working import chat_with_agent, redis_memory, initialize_redis
+from tools.product_search_tool import product_search_instance
+from tools.search_result_cache import search_result_cache
+from tools.search_terms_conditions import tc_search_tool
+from tools.policy_answer_cache import policy_answer_cache
+from tools.policy_refinement import policy_refinements, start_background_refinement
+from tools.embedding_service import get_embedding_service
+from tools.spell_corrector import get_spell_corrector
+from conversation_db import conversation_db
+from startup import register_component, warm_up, is_ready, startup_report
+from memory_utils import MemoryTracker, check_memory_limit, log_memory_usage, get_memory_breakdown
+from preload import shared_state_report
+from worker_pools import pool_stats
 
 from flask import after_this_request
 # Create Flask app
@@ -56,8 +65,7 @@ def set_security_headers(response):
 #     response.headers["X-Frame-Options"] = "SAMEORIGIN"
 #     return response
 
-# Initialize conversation database
-conversation_db = ConversationDB()
+# Conversation database is the shared instance from conversation_db.py
 
 # Configure logging for production
 logging.basicConfig(
@@ -66,8 +74,17 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Initialize tools
-search_tool = ProductSearchTool()
+# Reuse the tool instance created by the search module so the embedding model is loaded only once
+search_tool = product_search_instance
+
+# Heavy components load lazily; warm-up initializes them concurrently ahead of traffic
+# (triggered per worker from gunicorn.conf.py, or directly when run with python app2.py)
+register_component("embedding_model", lambda: get_embedding_service().warm_up())
+register_component("product_index", search_tool.ensure_initialized)
+register_component("policy_index", tc_search_tool.ensure_initialized, required=False)
+register_component("policy_refinement", start_background_refinement, required=False)
+register_component("spell_corrector", get_spell_corrector, required=False)
+register_component("redis", initialize_redis, required=False)
 
 
 # ---------- Routes ---------- #
@@ -89,10 +106,18 @@ def health():
         redis_memory.redis_client.ping()
         pinecone_status = "connected" if search_tool.is_available else "disconnected"
         return jsonify({
-            "status": "healthy",
+            "status": "healthy" if is_ready() else "starting",
+            "ready": is_ready(),
+            "startup": startup_report(),
             "service": "Lotus Electronics Chatbot",
             "redis": "connected",
             "search_methods": {"pinecone_vector": pinecone_status},
+            "embedding": get_embedding_service().stats(),
+            "search_cache": search_result_cache.stats(),
+            "policy_answers": policy_answer_cache.stats(tc_search_tool.corpus_version()),
+            "policy_refinements": policy_refinements.stats(),
+            "worker_pools": pool_stats(),
+            "memory": {**get_memory_breakdown(), "preload": shared_state_report()},
             "active_users": len(redis_memory.get_active_users())
         })
     except Exception as e:
@@ -472,6 +497,41 @@ def admin_export_conversations():
         logger.exception("Error exporting conversations")
         return jsonify({"success": False, "message": str(e)}), 500
 
+@app.route("/admin/api/policy-cache")
+@admin_required
+def admin_policy_cache():
+    try:
+        return jsonify({"success": True, "cache": policy_answer_cache.stats(tc_search_tool.corpus_version())})
+    except Exception as e:
+        logger.exception("Error getting policy cache stats")
+        return jsonify({"success": False, "message": str(e)}), 500
+
+@app.route("/admin/api/policy-cache/invalidate", methods=["POST"])
+@admin_required
+def admin_policy_cache_invalidate():
+    try:
+        generation = policy_answer_cache.invalidate()
+        if generation is None:
+            return jsonify({"success": False, "message": "Redis is unavailable"}), 503
+        logger.info(f"Policy answer cache invalidated by {session.get('admin_username')}")
+        return jsonify({"success": True, "generation": generation})
+    except Exception as e:
+        logger.exception("Error invalidating policy cache")
+        return jsonify({"success": False, "message": str(e)}), 500
+
+@app.route("/admin/api/policy-cache/rebuild", methods=["POST"])
+@admin_required
+def admin_policy_cache_rebuild():
+    try:
+        result = tc_search_tool.rebuild_answer_cache()
+        if not result.get("success"):
+            return jsonify({"success": False, "message": result.get("error")}), 503
+        logger.info(f"Policy answer cache rebuilt by {session.get('admin_username')}: {result['built']}")
+        return jsonify(result)
+    except Exception as e:
+        logger.exception("Error rebuilding policy cache")
+        return jsonify({"success": False, "message": str(e)}), 500
+
 @app.route("/admin/api/export/logs")
 @admin_required
 def admin_export_logs():
@@ -511,6 +571,7 @@ def admin_export_logs():
 # ---------- Entrypoint ---------- #
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 8001))
+    warm_up()
     app.run(host="0.0.0.0", port=port, debug=True)
 
 # from werkzeug.middleware.dispatcher import DispatcherMiddleware
@@ -6,10 +6,12 @@ from langgraph.checkpoint.memory import InMemorySaver
 from collections import deque
 from datetime import datetime, timedelta
 import json
+import time
 import redis
 import pickle
 from langchain.chat_models import init_chat_model
-from conversation_db import ConversationDB, DatabaseLogHandler
+from conversation_db import conversation_db, DatabaseLogHandler  # shared instance, created once
+from worker_pools import run_in_pool
 import re
 from typing import Annotated
 from typing_extensions import TypedDict
@@ -17,9 +19,6 @@ from typing_extensions import TypedDict
 from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import add_messages
 
-# Initialize conversation database
-conversation_db = ConversationDB()
-
 # Setup logging with database handler
 logger = logging.getLogger(__name__)
 if not logger.handlers:
@@ -46,6 +45,8 @@ class AgentState(TypedDict):
     number_of_steps: int
     user_id: str
 
+REDIS_RETRY_SECONDS = 30  # after a failed health check, skip Redis this long before pinging again
+
 class RedisMemory:
     """Redis-based memory for storing user conversations and authentication state with TTL."""
     
@@ -66,6 +67,7 @@ class RedisMemory:
             decode_responses=False
         )
         self.ttl_seconds = ttl_seconds
+        self._unavailable_until = 0.0
         
     def get_user_messages(self, user_id: str) -> list:
         """Retrieve user's message history from Redis."""
@@ -135,12 +137,15 @@ class RedisMemory:
             return []
     
     def test_connection(self) -> bool:
-        """Test Redis connection health."""
+        """Test Redis connection health; after a failure, report unavailable for REDIS_RETRY_SECONDS."""
+        if time.time() < self._unavailable_until:
+            return False
         try:
             self.redis_client.ping()
             return True
         except Exception as e:
-            print(f"❌ Redis connection test failed: {type(e).__name__}: {e}")
+            self._unavailable_until = time.time() + REDIS_RETRY_SECONDS
+            print(f"❌ Redis connection test failed: {type(e).__name__}: {e} (retrying in {REDIS_RETRY_SECONDS}s)")
             return False
     
     def set_user_auth_state(self, user_id: str, state: str, phone_number: str = None):
@@ -177,46 +182,18 @@ class RedisMemory:
         except Exception as e:
             print(f"Error clearing auth state for user {user_id}: {e}")
 
-# Initialize Redis memory with improved error handling
+# Initialize Redis memory lazily: redis.Redis() does not connect until first use, and every
+# RedisMemory method already degrades gracefully when the server is unreachable.
 def initialize_redis():
-    """Initialize Redis with proper error handling."""
-    try:
-        redis_memory = RedisMemory(ttl_seconds=1800)  # 30 minutes TTL
-        
-        # Test Redis connection
-        if redis_memory.test_connection():
-            print("✅ Redis connected successfully!")
-            return redis_memory
-        else:
-            print("❌ Redis connection test failed")
-            return None
-            
-    except redis.ConnectionError as e:
-        print(f"❌ Redis connection failed: {e}")
-        print("💡 Please make sure Redis server is running on localhost:6379")
-        print("🚀 Start Redis using: redis-server")
-        return None
-    except Exception as e:
-        print(f"❌ Redis initialization failed: {type(e).__name__}: {e}")
-        print("💡 Please check your Redis installation and configuration")
-        return None
-
-# Try to initialize Redis, but don't exit if it fails
-redis_memory = initialize_redis()
-if not redis_memory:
+    """Check the Redis connection (run during startup warm-up)."""
+    if redis_memory.test_connection():
+        print("✅ Redis connected successfully!")
+        return True
     print("⚠️  Running without Redis memory - conversations won't be persistent")
-    # Create a fallback memory class that doesn't use Redis
-    class FallbackMemory:
-        def get_user_messages(self, user_id: str) -> list: return []
-        def add_message_to_user(self, user_id: str, message): pass
-        def save_user_messages(self, user_id: str, messages: list): pass
-        def clear_user_messages(self, user_id: str): pass
-        def get_active_users(self) -> list: return []
-        def test_connection(self) -> bool: return False
-        def set_user_auth_state(self, user_id: str, state: str, phone_number: str = None): pass
-        def get_user_auth_state(self, user_id: str) -> dict: return {'state': 'new', 'phone_number': None}
-        def clear_user_auth(self, user_id: str): pass
-    redis_memory = FallbackMemory()
+    print("💡 Please make sure Redis server is running on localhost:6379")
+    return False
+
+redis_memory = RedisMemory(ttl_seconds=1800)  # 30 minutes TTL
 
 from langchain_core.tools import tool
 from geopy.geocoders import Nominatim
@@ -247,6 +224,9 @@ class SearchInput(BaseModel):
 
 # Import the new product search tool
 from tools.product_search_tool import search_products
+from tools.search_cursor import search_session
+from tools.query_intent import parse_query_intent, has_search_hints, format_intent_hint
+from tools.policy_answer_cache import mentions_policy_intent
 # Import the store location tool
 from tools.get_nearby_store import get_near_store
 # Import the product details tool
@@ -347,23 +327,15 @@ SYSTEM_PROMPT = """
 You are a professional Sales Assistant for Lotus Electronics - helping customers find the perfect electronics products and providing excellent customer service in India.
 
 🧠 CONVERSATION MEMORY & CONTEXT:
-CRITICAL: Always remember what products you've already shown in this conversation!
-- Track previous searches and results
-- When user says "more", "show more", "other options" - provide DIFFERENT products
-- NEVER repeat the same search query that already produced results
-- Analyze conversation history to understand what user has already seen
+- search_products results include search_metadata.next_cursor when more matching products exist
+- When user says "more", "show more", "other options" for the same request, call search_products with cursor=<that next_cursor>; the server returns new products and never repeats ones already shown
+- Start a new search only when the user changes product type, brand or budget
 
 OFFICIAL CONTACT INFORMATION:
 If any user asks for the official Lotus Electronics contact number, support, customer care, or how to reach Lotus Electronics, always provide:
 "You can call our official helpline at +91 9111300400 for any queries, support, or assistance. Our customer care team is ready to help you!"
 
 
-MEMORY TRACKING EXAMPLES:
-• If you showed OnePlus phones → next search Samsung, Xiaomi, Oppo, etc.
-• If you showed laptops under 50k → next search 50k-80k or different brands
-• If you showed 55" TVs → next search 43" or 65" TVs
-• If you showed gaming laptops → next search business/student laptops
-
 🚨 CRITICAL: ALWAYS RESPOND IN JSON FORMAT ONLY!
 You MUST respond with EXACTLY this JSON structure - NO plain text, NO markdown, NO additional formatting:
 
@@ -419,6 +391,9 @@ NEVER ignore topic changes - always switch immediately to the new product catego
 
 INTELLIGENT FALLBACK STRATEGIES:
 
+BRAND AND PRICE RANGE QUESTIONS:
+When the user asks which brands are available or what prices range from (e.g., "what brands do you have in ACs under 40k"), call search_products ONCE with include_facets=true and answer from its "facets" field (brand counts, min/max price, price buckets). Do not run a separate search per brand or price band.
+
 PRICE RANGE FALLBACK:
 When user asks for products in a specific price range and no products are found:
 1. Search for products in nearby price ranges (±20-30% of requested price)
@@ -540,6 +515,14 @@ PRICE PARSING EXAMPLES:
 - "smartphones above 45k" → search_products("smartphones", price_min=45000)
 - "laptops under 80k" → search_products("laptops", price_max=80000)
 
+PARSED SEARCH HINTS:
+A user message may end with a line like "[search hints: price_max=50000, category=Smartphones]".
+The server parsed it from the user's own words, so:
+- Pass price_min/price_max from the hints to search_products exactly as given
+- Use category and brand from the hints to build the search query
+- If the hints have a price but no category, take the product type from the conversation
+- Never mention or repeat the hints line to the user
+
 PRICE CONVERSION RULES:
 - "k" means thousands: 45k = 45000, 30k = 30000
 - "lakh" means 100000: 1 lakh = 100000, 2.5 lakh = 250000
@@ -613,18 +596,8 @@ NEVER say "Would you like to see" - ALWAYS show what you found immediately
 
 🚨 CONTEXT-AWARE "MORE" or "other product" HANDLING:
 When user says "more", "show more", "other options", etc.:
-1. ANALYZE conversation history to understand what they previously saw
-2. If they saw smartphones from specific brand(s), search for DIFFERENT brands
-3. If they saw laptops in one price range, search DIFFERENT price ranges
-4. If they saw TVs of one size, search DIFFERENT sizes
-5. AVOID repeating the same search query that produced previous results
-
-EXAMPLES:
-• Previous: "OnePlus smartphones" → Next: "Samsung OR Xiaomi OR Oppo smartphones"
-• Previous: "laptops under 50000" → Next: "laptops 50000 to 80000"
-• Previous: "55 inch TV" → Next: "43 inch OR 65 inch TV"
-
-NEVER run the same search twice in one conversation!
+1. If the last search_products result has search_metadata.next_cursor, call search_products with that cursor
+2. If there is no next_cursor (or the cursor expired), search a DIFFERENT brand, price range or size instead
 
 🚨 TOOL RESULT USAGE RULES:
 1. ONLY use product data that comes from tool results - NEVER generate or make up products
@@ -983,7 +956,9 @@ def call_tool(state: AgentState):
     for tool_call in state["messages"][-1].tool_calls:
         print(f"🛠️  Calling tool: {tool_call['name']} with args: {tool_call['args']}")
         # Get the tool by name
-        tool_result = tools_by_name[tool_call["name"]].invoke(tool_call["args"])
+        # The session lets search_products track shown products for "show more" cursors
+        with search_session(user_id):
+            tool_result = tools_by_name[tool_call["name"]].invoke(tool_call["args"])
         print(f"📋 Tool result length: {len(str(tool_result))} characters")
         
         tool_message = ToolMessage(
@@ -1365,6 +1340,651 @@ def display_user_stats(user_id: str):
     print(f"Active users: {len(redis_memory.get_active_users())}")
     print("-" * 30)
 
+# Response-extraction patterns, compiled once at import (before fork when preloaded)
+JSON_BLOCK_RE = re.compile(r'```json\s*(\{.*?\})\s*```', re.DOTALL)
+JSON_OBJECT_RE = re.compile(r'\{[^{}]*(?:\{[^{}]*\}[^{}]*)*\}', re.DOTALL)
+QUOTED_TEXT_RE = re.compile(r'"([^"]+)"')
+
+def format_agent_response(final_response, message: str) -> str:
+    """
+    Extract, validate and normalize the JSON payload from the final LLM response.
+
+    This is pure CPU work (regexes, JSON parsing, product post-processing), so
+    chat_with_agent runs it on the native "postprocess" pool instead of the gevent hub.
+    """
+    # Ensure final_response is a string
+    if not isinstance(final_response, str):
+        final_response = str(final_response) if final_response is not None else ""
+    
+    print(f"🔧 Raw final_response: {final_response[:200]}...")
+    
+    # Clean the response from any markdown formatting and extract JSON
+    clean_response = final_response.strip()
+    
+    # Handle cases where response contains both text and JSON
+    # Look for JSON block first
+    json_match = JSON_BLOCK_RE.search(clean_response)
+    if json_match:
+        clean_response = json_match.group(1).strip()
+        print("🔧 Extracted JSON from markdown block")
+    elif clean_response.startswith('```json'):
+        clean_response = clean_response.replace('```json', '').replace('```', '').strip()
+        print("🔧 Removed markdown formatting")
+    
+    # If response looks like an array or list, try to extract JSON from it
+    if clean_response.startswith('[') and clean_response.endswith(']'):
+        try:
+            # Parse as array and look for JSON string
+            response_array = json.loads(clean_response)
+            if isinstance(response_array, list):
+                for item in response_array:
+                    if isinstance(item, str):
+                        # Try to parse each string item as JSON
+                        try:
+                            if item.strip().startswith('{') and item.strip().endswith('}'):
+                                clean_response = item.strip()
+                                print("🔧 Extracted JSON from array")
+                                break
+                            elif '```json' in item:
+                                json_match = JSON_BLOCK_RE.search(item)
+                                if json_match:
+                                    clean_response = json_match.group(1).strip()
+                                    print("🔧 Extracted JSON from array item")
+                                    break
+                        except:
+                            continue
+        except:
+            pass
+    
+    # Final fallback - look for any JSON object in the response
+    if not (clean_response.startswith('{') and clean_response.endswith('}')):
+        json_match = JSON_OBJECT_RE.search(clean_response)
+        if json_match:
+            clean_response = json_match.group(0)
+            print("🔧 Extracted JSON using fallback regex")
+    
+    print(f"🔧 Clean response: {clean_response[:200]}...")
+    
+    try:
+        # Check if it's already valid JSON
+        parsed_json = json.loads(clean_response)
+        print(f"🔧 Initial parsing successful. Keys: {list(parsed_json.keys()) if isinstance(parsed_json, dict) else 'Not a dict'}")
+        
+    except json.JSONDecodeError as e:
+        print(f"❌ JSON parsing failed: {e}")
+        print(f"❌ Response that failed to parse: {clean_response[:500]}")
+        # Return a fallback response
+        return json.dumps({
+            "answer": "I found some information for you, but I'm having trouble formatting the response properly. Could you please rephrase your question?",
+            "products": [],
+            "product_details": {},
+            "stores": [],
+            "policy_info": {},
+            "comparison": {},
+            "authentication": {"message": "Ready to help"},
+            "end": "How else can I help you with Lotus Electronics products?"
+        })
+    
+    try:
+        # Handle deeply nested JSON structure from data.answer field
+        def parse_nested_structure(data_dict):
+            """Recursively parse nested JSON structures and product details output"""
+            if isinstance(data_dict, dict):
+                # Check for data.answer structure first (most complex nesting)
+                if 'data' in data_dict and isinstance(data_dict['data'], dict):
+                    data_content = data_dict['data']
+                    if 'answer' in data_content and isinstance(data_content['answer'], str):
+                        try:
+                            # Parse the nested JSON in data.answer
+                            nested_json = json.loads(data_content['answer'])
+                            if isinstance(nested_json, dict):
+                                # Recursively process any further nesting
+                                nested_json = parse_nested_structure(nested_json)
+                                return nested_json
+                        except (json.JSONDecodeError, TypeError) as e:
+                            print(f"🔧 Failed to parse data.answer as JSON: {e}")
+                    # If data.answer parsing fails, return the data content
+                    return data_content
+                
+                # Check for direct answer field with nested JSON
+                if 'answer' in data_dict and isinstance(data_dict['answer'], str):
+                    try:
+                        # Try to parse answer as JSON first
+                        nested_json = json.loads(data_dict['answer'])
+                        if isinstance(nested_json, dict):
+                            # Recursively process the nested JSON
+                            nested_json = parse_nested_structure(nested_json)
+                            return nested_json
+                    except (json.JSONDecodeError, TypeError) as e:
+                        print(f"🔧 Failed to parse direct answer as JSON: {e}")
+                
+                # Process product_details output field if present at any level
+                if 'product_details' in data_dict and isinstance(data_dict['product_details'], dict):
+                    if 'output' in data_dict['product_details']:
+                        try:
+                            import ast
+                            output_str = data_dict['product_details']['output']
+                            print(f"🔧 Parsing product_details output: {output_str[:100]}...")
+                            product_details_obj = ast.literal_eval(output_str)
+                            data_dict['product_details'] = product_details_obj
+                            print(f"✅ Successfully parsed product details")
+                        except (ValueError, SyntaxError) as e:
+                            print(f"❌ Error parsing product details output: {e}")
+                            # If parsing fails, keep the original structure
+                            pass
+            
+            return data_dict
+        
+        # Apply nested structure parsing
+        print(f"🔧 Original response structure: {list(parsed_json.keys()) if isinstance(parsed_json, dict) else type(parsed_json)}")
+        parsed_json = parse_nested_structure(parsed_json)
+        print(f"🔧 Final response structure: {list(parsed_json.keys()) if isinstance(parsed_json, dict) else type(parsed_json)}")
+
+        # --- Product Comparison Table Enhancement ---
+        # If a comparison field exists, fill the table with actual values from product_details/specs
+        try:
+            if isinstance(parsed_json, dict) and 'comparison' in parsed_json and isinstance(parsed_json['comparison'], dict):
+                comparison = parsed_json['comparison']
+                products = comparison.get('products', [])
+                table = comparison.get('table', [])
+                criteria = comparison.get('criteria', [])
+                print(f"🔧 Found comparison section with {len(products)} products, {len(criteria)} criteria, {len(table)} table rows")
+            else:
+                # Initialize variables if comparison section doesn't exist
+                products = []
+                table = []
+                criteria = []
+                print(f"🔧 No comparison section found in response, skipping table processing")
+            
+            # Ensure table is a list and all items are dictionaries
+            if not isinstance(table, list):
+                table = []
+            
+            # Check if table needs to be filled - only process if table is empty or has invalid structure
+            table_needs_filling = False
+            if not table:
+                table_needs_filling = True
+            else:
+                try:
+                    # Check if all rows are dictionaries and mostly empty/dashes
+                    table_needs_filling = all(
+                        isinstance(row, dict) and 
+                        all((v == '-' or v == '' or v is None) for k, v in row.items() if k != 'feature')
+                        for row in table
+                    )
+                except (AttributeError, TypeError):
+                    # If any row is not a dict or has other issues, rebuild the table
+                    table_needs_filling = True
+            
+            # If table needs filling and we have products and criteria
+            if products and criteria and table_needs_filling:
+                print(f"🔧 Building comparison table for {len(products)} products with {len(criteria)} criteria")
+                print(f"🔧 Products: {[p.get('product_name', 'Unknown') for p in products if isinstance(p, dict)]}")
+                print(f"🔧 Criteria: {criteria}")
+                
+                # Build a mapping: {product_name: {feature: value}}
+                prod_map = {}
+                for prod in products:
+                    if not isinstance(prod, dict):
+                        continue
+                    pname = prod.get('product_name') or prod.get('product_id')
+                    if not pname:
+                        continue
+                    
+                    print(f"🔧 Processing product: {pname}")
+                    prod_map[pname] = {}
+                    
+                    # Extract basic product information
+                    if 'product_mrp' in prod:
+                        prod_map[pname]['Price'] = prod['product_mrp']
+                        prod_map[pname]['MRP'] = prod['product_mrp']
+                    
+                    # Extract features as individual specs
+                    if 'features' in prod and isinstance(prod['features'], list):
+                        for i, feature in enumerate(prod['features']):
+                            if isinstance(feature, str):
+                                # Use feature as both key and value
+                                prod_map[pname][feature] = '✔'
+                                # Also create numbered feature entries
+                                prod_map[pname][f'Feature {i+1}'] = feature
+                    
+                    # Try to get specs from product_specification
+                    specs = prod.get('product_specification') or []
+                    if isinstance(specs, list):
+                        for spec in specs:
+                            if isinstance(spec, dict):
+                                if 'fkey' in spec and 'fvalue' in spec:
+                                    fkey = spec['fkey']
+                                    fvalue = spec['fvalue']
+                                    # Handle cases where fkey might be a list or other type
+                                    if isinstance(fkey, str):
+                                        key = fkey.strip()
+                                    elif isinstance(fkey, list):
+                                        key = str(fkey[0]).strip() if fkey else ""
+                                    else:
+                                        key = str(fkey).strip()
+                                    
+                                    # Handle cases where fvalue might be a list or other type
+                                    if isinstance(fvalue, str):
+                                        value = fvalue
+                                    elif isinstance(fvalue, list):
+                                        value = str(fvalue[0]) if fvalue else ""
+                                    else:
+                                        value = str(fvalue)
+                                    
+                                    if key:  # Only add if key is not empty
+                                        prod_map[pname][key] = value
+                                # Also try other common spec field names
+                                elif 'name' in spec and 'value' in spec:
+                                    name_val = spec['name']
+                                    value_val = spec['value']
+                                    if isinstance(name_val, str) and isinstance(value_val, str):
+                                        prod_map[pname][name_val] = value_val
+                                elif 'specification' in spec and 'detail' in spec:
+                                    spec_val = spec['specification']
+                                    detail_val = spec['detail']
+                                    if isinstance(spec_val, str) and isinstance(detail_val, str):
+                                        prod_map[pname][spec_val] = detail_val
+                    
+                    # Extract info from product name and features dynamically
+                    product_name_lower = pname.lower()
+                    
+                    # Dynamic RAM extraction - look for any number followed by "gb ram"
+                    import re
+                    ram_patterns = [
+                        r'(\d+)\s*gb\s*ram',
+                        r'\((\d+)gb\s*ram',
+                        r'(\d+)gb\s*ram\)',
+                        r'(\d+)\s*gb\s*(?:memory)',
+                    ]
+                    for pattern in ram_patterns:
+                        ram_match = re.search(pattern, product_name_lower)
+                        if ram_match:
+                            prod_map[pname]['RAM'] = f"{ram_match.group(1)}GB"
+                            break
+                    
+                    # Dynamic Storage extraction - look for any number followed by storage indicators
+                    storage_patterns = [
+                        r'(\d+)\s*gb\s*(?:storage|rom)',
+                        r'\((\d+)gb\s*(?:storage|rom)',
+                        r'(\d+)gb\s*(?:storage|rom)\)',
+                        r'(\d+)\s*gb\s*(?:internal)',
+                    ]
+                    for pattern in storage_patterns:
+                        storage_match = re.search(pattern, product_name_lower)
+                        if storage_match:
+                            prod_map[pname]['Storage'] = f"{storage_match.group(1)}GB"
+                            break
+                    
+                    # Dynamic Brand extraction - extract first word that looks like a brand
+                    brand_match = re.search(r'^(\w+)', pname)
+                    if brand_match:
+                        potential_brand = brand_match.group(1)
+                        # Only consider it a brand if it's not a common tech word
+                        tech_words = ['android', 'smartphone', 'mobile', 'phone', 'device']
+                        if potential_brand.lower() not in tech_words:
+                            prod_map[pname]['Brand'] = potential_brand.title()
+                    
+                    # Dynamic Model extraction - try to extract meaningful model info
+                    # Remove brand and common words to get model
+                    model_text = pname
+                    common_words = ['android', 'smartphone', 'mobile', 'phone', 'gb', 'ram', 'storage', 'rom']
+                    for word in common_words:
+                        model_text = re.sub(rf'\b{word}\b', '', model_text, flags=re.IGNORECASE)
+                    
+                    # Extract what looks like a model (letters + numbers)
+                    model_match = re.search(r'([a-zA-Z]+\s*\d+[a-zA-Z]*(?:\s+[a-zA-Z]+)?)', model_text)
+                    if model_match:
+                        prod_map[pname]['Model'] = model_match.group(1).strip().title()
+                    
+                    # Dynamic connectivity detection
+                    if '5g' in product_name_lower:
+                        prod_map[pname]['Connectivity'] = '5G'
+                    elif '4g' in product_name_lower:
+                        prod_map[pname]['Connectivity'] = '4G'
+                    
+                    # Extract from features array dynamically
+                    if 'features' in prod and isinstance(prod['features'], list):
+                        for feature in prod['features']:
+                            if isinstance(feature, str):
+                                feature_lower = feature.lower()
+                                
+                                # Look for processor/chipset info
+                                if any(chip in feature_lower for chip in ['snapdragon', 'mediatek', 'exynos', 'dimensity', 'bionic']):
+                                    prod_map[pname]['Processor'] = feature
+                                
+                                # Look for camera info
+                                if 'mp' in feature_lower or 'camera' in feature_lower:
+                                    prod_map[pname]['Camera'] = feature
+                                
+                                # Look for display info
+                                if any(display in feature_lower for display in ['display', 'screen', 'oled', 'amoled', 'lcd']):
+                                    prod_map[pname]['Display'] = feature
+                                
+                                # Look for battery info
+                                if 'mah' in feature_lower or 'battery' in feature_lower:
+                                    prod_map[pname]['Battery'] = feature
+                                
+                                # Look for OS info
+                                if 'android' in feature_lower or 'ios' in feature_lower:
+                                    prod_map[pname]['OS'] = feature
+                    
+                    # Add price (always available)
+                    if 'product_mrp' in prod and prod['product_mrp']:
+                        prod_map[pname]['Price'] = prod['product_mrp']
+                    
+                    # Add warranty info if available
+                    if 'warranty' in prod and prod['warranty']:
+                        prod_map[pname]['Warranty'] = prod['warranty']
+                    
+                    print(f"🔧 Product map for {pname}: {list(prod_map[pname].keys())}")
+                    print(f"🔧 Values: {prod_map[pname]}")
+                
+                # Build the table with actual data
+                new_table = []
+                for feature in criteria:
+                    if not isinstance(feature, str):
+                        continue
+                    row = {'feature': feature}
+                    
+                    for prod in products:
+                        if not isinstance(prod, dict):
+                            continue
+                        pname = prod.get('product_name') or prod.get('product_id')
+                        if pname:
+                            # Try to find the feature value
+                            val = prod_map.get(pname, {}).get(feature, '-')
+                            
+                            # If not found, try case-insensitive matching
+                            if val == '-':
+                                feature_lower = feature.lower()
+                                for key, value in prod_map.get(pname, {}).items():
+                                    if key.lower() == feature_lower:
+                                        val = value
+                                        break
+                            
+                            # If still not found, try partial matching
+                            if val == '-':
+                                for key, value in prod_map.get(pname, {}).items():
+                                    if feature_lower in key.lower() or key.lower() in feature_lower:
+                                        val = value
+                                        break
+                            
+                            row[pname] = val if val not in [None, ''] else '-'
+                    new_table.append(row)
+                
+                # If all values are still dashes, create a dynamic comparison with available info
+                if all(all(v == '-' for k, v in row.items() if k != 'feature') for row in new_table):
+                    print("🔧 All values are dashes, creating dynamic comparison")
+                    new_table = []
+                    
+                    # Dynamically determine what features are available across all products
+                    all_available_features = set()
+                    for prod in products:
+                        if isinstance(prod, dict):
+                            pname = prod.get('product_name') or prod.get('product_id')
+                            if pname and pname in prod_map:
+                                all_available_features.update(prod_map[pname].keys())
+                    
+                    print(f"🔧 Available features across products: {all_available_features}")
+                    
+                    # If no features found in prod_map, create a basic comparison with what we have
+                    if not all_available_features:
+                        print("🔧 No features found in prod_map, creating basic comparison")
+                        basic_features = ['Price', 'Brand', 'Model']
+                        for feature in basic_features:
+                            row = {'feature': feature}
+                            for prod in products:
+                                if isinstance(prod, dict):
+                                    pname = prod.get('product_name', 'Unknown Product')
+                                    if feature == 'Price':
+                                        row[pname] = prod.get('product_mrp', '-')
+                                    elif feature == 'Brand':
+                                        # Extract brand from product name (first word)
+                                        import re
+                                        brand_match = re.search(r'^(\w+)', pname)
+                                        row[pname] = brand_match.group(1).title() if brand_match else '-'
+                                    elif feature == 'Model':
+                                        # Use product name as model
+                                        row[pname] = pname[:50] + '...' if len(pname) > 50 else pname
+                                    else:
+                                        row[pname] = '-'
+                            new_table.append(row)
+                    else:
+                        # Prioritize features based on importance
+                        feature_priority = [
+                            'Price', 'Brand', 'RAM', 'Storage', 'Model', 'Connectivity', 
+                            'Processor', 'Camera', 'Display', 'Battery', 'OS', 'Warranty'
+                        ]
+                        
+                        # Create comparison with available features in priority order
+                        for feature in feature_priority:
+                            if feature in all_available_features:
+                                row = {'feature': feature}
+                                has_data = False
+                                for prod in products:
+                                    if not isinstance(prod, dict):
+                                        continue
+                                    pname = prod.get('product_name') or prod.get('product_id')
+                                    if pname:
+                                        val = prod_map.get(pname, {}).get(feature, '-')
+                                        row[pname] = val
+                                        if val != '-':
+                                            has_data = True
+                                if has_data:
+                                    new_table.append(row)
+                        
+                        # Add any remaining features not in priority list
+                        remaining_features = all_available_features - set(feature_priority)
+                        for feature in sorted(remaining_features):
+                            row = {'feature': feature}
+                            has_data = False
+                            for prod in products:
+                                if not isinstance(prod, dict):
+                                    continue
+                                pname = prod.get('product_name') or prod.get('product_id')
+                                if pname:
+                                    val = prod_map.get(pname, {}).get(feature, '-')
+                                    row[pname] = val
+                                    if val != '-':
+                                        has_data = True
+                            if has_data:
+                                new_table.append(row)
+                
+                parsed_json['comparison']['table'] = new_table
+                print(f"🔧 Created comparison table with {len(new_table)} rows")
+                # Debug: Show actual keys in the table
+                if new_table:
+                    print(f"🔧 Sample table row keys: {list(new_table[0].keys())}")
+                    print(f"🔧 Expected product names: {[p.get('product_name', 'Unknown') for p in products]}")
+
+            # Post-process comparison table to fix key mismatches
+            if isinstance(parsed_json, dict) and 'comparison' in parsed_json and isinstance(parsed_json['comparison'], dict):
+                comparison = parsed_json['comparison']
+                if 'table' in comparison and 'products' in comparison:
+                    table = comparison['table']
+                    products = comparison['products']
+                    
+                    if isinstance(table, list) and isinstance(products, list) and table and products:
+                        print("🔧 Post-processing comparison table to fix key mismatches")
+                        
+                        # Create mapping from partial names to full names
+                        name_mapping = {}
+                        for product in products:
+                            if isinstance(product, dict) and 'product_name' in product:
+                                full_name = product['product_name']
+                                # Create potential shortened versions
+                                words = full_name.split()
+                                for i in range(2, min(len(words), 8)):  # Try different lengths
+                                    partial_name = ' '.join(words[:i])
+                                    name_mapping[partial_name] = full_name
+                        
+                        print(f"🔧 Name mapping: {name_mapping}")
+                        
+                        # Fix the table keys
+                        fixed_table = []
+                        for row in table:
+                            if isinstance(row, dict):
+                                fixed_row = {'feature': row.get('feature', '')}
+                                for key, value in row.items():
+                                    if key != 'feature':
+                                        # Try to find the full name for this key
+                                        mapped_name = name_mapping.get(key, key)
+                                        fixed_row[mapped_name] = value
+                                fixed_table.append(fixed_row)
+                        
+                        parsed_json['comparison']['table'] = fixed_table
+                        print(f"🔧 Fixed comparison table keys. Sample row: {fixed_table[0] if fixed_table else 'No rows'}")
+
+        except Exception as e:
+            print(f"❌ Error in comparison table processing: {type(e).__name__}: {e}")
+            # Keep the original comparison structure if processing fails
+
+        # Ensure we have the expected structure - if it's missing top-level fields, try to extract them
+        if isinstance(parsed_json, dict):
+            # If we don't have expected keys, the LLM might have wrapped everything in a data field
+            expected_keys = {'answer', 'products', 'product_details', 'stores', 'end'}
+            current_keys = set(parsed_json.keys())
+            
+            if not any(key in current_keys for key in expected_keys):
+                print("⚠️  Response doesn't have expected structure. Trying to extract from nested fields...")
+                # Try to find the actual response structure in nested fields
+                if 'data' in parsed_json:
+                    parsed_json = parsed_json['data']
+                    print(f"🔧 Extracted from data field. New keys: {list(parsed_json.keys())}")
+
+        # Return properly formatted JSON
+        print(f"🔧 Final parsed_json before return: {str(parsed_json)[:300]}...")
+        print(f"🔧 Final parsed_json keys: {list(parsed_json.keys()) if isinstance(parsed_json, dict) else 'Not a dict'}")
+        
+        # Validate final response has required fields
+        if isinstance(parsed_json, dict):
+            if not parsed_json.get('answer'):
+                print("⚠️ Missing answer field, adding default")
+                parsed_json['answer'] = "I found some information for you."
+            if 'end' not in parsed_json:
+                parsed_json['end'] = "How else can I help you?"
+            
+            # Ensure we have the basic structure
+            required_fields = ['products', 'product_details', 'stores', 'policy_info', 'comparison', 'authentication']
+            for field in required_fields:
+                if field not in parsed_json:
+                    if field == 'authentication':
+                        parsed_json[field] = {"required": False, "step": "verified", "message": ""}
+                    elif field == 'comparison':
+                        parsed_json[field] = {"products": [], "criteria": [], "table": []}
+                    else:
+                        parsed_json[field] = [] if field in ['products', 'stores'] else {}
+        else:
+            print("⚠️ parsed_json is not a dict, creating fallback")
+            parsed_json = {
+                "answer": "Can you ask me again later? I'm being asked too many queries right now by users which is  more than usual, so I can't do that for you right now.",
+                "products": [],
+                "product_details": {},
+                "stores": [],
+                "policy_info": {},
+                "comparison": {"products": [], "criteria": [], "table": []},
+                "authentication": {"required": False, "step": "verified", "message": ""},
+                "end": "Please wait for some time and ask again."
+            }
+        
+        final_json = json.dumps(parsed_json, ensure_ascii=False, indent=2)
+        
+        # Final validation - ensure we're not returning empty content
+        if not final_json or final_json.strip() == "" or final_json == "{}":
+            print("⚠️ Final JSON is empty, using emergency fallback")
+            emergency_response = {
+                "answer": "Can you ask me again later? I'm being asked too many queries right now by users which is  more than usual, so I can't do that for you right now.",
+                "products": [],
+                "product_details": {},
+                "stores": [],
+                "policy_info": {},
+                "comparison": {"products": [], "criteria": [], "table": []},
+                "authentication": {"required": False, "step": "verified", "message": ""},
+                "end": "Please wait for some time and ask again. "
+            }
+            return json.dumps(emergency_response, ensure_ascii=False, indent=2)
+        
+        return final_json
+        
+    except json.JSONDecodeError as e:
+        print(f"🔧 JSON parsing failed: {e}")
+        print(f"🔧 Problematic response: {clean_response[:500]}...")
+        
+        # Try to extract meaningful content from the raw response
+        response_text = final_response
+        
+        # If response contains array-like structure, try to extract text
+        if '[' in response_text and ']' in response_text:
+            try:
+                # Look for quoted strings in the array
+                text_matches = QUOTED_TEXT_RE.findall(response_text)
+                if text_matches:
+                    # Use the first meaningful text that's not JSON
+                    for match in text_matches:
+                        if not match.strip().startswith('{') and len(match.strip()) > 10:
+                            response_text = match
+                            break
+            except:
+                pass
+        
+        # Create a proper JSON response from the extracted text
+        fallback_response = {
+            "answer": response_text if response_text else "Can you ask me again later? I'm being asked too many queries right now by users which is  more than usual, so I can't do that for you right now.",
+            "products": [],
+            "product_details": {},
+            "stores": [],
+            "policy_info": {},
+            "comparison": {},
+            "authentication": {"required": False, "step": "verified", "message": ""},
+            "end": " Please wait for some time and ask again. "
+        }
+        
+        return json.dumps(fallback_response, ensure_ascii=False, indent=2)
+        # Provide contextual responses based on user message
+        user_msg_lower = message.lower() if message else ""
+        
+        if any(greeting in user_msg_lower for greeting in ['hello', 'hi', 'hey', 'helo']):
+            fallback_response = {
+                "answer": "Hello! Welcome to Lotus Electronics! I'm here to help you find the perfect electronics products. What are you looking for today?",
+                "products": [],
+                "product_details": {},
+                "stores": [],
+                "policy_info": {},
+                "end": "I can help you find TVs, smartphones, laptops, home appliances, and more. What interests you?"
+            }
+        elif any(help_word in user_msg_lower for help_word in ['help', 'assist', 'support']):
+            fallback_response = {
+                "answer": "I'd be happy to help! I can assist you with finding products, getting detailed specifications, locating nearby stores, and checking availability.",
+                "products": [],
+                "product_details": {},
+                "stores": [],
+                "policy_info": {},
+                "end": "What would you like to explore - TVs, smartphones, laptops, or something else?"
+            }
+        elif any(thanks in user_msg_lower for thanks in ['thanks', 'thank you', 'thx']):
+            fallback_response = {
+                "answer": "You're welcome! I'm glad I could help.",
+                "products": [],
+                "product_details": {},
+                "stores": [],
+                "policy_info": {},
+                "end": "Is there anything else you'd like to know about our electronics collection?"
+            }
+        else:
+            # Generic fallback with the original response
+            fallback_response = {
+                "answer": clean_response if clean_response else "I understand. How can I help you with Lotus Electronics products?",
+                "products": [],
+                "product_details": {},
+                "stores": [],
+                "policy_info": {},
+                "end": "Are you looking for any specific electronics or need help finding a store?"
+            }
+        
+        return json.dumps(fallback_response, ensure_ascii=False, indent=2)
+
+
 def chat_with_agent(message: str, session_id: str = "default_session") -> str:
     """
     Chat with the Lotus Electronics agent for Flask integration.
@@ -1410,6 +2030,18 @@ def chat_with_agent(message: str, session_id: str = "default_session") -> str:
         # Create user message
         from langchain_core.messages import HumanMessage
         user_msg = HumanMessage(content=message)
+
+        # Price bounds, category and brand parsed up front reach the model as exact hints;
+        # memory keeps the message as the user typed it. Policy questions ("Can I return my
+        # phone?") get none unless they state a budget, so they are not steered to a product search,
+        # and a category alone is not injected into follow-ups ("compare the first two TVs")
+        intent = parse_query_intent(message)
+        if mentions_policy_intent(message) and not ("price_min" in intent or "price_max" in intent):
+            intent = {}
+        model_msg = user_msg
+        if has_search_hints(intent, message):
+            print(f"🎯 Parsed search hints: {intent}")
+            model_msg = HumanMessage(content=f"{message}\n\n{format_intent_hint(intent)}")
         
         # Load previous conversation context 
         previous_messages = []
@@ -1457,7 +2089,7 @@ def chat_with_agent(message: str, session_id: str = "default_session") -> str:
             final_context = final_context[:-1]  # Remove last human message to avoid human-human sequence
             print(f"📝 Adjusted sequence to avoid human-human: {[msg.type for msg in final_context]}")
         
-        all_messages = final_context + [user_msg]
+        all_messages = final_context + [model_msg]
         print(f"📝 Final message sequence: {[msg.type for msg in all_messages]}")
         
         inputs = {
@@ -1491,637 +2123,8 @@ def chat_with_agent(message: str, session_id: str = "default_session") -> str:
         
         # Clean and validate the response
         if final_response:
-            # Ensure final_response is a string
-            if not isinstance(final_response, str):
-                final_response = str(final_response) if final_response is not None else ""
-            
-            print(f"🔧 Raw final_response: {final_response[:200]}...")
-            
-            # Clean the response from any markdown formatting and extract JSON
-            clean_response = final_response.strip()
-            
-            # Handle cases where response contains both text and JSON
-            # Look for JSON block first
-            json_match = re.search(r'```json\s*(\{.*?\})\s*```', clean_response, re.DOTALL)
-            if json_match:
-                clean_response = json_match.group(1).strip()
-                print("🔧 Extracted JSON from markdown block")
-            elif clean_response.startswith('```json'):
-                clean_response = clean_response.replace('```json', '').replace('```', '').strip()
-                print("🔧 Removed markdown formatting")
-            
-            # If response looks like an array or list, try to extract JSON from it
-            if clean_response.startswith('[') and clean_response.endswith(']'):
-                try:
-                    # Parse as array and look for JSON string
-                    response_array = json.loads(clean_response)
-                    if isinstance(response_array, list):
-                        for item in response_array:
-                            if isinstance(item, str):
-                                # Try to parse each string item as JSON
-                                try:
-                                    if item.strip().startswith('{') and item.strip().endswith('}'):
-                                        clean_response = item.strip()
-                                        print("🔧 Extracted JSON from array")
-                                        break
-                                    elif '```json' in item:
-                                        json_match = re.search(r'```json\s*(\{.*?\})\s*```', item, re.DOTALL)
-                                        if json_match:
-                                            clean_response = json_match.group(1).strip()
-                                            print("🔧 Extracted JSON from array item")
-                                            break
-                                except:
-                                    continue
-                except:
-                    pass
-            
-            # Final fallback - look for any JSON object in the response
-            if not (clean_response.startswith('{') and clean_response.endswith('}')):
-                json_match = re.search(r'\{[^{}]*(?:\{[^{}]*\}[^{}]*)*\}', clean_response, re.DOTALL)
-                if json_match:
-                    clean_response = json_match.group(0)
-                    print("🔧 Extracted JSON using fallback regex")
-            
-            print(f"🔧 Clean response: {clean_response[:200]}...")
-            
-            try:
-                # Check if it's already valid JSON
-                parsed_json = json.loads(clean_response)
-                print(f"🔧 Initial parsing successful. Keys: {list(parsed_json.keys()) if isinstance(parsed_json, dict) else 'Not a dict'}")
-                
-            except json.JSONDecodeError as e:
-                print(f"❌ JSON parsing failed: {e}")
-                print(f"❌ Response that failed to parse: {clean_response[:500]}")
-                # Return a fallback response
-                return json.dumps({
-                    "answer": "I found some information for you, but I'm having trouble formatting the response properly. Could you please rephrase your question?",
-                    "products": [],
-                    "product_details": {},
-                    "stores": [],
-                    "policy_info": {},
-                    "comparison": {},
-                    "authentication": {"message": "Ready to help"},
-                    "end": "How else can I help you with Lotus Electronics products?"
-                })
-            
-            try:
-                # Handle deeply nested JSON structure from data.answer field
-                def parse_nested_structure(data_dict):
-                    """Recursively parse nested JSON structures and product details output"""
-                    if isinstance(data_dict, dict):
-                        # Check for data.answer structure first (most complex nesting)
-                        if 'data' in data_dict and isinstance(data_dict['data'], dict):
-                            data_content = data_dict['data']
-                            if 'answer' in data_content and isinstance(data_content['answer'], str):
-                                try:
-                                    # Parse the nested JSON in data.answer
-                                    nested_json = json.loads(data_content['answer'])
-                                    if isinstance(nested_json, dict):
-                                        # Recursively process any further nesting
-                                        nested_json = parse_nested_structure(nested_json)
-                                        return nested_json
-                                except (json.JSONDecodeError, TypeError) as e:
-                                    print(f"🔧 Failed to parse data.answer as JSON: {e}")
-                            # If data.answer parsing fails, return the data content
-                            return data_content
-                        
-                        # Check for direct answer field with nested JSON
-                        if 'answer' in data_dict and isinstance(data_dict['answer'], str):
-                            try:
-                                # Try to parse answer as JSON first
-                                nested_json = json.loads(data_dict['answer'])
-                                if isinstance(nested_json, dict):
-                                    # Recursively process the nested JSON
-                                    nested_json = parse_nested_structure(nested_json)
-                                    return nested_json
-                            except (json.JSONDecodeError, TypeError) as e:
-                                print(f"🔧 Failed to parse direct answer as JSON: {e}")
-                        
-                        # Process product_details output field if present at any level
-                        if 'product_details' in data_dict and isinstance(data_dict['product_details'], dict):
-                            if 'output' in data_dict['product_details']:
-                                try:
-                                    import ast
-                                    output_str = data_dict['product_details']['output']
-                                    print(f"🔧 Parsing product_details output: {output_str[:100]}...")
-                                    product_details_obj = ast.literal_eval(output_str)
-                                    data_dict['product_details'] = product_details_obj
-                                    print(f"✅ Successfully parsed product details")
-                                except (ValueError, SyntaxError) as e:
-                                    print(f"❌ Error parsing product details output: {e}")
-                                    # If parsing fails, keep the original structure
-                                    pass
-                    
-                    return data_dict
-                
-                # Apply nested structure parsing
-                print(f"🔧 Original response structure: {list(parsed_json.keys()) if isinstance(parsed_json, dict) else type(parsed_json)}")
-                parsed_json = parse_nested_structure(parsed_json)
-                print(f"🔧 Final response structure: {list(parsed_json.keys()) if isinstance(parsed_json, dict) else type(parsed_json)}")
-
-                # --- Product Comparison Table Enhancement ---
-                # If a comparison field exists, fill the table with actual values from product_details/specs
-                try:
-                    if isinstance(parsed_json, dict) and 'comparison' in parsed_json and isinstance(parsed_json['comparison'], dict):
-                        comparison = parsed_json['comparison']
-                        products = comparison.get('products', [])
-                        table = comparison.get('table', [])
-                        criteria = comparison.get('criteria', [])
-                        print(f"🔧 Found comparison section with {len(products)} products, {len(criteria)} criteria, {len(table)} table rows")
-                    else:
-                        # Initialize variables if comparison section doesn't exist
-                        products = []
-                        table = []
-                        criteria = []
-                        print(f"🔧 No comparison section found in response, skipping table processing")
-                    
-                    # Ensure table is a list and all items are dictionaries
-                    if not isinstance(table, list):
-                        table = []
-                    
-                    # Check if table needs to be filled - only process if table is empty or has invalid structure
-                    table_needs_filling = False
-                    if not table:
-                        table_needs_filling = True
-                    else:
-                        try:
-                            # Check if all rows are dictionaries and mostly empty/dashes
-                            table_needs_filling = all(
-                                isinstance(row, dict) and 
-                                all((v == '-' or v == '' or v is None) for k, v in row.items() if k != 'feature')
-                                for row in table
-                            )
-                        except (AttributeError, TypeError):
-                            # If any row is not a dict or has other issues, rebuild the table
-                            table_needs_filling = True
-                    
-                    # If table needs filling and we have products and criteria
-                    if products and criteria and table_needs_filling:
-                        print(f"🔧 Building comparison table for {len(products)} products with {len(criteria)} criteria")
-                        print(f"🔧 Products: {[p.get('product_name', 'Unknown') for p in products if isinstance(p, dict)]}")
-                        print(f"🔧 Criteria: {criteria}")
-                        
-                        # Build a mapping: {product_name: {feature: value}}
-                        prod_map = {}
-                        for prod in products:
-                            if not isinstance(prod, dict):
-                                continue
-                            pname = prod.get('product_name') or prod.get('product_id')
-                            if not pname:
-                                continue
-                            
-                            print(f"🔧 Processing product: {pname}")
-                            prod_map[pname] = {}
-                            
-                            # Extract basic product information
-                            if 'product_mrp' in prod:
-                                prod_map[pname]['Price'] = prod['product_mrp']
-                                prod_map[pname]['MRP'] = prod['product_mrp']
-                            
-                            # Extract features as individual specs
-                            if 'features' in prod and isinstance(prod['features'], list):
-                                for i, feature in enumerate(prod['features']):
-                                    if isinstance(feature, str):
-                                        # Use feature as both key and value
-                                        prod_map[pname][feature] = '✔'
-                                        # Also create numbered feature entries
-                                        prod_map[pname][f'Feature {i+1}'] = feature
-                            
-                            # Try to get specs from product_specification
-                            specs = prod.get('product_specification') or []
-                            if isinstance(specs, list):
-                                for spec in specs:
-                                    if isinstance(spec, dict):
-                                        if 'fkey' in spec and 'fvalue' in spec:
-                                            fkey = spec['fkey']
-                                            fvalue = spec['fvalue']
-                                            # Handle cases where fkey might be a list or other type
-                                            if isinstance(fkey, str):
-                                                key = fkey.strip()
-                                            elif isinstance(fkey, list):
-                                                key = str(fkey[0]).strip() if fkey else ""
-                                            else:
-                                                key = str(fkey).strip()
-                                            
-                                            # Handle cases where fvalue might be a list or other type
-                                            if isinstance(fvalue, str):
-                                                value = fvalue
-                                            elif isinstance(fvalue, list):
-                                                value = str(fvalue[0]) if fvalue else ""
-                                            else:
-                                                value = str(fvalue)
-                                            
-                                            if key:  # Only add if key is not empty
-                                                prod_map[pname][key] = value
-                                        # Also try other common spec field names
-                                        elif 'name' in spec and 'value' in spec:
-                                            name_val = spec['name']
-                                            value_val = spec['value']
-                                            if isinstance(name_val, str) and isinstance(value_val, str):
-                                                prod_map[pname][name_val] = value_val
-                                        elif 'specification' in spec and 'detail' in spec:
-                                            spec_val = spec['specification']
-                                            detail_val = spec['detail']
-                                            if isinstance(spec_val, str) and isinstance(detail_val, str):
-                                                prod_map[pname][spec_val] = detail_val
-                            
-                            # Extract info from product name and features dynamically
-                            product_name_lower = pname.lower()
-                            
-                            # Dynamic RAM extraction - look for any number followed by "gb ram"
-                            import re
-                            ram_patterns = [
-                                r'(\d+)\s*gb\s*ram',
-                                r'\((\d+)gb\s*ram',
-                                r'(\d+)gb\s*ram\)',
-                                r'(\d+)\s*gb\s*(?:memory)',
-                            ]
-                            for pattern in ram_patterns:
-                                ram_match = re.search(pattern, product_name_lower)
-                                if ram_match:
-                                    prod_map[pname]['RAM'] = f"{ram_match.group(1)}GB"
-                                    break
-                            
-                            # Dynamic Storage extraction - look for any number followed by storage indicators
-                            storage_patterns = [
-                                r'(\d+)\s*gb\s*(?:storage|rom)',
-                                r'\((\d+)gb\s*(?:storage|rom)',
-                                r'(\d+)gb\s*(?:storage|rom)\)',
-                                r'(\d+)\s*gb\s*(?:internal)',
-                            ]
-                            for pattern in storage_patterns:
-                                storage_match = re.search(pattern, product_name_lower)
-                                if storage_match:
-                                    prod_map[pname]['Storage'] = f"{storage_match.group(1)}GB"
-                                    break
-                            
-                            # Dynamic Brand extraction - extract first word that looks like a brand
-                            brand_match = re.search(r'^(\w+)', pname)
-                            if brand_match:
-                                potential_brand = brand_match.group(1)
-                                # Only consider it a brand if it's not a common tech word
-                                tech_words = ['android', 'smartphone', 'mobile', 'phone', 'device']
-                                if potential_brand.lower() not in tech_words:
-                                    prod_map[pname]['Brand'] = potential_brand.title()
-                            
-                            # Dynamic Model extraction - try to extract meaningful model info
-                            # Remove brand and common words to get model
-                            model_text = pname
-                            common_words = ['android', 'smartphone', 'mobile', 'phone', 'gb', 'ram', 'storage', 'rom']
-                            for word in common_words:
-                                model_text = re.sub(rf'\b{word}\b', '', model_text, flags=re.IGNORECASE)
-                            
-                            # Extract what looks like a model (letters + numbers)
-                            model_match = re.search(r'([a-zA-Z]+\s*\d+[a-zA-Z]*(?:\s+[a-zA-Z]+)?)', model_text)
-                            if model_match:
-                                prod_map[pname]['Model'] = model_match.group(1).strip().title()
-                            
-                            # Dynamic connectivity detection
-                            if '5g' in product_name_lower:
-                                prod_map[pname]['Connectivity'] = '5G'
-                            elif '4g' in product_name_lower:
-                                prod_map[pname]['Connectivity'] = '4G'
-                            
-                            # Extract from features array dynamically
-                            if 'features' in prod and isinstance(prod['features'], list):
-                                for feature in prod['features']:
-                                    if isinstance(feature, str):
-                                        feature_lower = feature.lower()
-                                        
-                                        # Look for processor/chipset info
-                                        if any(chip in feature_lower for chip in ['snapdragon', 'mediatek', 'exynos', 'dimensity', 'bionic']):
-                                            prod_map[pname]['Processor'] = feature
-                                        
-                                        # Look for camera info
-                                        if 'mp' in feature_lower or 'camera' in feature_lower:
-                                            prod_map[pname]['Camera'] = feature
-                                        
-                                        # Look for display info
-                                        if any(display in feature_lower for display in ['display', 'screen', 'oled', 'amoled', 'lcd']):
-                                            prod_map[pname]['Display'] = feature
-                                        
-                                        # Look for battery info
-                                        if 'mah' in feature_lower or 'battery' in feature_lower:
-                                            prod_map[pname]['Battery'] = feature
-                                        
-                                        # Look for OS info
-                                        if 'android' in feature_lower or 'ios' in feature_lower:
-                                            prod_map[pname]['OS'] = feature
-                            
-                            # Add price (always available)
-                            if 'product_mrp' in prod and prod['product_mrp']:
-                                prod_map[pname]['Price'] = prod['product_mrp']
-                            
-                            # Add warranty info if available
-                            if 'warranty' in prod and prod['warranty']:
-                                prod_map[pname]['Warranty'] = prod['warranty']
-                            
-                            print(f"🔧 Product map for {pname}: {list(prod_map[pname].keys())}")
-                            print(f"🔧 Values: {prod_map[pname]}")
-                        
-                        # Build the table with actual data
-                        new_table = []
-                        for feature in criteria:
-                            if not isinstance(feature, str):
-                                continue
-                            row = {'feature': feature}
-                            
-                            for prod in products:
-                                if not isinstance(prod, dict):
-                                    continue
-                                pname = prod.get('product_name') or prod.get('product_id')
-                                if pname:
-                                    # Try to find the feature value
-                                    val = prod_map.get(pname, {}).get(feature, '-')
-                                    
-                                    # If not found, try case-insensitive matching
-                                    if val == '-':
-                                        feature_lower = feature.lower()
-                                        for key, value in prod_map.get(pname, {}).items():
-                                            if key.lower() == feature_lower:
-                                                val = value
-                                                break
-                                    
-                                    # If still not found, try partial matching
-                                    if val == '-':
-                                        for key, value in prod_map.get(pname, {}).items():
-                                            if feature_lower in key.lower() or key.lower() in feature_lower:
-                                                val = value
-                                                break
-                                    
-                                    row[pname] = val if val not in [None, ''] else '-'
-                            new_table.append(row)
-                        
-                        # If all values are still dashes, create a dynamic comparison with available info
-                        if all(all(v == '-' for k, v in row.items() if k != 'feature') for row in new_table):
-                            print("🔧 All values are dashes, creating dynamic comparison")
-                            new_table = []
-                            
-                            # Dynamically determine what features are available across all products
-                            all_available_features = set()
-                            for prod in products:
-                                if isinstance(prod, dict):
-                                    pname = prod.get('product_name') or prod.get('product_id')
-                                    if pname and pname in prod_map:
-                                        all_available_features.update(prod_map[pname].keys())
-                            
-                            print(f"🔧 Available features across products: {all_available_features}")
-                            
-                            # If no features found in prod_map, create a basic comparison with what we have
-                            if not all_available_features:
-                                print("🔧 No features found in prod_map, creating basic comparison")
-                                basic_features = ['Price', 'Brand', 'Model']
-                                for feature in basic_features:
-                                    row = {'feature': feature}
-                                    for prod in products:
-                                        if isinstance(prod, dict):
-                                            pname = prod.get('product_name', 'Unknown Product')
-                                            if feature == 'Price':
-                                                row[pname] = prod.get('product_mrp', '-')
-                                            elif feature == 'Brand':
-                                                # Extract brand from product name (first word)
-                                                import re
-                                                brand_match = re.search(r'^(\w+)', pname)
-                                                row[pname] = brand_match.group(1).title() if brand_match else '-'
-                                            elif feature == 'Model':
-                                                # Use product name as model
-                                                row[pname] = pname[:50] + '...' if len(pname) > 50 else pname
-                                            else:
-                                                row[pname] = '-'
-                                    new_table.append(row)
-                            else:
-                                # Prioritize features based on importance
-                                feature_priority = [
-                                    'Price', 'Brand', 'RAM', 'Storage', 'Model', 'Connectivity', 
-                                    'Processor', 'Camera', 'Display', 'Battery', 'OS', 'Warranty'
-                                ]
-                                
-                                # Create comparison with available features in priority order
-                                for feature in feature_priority:
-                                    if feature in all_available_features:
-                                        row = {'feature': feature}
-                                        has_data = False
-                                        for prod in products:
-                                            if not isinstance(prod, dict):
-                                                continue
-                                            pname = prod.get('product_name') or prod.get('product_id')
-                                            if pname:
-                                                val = prod_map.get(pname, {}).get(feature, '-')
-                                                row[pname] = val
-                                                if val != '-':
-                                                    has_data = True
-                                        if has_data:
-                                            new_table.append(row)
-                                
-                                # Add any remaining features not in priority list
-                                remaining_features = all_available_features - set(feature_priority)
-                                for feature in sorted(remaining_features):
-                                    row = {'feature': feature}
-                                    has_data = False
-                                    for prod in products:
-                                        if not isinstance(prod, dict):
-                                            continue
-                                        pname = prod.get('product_name') or prod.get('product_id')
-                                        if pname:
-                                            val = prod_map.get(pname, {}).get(feature, '-')
-                                            row[pname] = val
-                                            if val != '-':
-                                                has_data = True
-                                    if has_data:
-                                        new_table.append(row)
-                        
-                        parsed_json['comparison']['table'] = new_table
-                        print(f"🔧 Created comparison table with {len(new_table)} rows")
-                        # Debug: Show actual keys in the table
-                        if new_table:
-                            print(f"🔧 Sample table row keys: {list(new_table[0].keys())}")
-                            print(f"🔧 Expected product names: {[p.get('product_name', 'Unknown') for p in products]}")
-
-                    # Post-process comparison table to fix key mismatches
-                    if isinstance(parsed_json, dict) and 'comparison' in parsed_json and isinstance(parsed_json['comparison'], dict):
-                        comparison = parsed_json['comparison']
-                        if 'table' in comparison and 'products' in comparison:
-                            table = comparison['table']
-                            products = comparison['products']
-                            
-                            if isinstance(table, list) and isinstance(products, list) and table and products:
-                                print("🔧 Post-processing comparison table to fix key mismatches")
-                                
-                                # Create mapping from partial names to full names
-                                name_mapping = {}
-                                for product in products:
-                                    if isinstance(product, dict) and 'product_name' in product:
-                                        full_name = product['product_name']
-                                        # Create potential shortened versions
-                                        words = full_name.split()
-                                        for i in range(2, min(len(words), 8)):  # Try different lengths
-                                            partial_name = ' '.join(words[:i])
-                                            name_mapping[partial_name] = full_name
-                                
-                                print(f"🔧 Name mapping: {name_mapping}")
-                                
-                                # Fix the table keys
-                                fixed_table = []
-                                for row in table:
-                                    if isinstance(row, dict):
-                                        fixed_row = {'feature': row.get('feature', '')}
-                                        for key, value in row.items():
-                                            if key != 'feature':
-                                                # Try to find the full name for this key
-                                                mapped_name = name_mapping.get(key, key)
-                                                fixed_row[mapped_name] = value
-                                        fixed_table.append(fixed_row)
-                                
-                                parsed_json['comparison']['table'] = fixed_table
-                                print(f"🔧 Fixed comparison table keys. Sample row: {fixed_table[0] if fixed_table else 'No rows'}")
-
-                except Exception as e:
-                    print(f"❌ Error in comparison table processing: {type(e).__name__}: {e}")
-                    # Keep the original comparison structure if processing fails
-
-                # Ensure we have the expected structure - if it's missing top-level fields, try to extract them
-                if isinstance(parsed_json, dict):
-                    # If we don't have expected keys, the LLM might have wrapped everything in a data field
-                    expected_keys = {'answer', 'products', 'product_details', 'stores', 'end'}
-                    current_keys = set(parsed_json.keys())
-                    
-                    if not any(key in current_keys for key in expected_keys):
-                        print("⚠️  Response doesn't have expected structure. Trying to extract from nested fields...")
-                        # Try to find the actual response structure in nested fields
-                        if 'data' in parsed_json:
-                            parsed_json = parsed_json['data']
-                            print(f"🔧 Extracted from data field. New keys: {list(parsed_json.keys())}")
-
-                # Return properly formatted JSON
-                print(f"🔧 Final parsed_json before return: {str(parsed_json)[:300]}...")
-                print(f"🔧 Final parsed_json keys: {list(parsed_json.keys()) if isinstance(parsed_json, dict) else 'Not a dict'}")
-                
-                # Validate final response has required fields
-                if isinstance(parsed_json, dict):
-                    if not parsed_json.get('answer'):
-                        print("⚠️ Missing answer field, adding default")
-                        parsed_json['answer'] = "I found some information for you."
-                    if 'end' not in parsed_json:
-                        parsed_json['end'] = "How else can I help you?"
-                    
-                    # Ensure we have the basic structure
-                    required_fields = ['products', 'product_details', 'stores', 'policy_info', 'comparison', 'authentication']
-                    for field in required_fields:
-                        if field not in parsed_json:
-                            if field == 'authentication':
-                                parsed_json[field] = {"required": False, "step": "verified", "message": ""}
-                            elif field == 'comparison':
-                                parsed_json[field] = {"products": [], "criteria": [], "table": []}
-                            else:
-                                parsed_json[field] = [] if field in ['products', 'stores'] else {}
-                else:
-                    print("⚠️ parsed_json is not a dict, creating fallback")
-                    parsed_json = {
-                        "answer": "Can you ask me again later? I'm being asked too many queries right now by users which is  more than usual, so I can't do that for you right now.",
-                        "products": [],
-                        "product_details": {},
-                        "stores": [],
-                        "policy_info": {},
-                        "comparison": {"products": [], "criteria": [], "table": []},
-                        "authentication": {"required": False, "step": "verified", "message": ""},
-                        "end": "Please wait for some time and ask again."
-                    }
-                
-                final_json = json.dumps(parsed_json, ensure_ascii=False, indent=2)
-                
-                # Final validation - ensure we're not returning empty content
-                if not final_json or final_json.strip() == "" or final_json == "{}":
-                    print("⚠️ Final JSON is empty, using emergency fallback")
-                    emergency_response = {
-                        "answer": "Can you ask me again later? I'm being asked too many queries right now by users which is  more than usual, so I can't do that for you right now.",
-                        "products": [],
-                        "product_details": {},
-                        "stores": [],
-                        "policy_info": {},
-                        "comparison": {"products": [], "criteria": [], "table": []},
-                        "authentication": {"required": False, "step": "verified", "message": ""},
-                        "end": "Please wait for some time and ask again. "
-                    }
-                    return json.dumps(emergency_response, ensure_ascii=False, indent=2)
-                
-                return final_json
-                
-            except json.JSONDecodeError as e:
-                print(f"🔧 JSON parsing failed: {e}")
-                print(f"🔧 Problematic response: {clean_response[:500]}...")
-                
-                # Try to extract meaningful content from the raw response
-                response_text = final_response
-                
-                # If response contains array-like structure, try to extract text
-                if '[' in response_text and ']' in response_text:
-                    try:
-                        # Look for quoted strings in the array
-                        text_matches = re.findall(r'"([^"]+)"', response_text)
-                        if text_matches:
-                            # Use the first meaningful text that's not JSON
-                            for match in text_matches:
-                                if not match.strip().startswith('{') and len(match.strip()) > 10:
-                                    response_text = match
-                                    break
-                    except:
-                        pass
-                
-                # Create a proper JSON response from the extracted text
-                fallback_response = {
-                    "answer": response_text if response_text else "Can you ask me again later? I'm being asked too many queries right now by users which is  more than usual, so I can't do that for you right now.",
-                    "products": [],
-                    "product_details": {},
-                    "stores": [],
-                    "policy_info": {},
-                    "comparison": {},
-                    "authentication": {"required": False, "step": "verified", "message": ""},
-                    "end": " Please wait for some time and ask again. "
-                }
-                
-                return json.dumps(fallback_response, ensure_ascii=False, indent=2)
-                # Provide contextual responses based on user message
-                user_msg_lower = message.lower() if message else ""
-                
-                if any(greeting in user_msg_lower for greeting in ['hello', 'hi', 'hey', 'helo']):
-                    fallback_response = {
-                        "answer": "Hello! Welcome to Lotus Electronics! I'm here to help you find the perfect electronics products. What are you looking for today?",
-                        "products": [],
-                        "product_details": {},
-                        "stores": [],
-                        "policy_info": {},
-                        "end": "I can help you find TVs, smartphones, laptops, home appliances, and more. What interests you?"
-                    }
-                elif any(help_word in user_msg_lower for help_word in ['help', 'assist', 'support']):
-                    fallback_response = {
-                        "answer": "I'd be happy to help! I can assist you with finding products, getting detailed specifications, locating nearby stores, and checking availability.",
-                        "products": [],
-                        "product_details": {},
-                        "stores": [],
-                        "policy_info": {},
-                        "end": "What would you like to explore - TVs, smartphones, laptops, or something else?"
-                    }
-                elif any(thanks in user_msg_lower for thanks in ['thanks', 'thank you', 'thx']):
-                    fallback_response = {
-                        "answer": "You're welcome! I'm glad I could help.",
-                        "products": [],
-                        "product_details": {},
-                        "stores": [],
-                        "policy_info": {},
-                        "end": "Is there anything else you'd like to know about our electronics collection?"
-                    }
-                else:
-                    # Generic fallback with the original response
-                    fallback_response = {
-                        "answer": clean_response if clean_response else "I understand. How can I help you with Lotus Electronics products?",
-                        "products": [],
-                        "product_details": {},
-                        "stores": [],
-                        "policy_info": {},
-                        "end": "Are you looking for any specific electronics or need help finding a store?"
-                    }
-                
-                return json.dumps(fallback_response, ensure_ascii=False, indent=2)
+            # JSON extraction and clean-up is CPU heavy; keep it off the gevent hub
+            return run_in_pool("postprocess", format_agent_response, final_response, message)
         else:
             # Default response if no content
             error_response = {
@@ -0,0 +1,120 @@
+"""
+Embedding sidecar for the Lotus Electronics Chatbot
+Holds the MiniLM model once and serves query embeddings to every gunicorn worker
+over a Unix socket, so adding workers does not multiply model memory.
+
+Protocol: one JSON object per line in each direction.
+    {"op": "encode", "texts": ["samsung ac"]}  -> {"ok": true, "vectors": [[...]]}
+    {"op": "health"}                           -> {"ok": true, "stats": {...}}
+
+Run with: python embedding_server.py [--socket /tmp/lotus-embedding.sock]
+"""
+import os
+import json
+import time
+import logging
+import argparse
+import threading
+import socketserver
+
+from tools.embedding_service import EmbeddingService, EMBEDDING_SERVER_SOCKET
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s: %(message)s")
+logger = logging.getLogger("embedding_server")
+
+
+class EmbeddingServerStats:
+    """Request counters for the health endpoint."""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.connections = 0
+        self.requests = 0
+        self.texts = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def record(self, texts=0, error=False):
+        with self._lock:
+            self.requests += 1
+            self.texts += texts
+            if error:
+                self.errors += 1
+
+    def as_dict(self):
+        uptime = time.time() - self.started_at
+        return {
+            "uptime_seconds": round(uptime, 1),
+            "connections": self.connections,
+            "requests": self.requests,
+            "texts": self.texts,
+            "errors": self.errors,
+            "texts_per_second": round(self.texts / uptime, 2) if uptime else 0.0,
+        }
+
+
+class EmbeddingRequestHandler(socketserver.StreamRequestHandler):
+    """Serves newline-delimited JSON requests on one worker connection."""
+
+    def handle(self):
+        server = self.server
+        server.stats.connections += 1
+        for raw in self.rfile:
+            if not raw.strip():
+                continue
+            try:
+                request = json.loads(raw)
+                op = request.get("op")
+                if op == "encode":
+                    texts = request.get("texts") or []
+                    if len(texts) == 1:
+                        # Single queries go through the shared cache and micro-batcher,
+                        # which coalesces concurrent requests from all workers
+                        vectors = [server.service.encode_query(texts[0])]
+                    else:
+                        vectors = server.service.encode(texts).tolist() if texts else []
+                    server.stats.record(texts=len(texts))
+                    response = {"ok": True, "vectors": vectors}
+                elif op == "health":
+                    response = {"ok": True, "stats": {**server.stats.as_dict(), "embedding": server.service.stats()}}
+                else:
+                    response = {"ok": False, "error": f"Unknown op: {op}"}
+            except Exception as e:
+                logger.exception("Embedding request failed")
+                server.stats.record(error=True)
+                response = {"ok": False, "error": str(e)}
+
+            self.wfile.write((json.dumps(response) + "\n").encode("utf-8"))
+            self.wfile.flush()
+
+
+class EmbeddingServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path):
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        super().__init__(socket_path, EmbeddingRequestHandler)
+        os.chmod(socket_path, 0o660)
+        self.service = EmbeddingService()
+        self.stats = EmbeddingServerStats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared embedding server for gunicorn workers")
+    parser.add_argument("--socket", default=EMBEDDING_SERVER_SOCKET or "/tmp/lotus-embedding.sock")
+    args = parser.parse_args()
+
+    server = EmbeddingServer(args.socket)
+    server.service.encode_query("warm up")  # load the model before accepting traffic
+    logger.info(f"🧠 Embedding server listening on {args.socket}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if os.path.exists(args.socket):
+            os.unlink(args.socket)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+# Gunicorn configuration hooks for the Lotus Electronics Chatbot
+# Command-line options in start_gunicorn.sh still control workers, binds and logging.
+
+# Patch before the app is preloaded in the master, so locks and threads created at
+# import time are gevent-aware in the forked workers (--worker-class gevent). Patched
+# threads are greenlets, so warm-up steps run on the worker's hub and only the model
+# load is handed to a native worker pool.
+from gevent import monkey
+monkey.patch_all()
+
+
+def when_ready(server):
+    """Runs in the master after the preloaded app is imported and before workers fork."""
+    if not server.cfg.preload_app:
+        return
+    from preload import build_shared_state
+    server.log.info("🧊 Building shared read-only state before fork")
+    build_shared_state()
+
+
+def post_worker_init(worker):
+    """Warm up heavy components in the background once the worker is ready to serve."""
+    from startup import start_background_warm_up
+    worker.log.info("🔥 Starting component warm-up")
+    start_background_warm_up()
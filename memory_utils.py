@@ -14,6 +14,27 @@ def get_memory_usage():
     memory_info = process.memory_info()
     return memory_info.rss / 1024 / 1024  # Convert to MB
 
+def get_memory_breakdown():
+    """
+    Get shared vs private memory for this process in MB.
+
+    private (USS) is memory only this process holds; shared is the part of RSS
+    still shared with the gunicorn master and sibling workers; PSS splits shared
+    pages proportionally across the processes mapping them.
+    """
+    process = psutil.Process()
+    info = process.memory_full_info()
+    rss = info.rss / 1024 / 1024
+    uss = getattr(info, 'uss', 0) / 1024 / 1024
+    pss = getattr(info, 'pss', 0) / 1024 / 1024
+    return {
+        "pid": process.pid,
+        "rss_mb": round(rss, 1),
+        "private_mb": round(uss, 1),
+        "shared_mb": round(rss - uss, 1) if uss else None,
+        "pss_mb": round(pss, 1) if pss else None,
+    }
+
 def log_memory_usage(func_name=""):
     """Log current memory usage"""
     memory_mb = get_memory_usage()
@@ -15,6 +15,14 @@ echo "📊 Process Memory Usage:"
 echo "🚀 Gunicorn Processes:"
 ps aux | grep gunicorn | grep -v grep | awk '{print $2, $4"% CPU", $6/1024"MB", $11}' | column -t
 
+echo ""
+echo "🔗 Gunicorn Shared vs Private Memory (from /proc/<pid>/smaps_rollup):"
+for PID in $(pgrep -f "gunicorn.*app2:app"); do
+    if [ -r /proc/$PID/smaps_rollup ]; then
+        awk -v pid=$PID '/^Rss:/ {rss=$2} /^Pss:/ {pss=$2} /^Shared_Clean:|^Shared_Dirty:/ {shared+=$2} /^Private_Clean:|^Private_Dirty:/ {private+=$2} END {printf "PID %s  RSS %.1fMB  PSS %.1fMB  Shared %.1fMB  Private %.1fMB\n", pid, rss/1024, pss/1024, shared/1024, private/1024}' /proc/$PID/smaps_rollup
+    fi
+done
+
 echo ""
 echo "🐍 Python Processes:"
 ps aux | grep python | grep -v grep | awk '{print $2, $4"% CPU", $6/1024"MB", $11}' | column -t
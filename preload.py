@@ -0,0 +1,73 @@
+"""
+Copy-on-write friendly preload for gunicorn
+With --preload the app is imported in the gunicorn master. build_shared_state() then
+loads the read-only heavy objects there (embedding weights, store table, local product
+snapshot with its lexical index and category centroids, the policy spell corrector, system
+prompt, compiled regexes) and calls gc.freeze() so that the garbage collector never touches, and
+thereby un-shares, those objects in the forked workers.
+
+Network clients (Pinecone, Redis) are deliberately NOT created here; sockets must not
+be shared across fork, so they are set up per worker by the startup warm-up.
+"""
+import gc
+import time
+import logging
+
+from memory_utils import get_memory_usage
+
+logger = logging.getLogger(__name__)
+
+_shared_state = {"frozen": False, "frozen_objects": 0, "seconds": 0.0, "master_rss_mb": 0.0}
+
+
+def build_shared_state():
+    """Build read-only state in the master process and freeze it before fork."""
+    start = time.perf_counter()
+
+    from tools.embedding_service import get_embedding_service, EmbeddingService
+    service = get_embedding_service()
+    if isinstance(service, EmbeddingService):
+        # Load weights only; running an encode here would start native thread pools before fork
+        service._load()
+
+    from tools.get_nearby_store import load_store_table
+    load_store_table()
+
+    # The local snapshot's matrix is mmapped (shared page cache); its metadata list, the
+    # lexical index and the category centroids are built here and frozen below
+    from tools.product_search_tool import product_search_instance, PRODUCT_LEXICAL_SEARCH, PRODUCT_CATEGORY_FILTER
+    from tools.local_vector_index import load_local_index, LOCAL_INDEX_DIR
+    if product_search_instance.backend in ("local", "auto"):
+        product_search_instance.local_index = load_local_index()
+    if PRODUCT_LEXICAL_SEARCH != "off":
+        from tools.lexical_index import load_lexical_index
+        product_search_instance.lexical_index = load_lexical_index(LOCAL_INDEX_DIR, product_search_instance.local_index)
+    if PRODUCT_CATEGORY_FILTER:
+        from tools.category_classifier import load_category_classifier
+        product_search_instance.category_classifier = load_category_classifier(LOCAL_INDEX_DIR)
+
+    # The spell corrector's deletion index is a large dict of short strings; share it too
+    from tools.spell_corrector import get_spell_corrector
+    get_spell_corrector()
+
+    # Importing chat_working compiles SYSTEM_PROMPT and the response regexes at module level
+    import chat_working  # noqa: F401
+
+    # Collect garbage once, then move every surviving object into the permanent generation
+    gc.collect()
+    gc.freeze()
+
+    _shared_state.update({
+        "frozen": True,
+        "frozen_objects": gc.get_freeze_count(),
+        "seconds": round(time.perf_counter() - start, 2),
+        "master_rss_mb": round(get_memory_usage(), 1),
+    })
+    logger.info(f"🧊 Preloaded shared state in {_shared_state['seconds']}s, froze {_shared_state['frozen_objects']} objects "
+                f"(master RSS {_shared_state['master_rss_mb']} MB)")
+    return _shared_state
+
+
+def shared_state_report():
+    """Preload status for the health endpoint."""
+    return dict(_shared_state)
@@ -12,9 +12,16 @@ source /root/yes/bin/activate
 conda activate chatbot
 
 
+# Start the shared embedding server so all workers use one copy of the model
+export EMBEDDING_SERVER_SOCKET=${EMBEDDING_SERVER_SOCKET:-/tmp/lotus-embedding.sock}
+if ! pgrep -f "python.*embedding_server.py" > /dev/null; then
+    nohup python embedding_server.py --socket "$EMBEDDING_SERVER_SOCKET" > logs/embedding_server.log 2>&1 &
+    echo "🧠 Embedding server starting on $EMBEDDING_SERVER_SOCKET"
+fi
+
 # Run with Gunicorn for production (WSGI for Flask) with SSL
 # Optimized for 100 concurrent users with memory management
-nohup gunicorn -w 3 -b 0.0.0.0:8001 \
+nohup gunicorn -c gunicorn.conf.py -w 3 -b 0.0.0.0:8001 \
   --worker-class gevent \
   --worker-connections 50 \
   --timeout 120 \
@@ -37,6 +44,7 @@ if pgrep -f "gunicorn.*app2:app" > /dev/null; then
     echo "👥 Capacity: ~150 concurrent users"
     echo "📝 Access logs: logs/access.log"
     echo "📝 Error logs: logs/error.log"
+    echo "🧠 Embedding server log: logs/embedding_server.log"
     echo "🔍 Process ID: $(pgrep -f 'gunicorn.*app2:app' | head -1)"
 else
     echo "❌ Failed to start server!"
@@ -0,0 +1,99 @@
+"""
+Startup warm-up for the Lotus Electronics Chatbot
+Heavy components (embedding model, Pinecone indexes, Redis) are initialized lazily
+on first use. warm_up() initializes them ahead of traffic, concurrently, and records
+how long each one took so /health can report readiness and a timing breakdown.
+"""
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+_components = {}  # name -> (init_fn, required)
+_timings = {}
+_state = {"ready": False, "started_at": None, "finished_at": None}
+_lock = threading.Lock()
+_warm_up_thread = None
+
+
+def register_component(name, init_fn, required=True):
+    """
+    Register a component initializer for warm-up.
+
+    Args:
+        name: Component name shown in the timing breakdown
+        init_fn: Callable that initializes the component; may raise on failure
+        required: Whether the service counts as ready without this component
+    """
+    _components[name] = (init_fn, required)
+
+
+def _run_component(name, init_fn):
+    start = time.perf_counter()
+    try:
+        result = init_fn()
+        ok = result is not False
+        error = None if ok else "initializer reported failure"
+    except Exception as e:
+        ok = False
+        error = f"{type(e).__name__}: {e}"
+    seconds = time.perf_counter() - start
+    _timings[name] = {"ok": ok, "seconds": round(seconds, 3), "error": error}
+    status = "✅" if ok else "❌"
+    logger.info(f"{status} Warm-up {name}: {seconds:.2f}s" + (f" ({error})" if error else ""))
+    return ok
+
+
+def _executor(max_workers):
+    """
+    Executor for the warm-up steps. Under gunicorn's gevent monkey-patching its workers
+    are greenlets on the worker's hub, so the I/O-bound steps (Pinecone, Redis) overlap
+    and every client they create belongs to the hub that serves requests. CPU-bound
+    work inside a step (loading the embedding model) goes to the native worker pools.
+    """
+    return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="warm-up")
+
+
+def warm_up(parallel=True):
+    """Initialize all registered components, concurrently by default. Returns readiness."""
+    with _lock:
+        _state["started_at"] = time.time()
+        start = time.perf_counter()
+        items = list(_components.items())
+        if parallel and len(items) > 1:
+            with _executor(len(items)) as executor:
+                futures = {name: executor.submit(_run_component, name, fn) for name, (fn, _) in items}
+                results = {name: f.result() for name, f in futures.items()}
+        else:
+            results = {name: _run_component(name, fn) for name, (fn, _) in items}
+
+        _state["ready"] = all(results[name] for name, (_, required) in items if required)
+        _state["finished_at"] = time.time()
+        _timings["total"] = {"ok": _state["ready"], "seconds": round(time.perf_counter() - start, 3), "error": None}
+        logger.info(f"🚀 Warm-up finished in {_timings['total']['seconds']}s, ready={_state['ready']}")
+        return _state["ready"]
+
+
+def start_background_warm_up():
+    """Run warm_up() in a background thread so the worker can accept connections immediately."""
+    global _warm_up_thread
+    if _warm_up_thread is None or not _warm_up_thread.is_alive():
+        _warm_up_thread = threading.Thread(target=warm_up, name="startup-warm-up", daemon=True)
+        _warm_up_thread.start()
+    return _warm_up_thread
+
+
+def is_ready():
+    return _state["ready"]
+
+
+def startup_report():
+    """Readiness flag and per-component timings for the health endpoint."""
+    return {
+        "ready": _state["ready"],
+        "warm_up_started": _state["started_at"] is not None,
+        "warm_up_finished": _state["finished_at"] is not None,
+        "components": dict(_timings),
+    }
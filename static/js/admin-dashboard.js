@@ -56,6 +56,9 @@ class AdminDashboard {
             case 'logs':
                 this.loadLogs();
                 break;
+            case 'policy-cache':
+                this.loadPolicyCache();
+                break;
             case 'analytics':
                 this.loadAnalytics();
                 break;
@@ -628,6 +631,58 @@ class AdminDashboard {
         }
     }
     
+    async loadPolicyCache() {
+        try {
+            const response = await fetch('/admin/api/policy-cache');
+            const data = await response.json();
+            
+            if (data.success) {
+                this.renderPolicyCache(data.cache);
+            }
+        } catch (error) {
+            console.error('Error loading policy cache:', error);
+            this.showError('Failed to load policy answer cache');
+        }
+    }
+    
+    renderPolicyCache(cache) {
+        const tbody = document.getElementById('policy-cache-table');
+        tbody.innerHTML = '';
+        
+        Object.entries(cache.intents || {}).forEach(([intent, stored]) => {
+            const row = document.createElement('tr');
+            row.innerHTML = `
+                <td><code>${intent}</code></td>
+                <td>
+                    <span class="badge bg-${stored ? 'success' : 'secondary'}">${stored ? 'STORED' : 'PENDING'}</span>
+                </td>
+            `;
+            tbody.appendChild(row);
+        });
+        
+        if (!cache.intents) {
+            tbody.innerHTML = '<tr><td colspan="2" class="text-center text-muted">Cache unavailable</td></tr>';
+        }
+        
+        document.getElementById('policy-cache-status').textContent =
+            `Generation ${cache.generation || '-'} · this worker: ${cache.hits} hits, ${cache.misses} misses, ${cache.unmatched} unmatched`;
+    }
+    
+    async updatePolicyCache(action) {
+        try {
+            const response = await fetch(`/admin/api/policy-cache/${action}`, { method: 'POST' });
+            const data = await response.json();
+            
+            if (!data.success) {
+                this.showError(data.message || `Failed to ${action} policy answer cache`);
+            }
+            this.loadPolicyCache();
+        } catch (error) {
+            console.error(`Error on policy cache ${action}:`, error);
+            this.showError(`Failed to ${action} policy answer cache`);
+        }
+    }
+    
     async loadAnalytics() {
         // Placeholder for analytics charts
         console.log('Loading analytics...');
@@ -797,6 +852,8 @@ window.loadConversations = (page = 1) => dashboard.loadConversations(page);
 window.loadLogs = (page = 1) => dashboard.loadLogs(page);
 window.exportConversations = () => dashboard.exportConversations();
 window.exportLogs = () => dashboard.exportLogs();
+window.rebuildPolicyCache = () => dashboard.updatePolicyCache('rebuild');
+window.invalidatePolicyCache = () => dashboard.updatePolicyCache('invalidate');
 
 // Users section functions
 window.filterUsers = () => dashboard.loadUsers();
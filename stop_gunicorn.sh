@@ -35,6 +35,13 @@ else
     fi
 fi
 
+# Stop the shared embedding server
+EMBED_PIDS=$(pgrep -f "python.*embedding_server.py")
+if [ ! -z "$EMBED_PIDS" ]; then
+    echo "🧠 Stopping embedding server: $EMBED_PIDS"
+    kill -TERM $EMBED_PIDS
+fi
+
 # Also kill any processes using port 8001
 PORT_PIDS=$(lsof -ti:8001 2>/dev/null)
 if [ ! -z "$PORT_PIDS" ]; then
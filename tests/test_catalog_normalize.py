@@ -0,0 +1,23 @@
+from tools.catalog_normalize import coerce_price
+
+
+def test_parses_rupee_and_indian_grouping():
+    assert coerce_price("₹1,23,456") == 123456.0
+
+
+def test_ignores_rs_prefix_dot():
+    assert coerce_price("Rs. 12,999") == 12999.0
+    assert coerce_price("Rs.12999") == 12999.0
+    assert coerce_price("INR 4,499.50") == 4499.5
+    assert coerce_price("MRP: ₹2,999") == 2999.0
+
+
+def test_parses_plain_numbers():
+    assert coerce_price("12999.00") == 12999.0
+    assert coerce_price(12999) == 12999.0
+    assert coerce_price(12999.5) == 12999.5
+
+
+def test_rejects_missing_and_non_positive_prices():
+    for value in [None, True, "", "Rs.", "price on request", "0", 0, -5]:
+        assert coerce_price(value) is None
@@ -0,0 +1,25 @@
+import pytest
+
+pytest.importorskip("redis")
+
+from tools.policy_answer_cache import match_intent_by_keywords, mentions_policy_intent  # noqa: E402
+
+
+def test_short_general_queries_map_to_one_intent():
+    assert match_intent_by_keywords("return policy?") == "return_window"
+    assert match_intent_by_keywords("refund policy") == "refund"
+    assert match_intent_by_keywords("warranty on tv") == "warranty"
+    assert match_intent_by_keywords("delivery charges?") == "delivery_charges"
+    assert match_intent_by_keywords("privacy policy") == "privacy"
+
+
+def test_detailed_questions_are_not_keyword_matched():
+    query = "what documents are needed to return a TV bought on EMI last month"
+    assert match_intent_by_keywords(query) is None
+    assert mentions_policy_intent(query)
+
+
+def test_ambiguous_and_unrelated_queries_have_no_intent():
+    assert match_intent_by_keywords("return or refund?") is None
+    assert match_intent_by_keywords("store timings in indore") is None
+    assert not mentions_policy_intent("samsung phones under 20k")
@@ -0,0 +1,38 @@
+from tools.query_intent import parse_query_intent, has_search_hints, format_intent_hint
+
+
+def test_price_bounds_in_indian_shorthand():
+    assert parse_query_intent("under 50k") == {"price_max": 50000}
+    assert parse_query_intent("between 20000 and 30000") == {"price_min": 20000, "price_max": 30000}
+    assert parse_query_intent("below 1 lakh") == {"price_max": 100000}
+    assert parse_query_intent("around 40k") == {"price_min": 35000, "price_max": 45000}
+
+
+def test_unit_carries_over_and_brand_and_category_are_detected():
+    assert parse_query_intent("samsung phone 20-30k") == {
+        "price_min": 20000, "price_max": 30000, "category": "Smartphones", "brand": "Samsung"}
+    assert parse_query_intent("1.5 ton ac under ₹40,000") == {"price_max": 40000, "category": "Air Conditioners"}
+
+
+def test_phone_numbers_and_specs_are_not_prices():
+    for message in ["My phone number is 9993536438", "695-0746.", "598252", "under 8 gb ram"]:
+        assert parse_query_intent(message) == {}
+    assert parse_query_intent("55 inch tv under 1.5 lakh") == {"price_max": 150000, "category": "Televisions"}
+
+
+def test_category_hint_only_for_new_product_queries():
+    assert has_search_hints(parse_query_intent("show me washing machines"), "show me washing machines")
+    for message in ["compare the first two TVs", "which of these laptops is better", "show more phones"]:
+        assert not has_search_hints(parse_query_intent(message), message)
+
+
+def test_price_and_brand_hints_survive_follow_ups():
+    message = "compare the first two under 30k"
+    assert has_search_hints(parse_query_intent(message), message)
+    message = "which of these is better, the Samsung one?"
+    assert has_search_hints(parse_query_intent(message), message)
+
+
+def test_format_intent_hint_prints_whole_rupees():
+    assert format_intent_hint({"price_max": 50000.0, "category": "Laptops"}) == \
+        "[search hints: price_max=50000, category=Laptops]"
@@ -0,0 +1,72 @@
+from tools.catalog_categories import detect_category, UNKNOWN_CATEGORY
+from tools.local_vector_index import LocalMatch
+from tools.result_selection import select_products, in_categories
+
+BRAND_ONLY_NAMES = [
+    "Redmi Note 13 Pro",
+    "Vivo Y28s",
+    "OnePlus Nord CE4 Lite",
+    "Samsung Galaxy M14 (4GB RAM, 128GB Storage)",
+    "Whirlpool 7 Kg Fully Automatic Top Load",
+    "Boat Airdopes 141",
+]
+
+
+def _match(i, name, category=None, price=20000):
+    metadata = {"product_name": name, "price": price}
+    if category is not None:
+        metadata["category"] = category
+    return LocalMatch(f"p{i}", 1.0 - i / 100, metadata)
+
+
+def test_brand_only_names_are_untagged():
+    assert {detect_category(name) for name in BRAND_ONLY_NAMES} == {UNKNOWN_CATEGORY}
+
+
+def test_other_category_passes_filter():
+    matches = [_match(i, name, detect_category(name)) for i, name in enumerate(BRAND_ONLY_NAMES)]
+    assert all(in_categories(m, {"Smartphones"}) for m in matches)
+    products = select_products(matches, top_k=6, max_per_brand=6, categories={"Smartphones"})
+    assert [p["product_name"] for p in products] == BRAND_ONLY_NAMES
+
+
+def test_missing_category_passes_filter():
+    assert in_categories(_match(0, "Redmi Note 13 Pro"), {"Smartphones"})
+
+
+def test_other_stored_category_is_dropped():
+    matches = [
+        _match(0, "Samsung 55 inch QLED TV", "Televisions"),
+        _match(1, "Redmi Note 13 Pro", UNKNOWN_CATEGORY),
+        _match(2, "Apple iPhone 15", "Smartphones"),
+    ]
+    products = select_products(matches, top_k=5, categories={"Smartphones"})
+    assert [p["product_name"] for p in products] == ["Redmi Note 13 Pro", "Apple iPhone 15"]
+
+
+def _branded(i, brand, price=20000):
+    return LocalMatch(f"b{i}", 1.0 - i / 100, {"product_name": f"{brand} Phone {i}", "brand": brand, "price": price})
+
+
+def test_brand_cap_keeps_score_order():
+    matches = [_branded(i, "Samsung") for i in range(4)] + [_branded(4, "Vivo"), _branded(5, "Oppo")]
+    products = select_products(matches, top_k=5, max_per_brand=2, relaxed_max_per_brand=2)
+    assert [p["product_name"] for p in products] == ["Samsung Phone 0", "Samsung Phone 1", "Vivo Phone 4", "Oppo Phone 5"]
+
+
+def test_relaxation_round_robins_over_capped_brands():
+    matches = [_branded(i, "Samsung") for i in range(4)] + [_branded(i, "Vivo") for i in range(4, 8)]
+    products = select_products(matches, top_k=6, max_per_brand=2, relaxed_max_per_brand=3)
+    assert [p["product_name"] for p in products] == [
+        "Samsung Phone 0", "Samsung Phone 1", "Samsung Phone 2", "Vivo Phone 4", "Vivo Phone 5", "Vivo Phone 6"]
+
+
+def test_price_bounds_and_invalid_products_are_skipped():
+    matches = [
+        _branded(0, "Samsung", price=50000),
+        LocalMatch("x", 0.9, {"product_name": "unknown", "price": 1000}),
+        LocalMatch("y", 0.9, {"product_name": "LG Phone", "price": "n/a"}),
+        _branded(3, "Vivo", price=15000),
+    ]
+    products = select_products(matches, top_k=5, price_max=30000)
+    assert [p["product_name"] for p in products] == ["Vivo Phone 3"]
@@ -0,0 +1,47 @@
+from tools.spell_corrector import build_corrector, count_words
+
+POLICY_TEXT = """
+Products can be returned within 7 days of delivery. The return policy applies to unopened
+items in original packaging. Refunds are processed to the original payment method. Exchange
+offers on old products are subject to inspection. The warranty is provided by the manufacturer.
+We use personal data as described in our privacy policy; data is not sold to third parties.
+This policy was last updated in 2024. Contact customer care about your order. Please read about
+our terms. Tell us what is okay.
+""" * 3
+
+
+def _corrector():
+    return build_corrector(count_words([POLICY_TEXT]))
+
+
+def test_no_vocabulary_leaves_words_unchanged():
+    corrector = build_corrector({})
+    assert corrector.correct("retrun polcy for samsng phone") == "retrun polcy for samsng phone"
+
+
+def test_corrects_policy_typos():
+    assert _corrector().correct("retrun polcy for samsng phone") == "return policy for samsung phone"
+
+
+def test_keeps_everyday_and_brand_words():
+    corrector = _corrector()
+    for query in ["my order is lost", "exchange offr on old tv", "boat earphones return", "tata sky dth"]:
+        assert corrector.correct(query) == query
+
+
+def test_known_english_words_are_not_corrected():
+    corrector = build_corrector(count_words([POLICY_TEXT]), english_words=["retrun"])
+    assert corrector.correct("retrun") == "retrun"
+
+
+def test_keeps_case():
+    assert _corrector().correct("Warrenty") == "Warranty"
+
+
+def test_vocabulary_falls_back_to_local_policy_index(tmp_path, monkeypatch):
+    from tools import spell_corrector
+
+    monkeypatch.setattr(spell_corrector, "policy_texts_from_local_index", lambda: [POLICY_TEXT])
+    counts = spell_corrector.load_policy_vocabulary(str(tmp_path / "missing.json"))
+    assert counts["refunds"] == 3
+    assert build_corrector(counts).correct("retrun polcy") == "return policy"
@@ -0,0 +1,149 @@
+"""
+Benchmark the PyTorch and ONNX int8 embedding backends.
+
+Usage:
+    python -m tools.benchmark_embeddings [--runs 200] [--pinecone] [--burst 50]
+
+Reports per-query latency, batch throughput and RSS growth for each backend
+(each measured in its own process), the cosine agreement between the two, and
+with --pinecone the top-k overlap both vectors produce on the product index.
+With --burst N it also fires N concurrent distinct queries at the shared embedding
+service, with and without micro-batching, and reports the throughput of each.
+"""
+
+import os
+import time
+import argparse
+import threading
+import multiprocessing
+
+import numpy as np
+
+from tools.export_onnx_encoder import SAMPLE_QUERIES
+
+
+def _load_encoder(backend: str):
+    if backend == "onnx":
+        from tools.onnx_encoder import OnnxSentenceEncoder
+        return OnnxSentenceEncoder()
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer("all-MiniLM-L6-v2")
+
+
+def _measure_backend(backend: str, runs: int, queue):
+    """Run inside a fresh process so RSS figures are not polluted by the other backend."""
+    from memory_utils import get_memory_usage
+
+    rss_before = get_memory_usage()
+    start = time.perf_counter()
+    encoder = _load_encoder(backend)
+    load_seconds = time.perf_counter() - start
+    rss_after_load = get_memory_usage()
+
+    encoder.encode(SAMPLE_QUERIES[0])  # warm-up
+    latencies = []
+    for i in range(runs):
+        query = SAMPLE_QUERIES[i % len(SAMPLE_QUERIES)]
+        start = time.perf_counter()
+        encoder.encode(query)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    encoder.encode(SAMPLE_QUERIES * 4)
+    batch_seconds = time.perf_counter() - start
+
+    vectors = np.asarray(encoder.encode(SAMPLE_QUERIES), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    queue.put({
+        "backend": backend,
+        "load_seconds": round(load_seconds, 2),
+        "model_rss_mb": round(rss_after_load - rss_before, 1),
+        "peak_rss_mb": round(get_memory_usage(), 1),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 2),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 2),
+        "batch_qps": round(len(SAMPLE_QUERIES) * 4 / batch_seconds, 1),
+        "vectors": vectors.tolist(),
+    })
+
+
+def _pinecone_overlap(reference: np.ndarray, candidate: np.ndarray, top_k: int = 10):
+    """Query the product index with both vectors and compare ids and scores."""
+    from tools.product_search_tool import product_search_instance
+
+    index = product_search_instance.index
+    overlaps, score_deltas = [], []
+    for ref_vec, cand_vec in zip(reference, candidate):
+        ref = index.query(vector=ref_vec.tolist(), top_k=top_k, include_metadata=False)
+        cand = index.query(vector=cand_vec.tolist(), top_k=top_k, include_metadata=False)
+        ref_ids = [m.id for m in ref.matches]
+        cand_ids = [m.id for m in cand.matches]
+        overlaps.append(len(set(ref_ids) & set(cand_ids)) / max(len(ref_ids), 1))
+        if ref.matches and cand.matches:
+            score_deltas.append(abs(ref.matches[0].score - cand.matches[0].score))
+    return {
+        "mean_topk_overlap": round(float(np.mean(overlaps)), 3),
+        "max_top1_score_delta": round(float(np.max(score_deltas)), 4) if score_deltas else None,
+    }
+
+
+def _burst_throughput(concurrency: int):
+    """Encode `concurrency` distinct queries at once, with and without micro-batching."""
+    from tools.embedding_service import EmbeddingService
+    from tools.embedding_batcher import EmbeddingBatcher
+
+    queries = [f"{SAMPLE_QUERIES[i % len(SAMPLE_QUERIES)]} {i}" for i in range(concurrency)]
+    results = {}
+    for mode in ("unbatched", "batched"):
+        service = EmbeddingService()
+        service.cache.max_size = 0  # measure the encoder, not the cache
+        service.batcher = EmbeddingBatcher(service._encode_batch) if mode == "batched" else None
+        service.encode_query("warm-up")
+
+        threads = [threading.Thread(target=service.encode_query, args=(q,)) for q in queries]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - start
+        results[mode] = round(concurrency / elapsed, 1)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the PyTorch and ONNX embedding backends")
+    parser.add_argument("--runs", type=int, default=200)
+    parser.add_argument("--pinecone", action="store_true", help="Also compare top-k results on the Pinecone product index")
+    parser.add_argument("--burst", type=int, default=0, help="Concurrent queries for the micro-batching throughput test")
+    args = parser.parse_args()
+
+    ctx = multiprocessing.get_context("spawn")
+    results = {}
+    for backend in ("torch", "onnx"):
+        queue = ctx.Queue()
+        proc = ctx.Process(target=_measure_backend, args=(backend, args.runs, queue))
+        proc.start()
+        results[backend] = queue.get()
+        proc.join()
+
+    print("📊 Embedding backend benchmark")
+    print("=" * 60)
+    for backend, r in results.items():
+        print(f"{backend:>6}: load={r['load_seconds']}s model_rss={r['model_rss_mb']} MB "
+              f"peak_rss={r['peak_rss_mb']} MB p50={r['p50_ms']} ms p95={r['p95_ms']} ms batch={r['batch_qps']} q/s")
+
+    reference = np.array(results["torch"]["vectors"], dtype=np.float32)
+    candidate = np.array(results["onnx"]["vectors"], dtype=np.float32)
+    cosines = (reference * candidate).sum(axis=1)
+    print(f"🎯 Cosine agreement: min={cosines.min():.4f} mean={cosines.mean():.4f}")
+
+    if args.pinecone:
+        print(f"🌲 Pinecone agreement: {_pinecone_overlap(reference, candidate)}")
+
+    if args.burst:
+        print(f"⚡ Burst of {args.burst} concurrent queries (queries/s): {_burst_throughput(args.burst)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Benchmark the rule-based query intent parser on real user messages.
+
+Usage:
+    python -m tools.benchmark_intent export [--db conversation.db] [--corpus data/intent_corpus.json]
+    python -m tools.benchmark_intent run [--corpus data/intent_corpus.json] [--repeat 200]
+
+"export" collects the distinct human messages from the conversation log into the
+corpus with "expected": null, keeping the labels of messages already in it. Fill in
+each "expected" by hand (a dict of price_min/price_max/category/brand, {} for none);
+the parser's output is never used as a label. "run" checks the built-in labelled
+cases plus every labelled corpus entry against the parser, lists the mismatches, and
+reports how many messages carry search hints and the parse time per message.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import argparse
+
+from tools.query_intent import parse_query_intent, has_search_hints
+
+CORPUS_PATH = "data/intent_corpus.json"
+
+# Phrasings from the system prompt and the conversation log, labelled by hand
+LABELLED_CASES = [
+    ("under 50k", {"price_max": 50000}),
+    ("above 45 k", {"price_min": 45000}),
+    ("smartphones above 45k", {"price_min": 45000, "category": "Smartphones"}),
+    ("between 20000 and 30000", {"price_min": 20000, "price_max": 30000}),
+    ("between 20k and 50k", {"price_min": 20000, "price_max": 50000}),
+    ("below 1 lakh", {"price_max": 100000}),
+    ("laptops under 80k", {"price_max": 80000, "category": "Laptops"}),
+    ("around 40k", {"price_min": 35000, "price_max": 45000}),
+    ("samsung phone 20-30k", {"price_min": 20000, "price_max": 30000, "category": "Smartphones", "brand": "Samsung"}),
+    ("55 inch tv under 1.5 lakh", {"price_max": 150000, "category": "Televisions"}),
+    ("1.5 ton ac under ₹40,000", {"price_max": 40000, "category": "Air Conditioners"}),
+    ("budget of Rs 25000 for a washing machine", {"price_max": 25000, "category": "Washing Machines"}),
+    ("fridge from 20 thousand to 35 thousand", {"price_min": 20000, "price_max": 35000, "category": "Refrigerators"}),
+    ("I am looking for smartphones.", {"category": "Smartphones"}),
+    ("My phone number is 9993536438", {}),
+    ("695-0746.", {}),
+    ("598252", {}),
+    ("under 8 gb ram", {}),
+    ("What are your store hours?", {}),
+]
+
+
+def _load_corpus(corpus_path: str):
+    if not os.path.exists(corpus_path):
+        return None
+    with open(corpus_path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def export(db_path: str, corpus_path: str):
+    labels = {entry["message"]: entry.get("expected") for entry in _load_corpus(corpus_path) or []}
+    with sqlite3.connect(db_path) as conn:
+        rows = conn.execute(
+            "SELECT message_content FROM conversations WHERE message_type = 'human' ORDER BY timestamp"
+        ).fetchall()
+    seen, corpus = set(), []
+    for (message,) in rows:
+        message = (message or "").strip()
+        if not message or message in seen:
+            continue
+        seen.add(message)
+        corpus.append({"message": message, "expected": labels.get(message)})
+    os.makedirs(os.path.dirname(corpus_path) or ".", exist_ok=True)
+    with open(corpus_path, "w", encoding="utf-8") as f:
+        json.dump(corpus, f, ensure_ascii=False, indent=1)
+    unlabelled = sum(entry["expected"] is None for entry in corpus)
+    print(f"✅ Exported {len(corpus)} distinct messages ({len(rows)} total) to {corpus_path}, "
+          f"{unlabelled} still to label by hand")
+
+
+def _same(actual, expected) -> bool:
+    return {k: (float(v) if k.startswith("price_") else v) for k, v in actual.items()} == \
+           {k: (float(v) if k.startswith("price_") else v) for k, v in expected.items()}
+
+
+def run(corpus_path: str, repeat: int):
+    cases = list(LABELLED_CASES)
+    corpus = _load_corpus(corpus_path)
+    if corpus is None:
+        print(f"⚠️  No corpus at {corpus_path}; checking the built-in cases only")
+    else:
+        labelled = [(entry["message"], entry["expected"]) for entry in corpus if entry.get("expected") is not None]
+        cases += labelled
+        if len(labelled) < len(corpus):
+            print(f"⚠️  Skipping {len(corpus) - len(labelled)} corpus messages not labelled yet")
+
+    mismatches = 0
+    for message, expected in cases:
+        actual = parse_query_intent(message)
+        if not _same(actual, expected):
+            mismatches += 1
+            print(f"❌ {message[:60]!r}: got {actual}, expected {expected}")
+
+    messages = [message for message, _ in cases]
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for message in messages:
+            parse_query_intent(message)
+    per_message_us = (time.perf_counter() - start) * 1e6 / (repeat * len(messages))
+
+    intents = [parse_query_intent(message) for message in messages]
+    print(json.dumps({
+        "messages": len(messages),
+        "mismatches": mismatches,
+        "with_hints": sum(has_search_hints(intent, message) for intent, message in zip(intents, messages)),
+        "with_price": sum("price_min" in intent or "price_max" in intent for intent in intents),
+        "with_category": sum("category" in intent for intent in intents),
+        "with_brand": sum("brand" in intent for intent in intents),
+        "parse_us_per_message": round(per_message_us, 1),
+    }, indent=2))
+    if mismatches:
+        raise SystemExit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the query intent parser on logged user messages")
+    parser.add_argument("command", choices=["export", "run"])
+    parser.add_argument("--db", default="conversation.db")
+    parser.add_argument("--corpus", default=CORPUS_PATH)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export(args.db, args.corpus)
+    else:
+        run(args.corpus, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
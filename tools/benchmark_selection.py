@@ -0,0 +1,172 @@
+"""
+Benchmark product result selection over recorded vector query responses.
+
+Usage:
+    python -m tools.benchmark_selection record [--fixtures data/selection_fixtures.json] [--fetch-k 200]
+    python -m tools.benchmark_selection run [--fixtures data/selection_fixtures.json] [--repeat 200]
+
+"record" runs the sample queries against the configured product index (Pinecone or the
+local snapshot) and stores the raw matches. "run" replays them through the previous
+two-pass selection and the single-pass brand-bucketed selection, checks that the new
+output is identical whenever the capped round fills top_k and never returns fewer
+products, and reports the time per selection and brand diversity of each.
+"""
+
+import os
+import json
+import time
+import argparse
+
+from tools.brand_lexicon import brand_from_metadata
+from tools.local_vector_index import LocalMatch
+from tools.result_selection import select_products, default_max_per_brand
+
+FIXTURES_PATH = "data/selection_fixtures.json"
+
+SAMPLE_SEARCHES = [
+    {"query": "samsung smartphone", "price_min": None, "price_max": None},
+    {"query": "smartphone under 20000", "price_min": None, "price_max": 20000},
+    {"query": "1.5 ton split ac", "price_min": None, "price_max": None},
+    {"query": "inverter ac", "price_min": 30000, "price_max": 60000},
+    {"query": "front load washing machine", "price_min": None, "price_max": None},
+    {"query": "double door refrigerator", "price_min": 20000, "price_max": None},
+    {"query": "55 inch 4k smart tv", "price_min": None, "price_max": None},
+    {"query": "gaming laptop", "price_min": 50000, "price_max": 120000},
+    {"query": "wireless earbuds", "price_min": None, "price_max": 5000},
+    {"query": "trimmer for men", "price_min": None, "price_max": None},
+    {"query": "lg tv", "price_min": None, "price_max": None},
+    {"query": "iphone", "price_min": None, "price_max": None},
+]
+
+
+def legacy_select(matches, top_k, price_min, price_max):
+    """The previous selection: capped pass, then a full rescan with the cap lifted to top_k."""
+    def one_pass(max_per_brand):
+        results, brand_counts = [], {}
+        for match in matches:
+            metadata = match.metadata or {}
+            product_name = metadata.get("product_name", "").strip()
+            if not product_name or product_name.lower() in ['unknown', 'n/a', 'null']:
+                continue
+            brand = brand_from_metadata(metadata, product_name)
+            try:
+                price_val = float(metadata.get("price", 0))
+                if price_val <= 0:
+                    continue
+            except (ValueError, TypeError):
+                continue
+            if price_min is not None and price_val < price_min:
+                continue
+            if price_max is not None and price_val > price_max:
+                continue
+            if brand_counts.get(brand, 0) >= max_per_brand:
+                continue
+            text = metadata.get("text", "")
+            results.append({
+                "id": match.id,
+                "product_id": metadata.get("product_id", match.id),
+                "score": round(match.score, 4),
+                "product_name": product_name,
+                "brand": brand,
+                "sku": metadata.get("sku", "N/A"),
+                "price": price_val,
+                "url": metadata.get("url", "").strip(),
+                "image_url": metadata.get("image_url", "").strip(),
+                "description": text[:200] + "..." if text else ""
+            })
+            brand_counts[brand] = brand_counts.get(brand, 0) + 1
+            if len(results) >= top_k:
+                break
+        return results
+
+    results = one_pass(3 if top_k <= 5 else 2)
+    if len(results) < top_k and len(matches) > len(results):
+        results = one_pass(top_k)
+    return results
+
+
+def record(fixtures_path: str, fetch_k: int):
+    from tools.product_search_tool import product_search_instance
+
+    if not product_search_instance.ensure_initialized():
+        raise SystemExit("❌ Product index is not available")
+    cases = []
+    for search in SAMPLE_SEARCHES:
+        vector = product_search_instance.model.encode_query(search["query"])
+        response = product_search_instance._query_index(vector=vector, top_k=fetch_k, include_metadata=True)
+        cases.append({
+            **search,
+            "matches": [{"id": m.id, "score": float(m.score), "metadata": dict(m.metadata or {})} for m in response.matches],
+        })
+        print(f"📥 {search['query']}: {len(response.matches)} matches")
+    os.makedirs(os.path.dirname(fixtures_path) or ".", exist_ok=True)
+    with open(fixtures_path, "w", encoding="utf-8") as f:
+        json.dump(cases, f, ensure_ascii=False)
+    print(f"✅ Recorded {len(cases)} responses to {fixtures_path}")
+
+
+def _time_per_call(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) * 1e6 / repeat
+
+
+def run(fixtures_path: str, repeat: int, top_ks):
+    with open(fixtures_path, encoding="utf-8") as f:
+        cases = json.load(f)
+
+    totals = {"legacy_us": 0.0, "single_pass_us": 0.0, "identical": 0, "relaxed": 0, "cases": 0}
+    print(f"{'query':32} {'k':>3} {'legacy µs':>10} {'new µs':>8} {'brands':>9} {'same':>5}")
+    for case in cases:
+        matches = [LocalMatch(m["id"], m["score"], m["metadata"]) for m in case["matches"]]
+        for top_k in top_ks:
+            args = (matches, top_k, case.get("price_min"), case.get("price_max"))
+            old = legacy_select(*args)
+            new = select_products(*args)
+
+            if len(new) < len(old):
+                raise AssertionError(f"{case['query']} top_k={top_k}: {len(new)} results < legacy {len(old)}")
+            capped = select_products(*args, relaxed_max_per_brand=default_max_per_brand(top_k))
+            identical = [p["id"] for p in old] == [p["id"] for p in new]
+            if len(capped) >= top_k and not identical:
+                raise AssertionError(f"{case['query']} top_k={top_k}: output differs although the capped round filled")
+
+            old_us = _time_per_call(lambda: legacy_select(*args), repeat)
+            new_us = _time_per_call(lambda: select_products(*args), repeat)
+            totals["legacy_us"] += old_us
+            totals["single_pass_us"] += new_us
+            totals["identical"] += identical
+            totals["relaxed"] += len(capped) < top_k
+            totals["cases"] += 1
+
+            brands = f"{len({p['brand'] for p in old})}->{len({p['brand'] for p in new})}"
+            print(f"{case['query'][:32]:32} {top_k:>3} {old_us:>10.1f} {new_us:>8.1f} {brands:>9} {'yes' if identical else 'no':>5}")
+
+    print(json.dumps({
+        "cases": totals["cases"],
+        "identical": totals["identical"],
+        "needed_relaxation": totals["relaxed"],
+        "legacy_total_us": round(totals["legacy_us"], 1),
+        "single_pass_total_us": round(totals["single_pass_us"], 1),
+        "speedup": round(totals["legacy_us"] / totals["single_pass_us"], 2) if totals["single_pass_us"] else None,
+    }, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark product result selection on recorded responses")
+    parser.add_argument("command", choices=["record", "run"])
+    parser.add_argument("--fixtures", default=FIXTURES_PATH)
+    parser.add_argument("--fetch-k", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--top-k", type=int, nargs="+", default=[3, 5, 10, 20])
+    args = parser.parse_args()
+
+    if args.command == "record":
+        record(args.fixtures, args.fetch_k)
+    else:
+        run(args.fixtures, args.repeat, args.top_k)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Brand Lexicon
+Data-driven brand dictionary compiled once into a single word-boundary regex, so a
+product name is scanned in one pass instead of a chain of substring checks. Word
+boundaries also stop short aliases ("lg", "mi", "nova") matching inside other words.
+"""
+
+import re
+from typing import Optional, Dict, Any
+
+# Brand -> aliases. Order is precedence when a name mentions more than one brand.
+BRAND_ALIASES = [
+    ("Samsung", ["samsung"]),
+    ("OnePlus", ["oneplus", "one plus"]),
+    ("Xiaomi", ["xiaomi", "redmi", "mi"]),
+    ("Oppo", ["oppo"]),
+    ("Vivo", ["vivo"]),
+    ("Apple", ["iphone", "apple"]),
+    ("Nothing", ["nothing"]),
+    ("Realme", ["realme"]),
+    ("Motorola", ["motorola"]),
+    ("Philips", ["philips"]),
+    ("Braun", ["braun"]),
+    ("Panasonic", ["panasonic"]),
+    ("Havells", ["havells"]),
+    ("Syska", ["syska"]),
+    ("Nova", ["nova"]),
+    ("Kemei", ["kemei"]),
+    ("LG", ["lg"]),
+    ("Daikin", ["daikin"]),
+    ("Voltas", ["voltas"]),
+    ("Hitachi", ["hitachi"]),
+    ("Carrier", ["carrier"]),
+    ("Blue Star", ["blue star", "bluestar"]),
+    ("Godrej", ["godrej"]),
+    ("Whirlpool", ["whirlpool"]),
+    ("Lloyd", ["lloyd"]),
+    ("O General", ["o general", "ogeneral"]),
+    ("Mitsubishi", ["mitsubishi"]),
+    ("Haier", ["haier"]),
+]
+
+UNKNOWN_BRAND = "Unknown"
+
+_ALIAS_TO_BRAND = {}
+_BRAND_PRIORITY = {}
+for _priority, (_brand, _aliases) in enumerate(BRAND_ALIASES):
+    _BRAND_PRIORITY[_brand] = _priority
+    for _alias in _aliases:
+        _ALIAS_TO_BRAND.setdefault(_alias, _brand)
+
+# Longest aliases first so "one plus" wins over shorter overlapping alternatives
+_BRAND_RE = re.compile(
+    r'\b(' + '|'.join(re.escape(a).replace(r'\ ', r'\s+') for a in sorted(_ALIAS_TO_BRAND, key=len, reverse=True)) + r')\b',
+    re.IGNORECASE
+)
+
+
+def detect_brand(product_name: str) -> str:
+    """Return the canonical brand mentioned in a product name, or "Unknown"."""
+    best = None
+    for match in _BRAND_RE.finditer(product_name or ""):
+        alias = re.sub(r'\s+', ' ', match.group(1).lower())
+        brand = _ALIAS_TO_BRAND[alias]
+        if best is None or _BRAND_PRIORITY[brand] < _BRAND_PRIORITY[best]:
+            best = brand
+            if _BRAND_PRIORITY[best] == 0:
+                break
+    return best or UNKNOWN_BRAND
+
+
+def brand_from_metadata(metadata: Dict[str, Any], product_name: Optional[str] = None) -> str:
+    """Prefer the brand resolved at ingest time; fall back to scanning the product name."""
+    brand = (metadata or {}).get("brand")
+    if brand:
+        return brand
+    return detect_brand(product_name if product_name is not None else (metadata or {}).get("product_name", ""))
+
+
+__all__ = ['BRAND_ALIASES', 'UNKNOWN_BRAND', 'detect_brand', 'brand_from_metadata']
@@ -0,0 +1,83 @@
+"""
+Catalog Categories
+Keyword category tagging for products, compiled once into a single word-boundary
+regex (same approach as the brand lexicon). Used at ingest to store a category on
+each product.
+"""
+
+import re
+
+# Category -> keywords. Order is precedence: more specific categories come first, so
+# "Galaxy Tab" is a tablet and "Soundbar for TV" is audio.
+CATEGORY_KEYWORDS = [
+    ("Washing Machines", ["washing machine", "washer", "laundry"]),
+    ("Air Conditioners", ["air conditioner", "split ac", "window ac", "inverter ac", "ac", "tonne", "ton"]),
+    ("Refrigerators", ["refrigerator", "fridge", "side by side", "double door", "single door"]),
+    ("Tablets", ["tablet", "tab", "ipad"]),
+    ("Smart Watches", ["smartwatch", "smart watch", "watch"]),
+    ("Audio", ["earphone", "earphones", "headphone", "headphones", "earbuds", "buds", "neckband",
+               "speaker", "speakers", "soundbar", "home theatre", "home theater"]),
+    ("Laptops", ["laptop", "notebook", "macbook", "chromebook"]),
+    ("Televisions", ["tv", "television", "led tv", "smart tv", "oled", "qled"]),
+    ("Smartphones", ["smartphone", "mobile", "phone", "iphone", "5g"]),
+    ("Personal Care", ["trimmer", "shaver", "hair dryer", "straightener", "epilator", "grooming"]),
+    ("Kitchen Appliances", ["microwave", "oven", "mixer grinder", "mixer", "grinder", "juicer", "air fryer",
+                            "induction", "kettle", "toaster", "chimney", "hob"]),
+    ("Water Purifiers", ["water purifier", "purifier", "ro"]),
+    ("Geysers", ["geyser", "water heater"]),
+    ("Air Coolers", ["air cooler", "cooler"]),
+    ("Fans", ["ceiling fan", "table fan", "pedestal fan", "fan"]),
+]
+
+UNKNOWN_CATEGORY = "Other"
+
+_KEYWORD_TO_CATEGORY = {}
+_CATEGORY_PRIORITY = {}
+for _priority, (_category, _keywords) in enumerate(CATEGORY_KEYWORDS):
+    _CATEGORY_PRIORITY[_category] = _priority
+    for _keyword in _keywords:
+        _KEYWORD_TO_CATEGORY.setdefault(_keyword, _category)
+
+
+def _category_regex(suffix: str = "") -> re.Pattern:
+    return re.compile(
+        r'\b(' + '|'.join(re.escape(k).replace(r'\ ', r'\s+') for k in sorted(_KEYWORD_TO_CATEGORY, key=len, reverse=True)) + r')' + suffix + r'\b',
+        re.IGNORECASE
+    )
+
+
+_CATEGORY_RE = _category_regex()
+# Queries also use plurals ("laptops", "tvs"); product titles are tagged on the exact keywords
+_QUERY_CATEGORY_RE = _category_regex("s?")
+
+
+def detect_category(product_name: str) -> str:
+    """Return the catalog category named by a product title, or "Other"."""
+    return _best_category(_CATEGORY_RE, product_name)
+
+
+def detect_query_category(query: str) -> str:
+    """Return the catalog category a search query asks for (plurals allowed), or "Other"."""
+    return _best_category(_QUERY_CATEGORY_RE, query)
+
+
+def _best_category(pattern: re.Pattern, text: str) -> str:
+    best = None
+    for match in pattern.finditer(text or ""):
+        category = _KEYWORD_TO_CATEGORY[re.sub(r'\s+', ' ', match.group(1).lower())]
+        if best is None or _CATEGORY_PRIORITY[category] < _CATEGORY_PRIORITY[best]:
+            best = category
+    return best or UNKNOWN_CATEGORY
+
+
+def category_allowed(category, categories) -> bool:
+    """
+    Whether a product's stored category passes a category filter.
+
+    Products without a category, or tagged "Other", always pass: keyword tagging misses
+    brand-only titles such as "Redmi Note 13 Pro" or "Boat Airdopes 141".
+    """
+    return not categories or not category or category == UNKNOWN_CATEGORY or category in categories
+
+
+__all__ = ['CATEGORY_KEYWORDS', 'UNKNOWN_CATEGORY', 'detect_category', 'detect_query_category', 'category_allowed']
@@ -0,0 +1,383 @@
+"""
+Catalog Ingestion Pipeline
+Pulls the product catalog (portal API or an exported file), normalizes it and derives
+brand, category, features and the canonical product URL, then writes the local
+snapshot and upserts the product index in batches.
+
+Each product's embedding text (name, brand, category and description) is hashed;
+products whose hash matches the previous snapshot reuse their stored vector, so a nightly
+refresh only re-embeds new or edited products. Changed texts are encoded in batches
+across worker processes.
+
+Usage:
+    python -m tools.catalog_ingest --source file --input exports/products.json [--upsert]
+    python -m tools.catalog_ingest --source api [--terms smartphone "split ac"] [--details] [--upsert]
+
+Files may be JSON (a list, or {"products": [...]}), JSON lines or CSV, with either
+portal fields (product_id, product_name, product_mrp, product_sku, uri_slug,
+product_image, sort_desc) or index fields (price, sku, url, image_url, text).
+Vector ids are the product_id.
+"""
+
+import os
+import re
+import csv
+import json
+import html
+import time
+import hashlib
+import argparse
+import multiprocessing
+from typing import Optional, List, Dict, Any, Tuple
+
+import numpy as np
+
+from tools.catalog_normalize import normalize_product_metadata
+from tools.catalog_categories import CATEGORY_KEYWORDS
+from tools.local_vector_index import LOCAL_INDEX_DIR, LocalVectorIndex, write_snapshot
+
+ENCODE_BATCH_SIZE = 64
+UPSERT_BATCH_SIZE = 100
+API_PAGE_SIZE = 50
+API_MAX_PAGES = 40
+
+_HTML_TAG_RE = re.compile(r'<[^>]+>')
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+# ---------------------------------------------------------------------------
+# Sources
+# ---------------------------------------------------------------------------
+
+def load_products_from_file(path: str) -> List[Dict[str, Any]]:
+    """Read raw product rows from a JSON, JSON lines or CSV export."""
+    if path.endswith(".csv"):
+        with open(path, newline="", encoding="utf-8") as f:
+            return list(csv.DictReader(f))
+    with open(path, encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            return [json.loads(line) for line in f if line.strip()]
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = data.get("products") or data.get("data") or []
+    return list(data)
+
+
+def fetch_products_from_api(terms: List[str], details: bool = False, city: str = "INDORE") -> List[Dict[str, Any]]:
+    """Page through the portal search API for each term; optionally add product_detail fields."""
+    import httpx
+    from tools.Search_latest_product import LOTUS_API_BASE, LOTUS_API_HEADERS
+
+    products = {}
+    with httpx.Client(headers=LOTUS_API_HEADERS, timeout=30) as client:
+        for term in terms:
+            for page in range(API_MAX_PAGES):
+                response = client.post(f"{LOTUS_API_BASE}/search_products", data={
+                    "search_text": term,
+                    "alias": "",
+                    "is_brand_search": "0",
+                    "limit": str(API_PAGE_SIZE),
+                    "offset": str(page * API_PAGE_SIZE),
+                    "orderby": ""
+                })
+                response.raise_for_status()
+                data = response.json().get("data")
+                batch = data.get("products", []) if isinstance(data, dict) else (data or [])
+                for product in batch:
+                    if product.get("product_id"):
+                        products.setdefault(str(product["product_id"]), product)
+                if len(batch) < API_PAGE_SIZE:
+                    break
+            print(f"📥 '{term}': {len(products)} products so far")
+
+        if details:
+            for count, (product_id, product) in enumerate(products.items(), start=1):
+                try:
+                    response = client.post(f"{LOTUS_API_BASE}/product_detail", data={"product_id": product_id, "city": city})
+                    response.raise_for_status()
+                    product.update(response.json().get("data", {}).get("product_detail", {}) or {})
+                except Exception as e:
+                    print(f"⚠️  product_detail failed for {product_id}: {e}")
+                if count % 100 == 0:
+                    print(f"📥 Details fetched for {count}/{len(products)} products")
+    return list(products.values())
+
+
+# ---------------------------------------------------------------------------
+# Normalization
+# ---------------------------------------------------------------------------
+
+def _clean_text(value) -> str:
+    if isinstance(value, (list, tuple)):
+        value = ", ".join(str(v) for v in value if v)
+    elif isinstance(value, dict):
+        value = ", ".join(f"{k}: {v}" for k, v in value.items() if v)
+    text = html.unescape(_HTML_TAG_RE.sub(" ", str(value or "")))
+    return _WHITESPACE_RE.sub(" ", text).strip()
+
+
+def to_index_record(raw: Dict[str, Any]) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """Map a portal or exported row to (vector id, normalized metadata); None when unusable."""
+    product_id = str(raw.get("product_id") or raw.get("id") or "").strip()
+    product_name = _clean_text(raw.get("product_name"))
+    if not product_id or not product_name:
+        return None
+
+    image = raw.get("image_url") or raw.get("product_image") or ""
+    if isinstance(image, (list, tuple)):
+        image = image[0] if image else ""
+    text = (raw.get("text") or raw.get("sort_desc") or raw.get("meta_desc")
+            or raw.get("product_features") or raw.get("product_specification") or "")
+
+    metadata = normalize_product_metadata({
+        "product_id": product_id,
+        "product_name": product_name,
+        "price": raw.get("price", raw.get("product_mrp")),
+        "sku": str(raw.get("sku") or raw.get("product_sku") or "N/A").strip(),
+        "url": str(raw.get("url") or raw.get("uri_slug") or "").strip(),
+        "image_url": str(image or "").strip(),
+        "text": _clean_text(text),
+    }, product_id)
+    if "price" not in metadata:
+        return None
+    return product_id, metadata
+
+
+def embedding_text(metadata: Dict[str, Any]) -> str:
+    """The text that is embedded for a product."""
+    parts = [metadata.get("product_name", ""), metadata.get("brand", ""), metadata.get("category", ""), metadata.get("text", "")]
+    return " | ".join(p for p in parts if p)
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+# ---------------------------------------------------------------------------
+# Encoding
+# ---------------------------------------------------------------------------
+
+_worker_service = None
+
+
+def _init_encoder_worker(threads_per_worker: int):
+    """Process initializer: cap native threads, then load the embedding model once."""
+    global _worker_service
+    os.environ["OMP_NUM_THREADS"] = str(threads_per_worker)
+    os.environ["ONNX_NUM_THREADS"] = str(threads_per_worker)
+    from tools.embedding_service import EmbeddingService
+    _worker_service = EmbeddingService()
+
+
+def _encode_chunk(texts: List[str]) -> np.ndarray:
+    return np.asarray(_worker_service.encode(texts), dtype=np.float32)
+
+
+def encode_texts(texts: List[str], workers: int = 1, batch_size: int = ENCODE_BATCH_SIZE) -> np.ndarray:
+    """Encode texts in batches, spread over `workers` processes when there is enough work."""
+    if not texts:
+        return np.zeros((0, 0), dtype=np.float32)
+    chunks = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+    workers = max(1, min(workers, len(chunks)))
+    threads_per_worker = max(1, (os.cpu_count() or 1) // workers)
+
+    if workers == 1:
+        _init_encoder_worker(threads_per_worker)
+        encoded = [_encode_chunk(chunk) for chunk in chunks]
+    else:
+        # spawn: the parent may already hold torch/onnxruntime thread pools, which do not survive fork
+        context = multiprocessing.get_context("spawn")
+        with context.Pool(workers, initializer=_init_encoder_worker, initargs=(threads_per_worker,)) as pool:
+            encoded = pool.map(_encode_chunk, chunks)
+    return np.vstack(encoded)
+
+
+# ---------------------------------------------------------------------------
+# Pipeline
+# ---------------------------------------------------------------------------
+
+def _load_previous(snapshot_dir: str) -> Optional[LocalVectorIndex]:
+    if not os.path.exists(os.path.join(snapshot_dir, "manifest.json")):
+        return None
+    return LocalVectorIndex(snapshot_dir)
+
+
+def _previous_vector(previous: LocalVectorIndex, row: int) -> np.ndarray:
+    vector = np.asarray(previous.vectors[row], dtype=np.float32)
+    if previous.scales is not None:
+        vector = vector * previous.scales[row]
+    return vector
+
+
+def _without_hash(metadata: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: v for k, v in metadata.items() if k != "content_hash"}
+
+
+def _pinecone_metadata(metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """Pinecone rejects null metadata values."""
+    return {k: v for k, v in metadata.items() if v is not None}
+
+
+def upsert_to_pinecone(index, ids: List[str], vectors: np.ndarray, metadatas: List[Dict[str, Any]],
+                       metadata_only: List[Tuple[str, Dict[str, Any]]], removed: List[str]):
+    """Batched upserts for new/re-embedded products, metadata updates and deletions."""
+    for start in range(0, len(ids), UPSERT_BATCH_SIZE):
+        index.upsert(vectors=[
+            {"id": vector_id, "values": vector.tolist(), "metadata": _pinecone_metadata(metadata)}
+            for vector_id, vector, metadata in zip(ids[start:start + UPSERT_BATCH_SIZE],
+                                                   vectors[start:start + UPSERT_BATCH_SIZE],
+                                                   metadatas[start:start + UPSERT_BATCH_SIZE])
+        ])
+    # Pinecone has no batch metadata update, so re-upsert each batch with its stored vectors
+    # (one fetch and one upsert per batch instead of one update request per product)
+    for start in range(0, len(metadata_only), UPSERT_BATCH_SIZE):
+        batch = metadata_only[start:start + UPSERT_BATCH_SIZE]
+        stored = index.fetch(ids=[vector_id for vector_id, _ in batch]).vectors
+        index.upsert(vectors=[
+            {"id": vector_id, "values": list(stored[vector_id].values), "metadata": _pinecone_metadata(metadata)}
+            for vector_id, metadata in batch if vector_id in stored
+        ])
+        missing = len(batch) - len(stored)
+        if missing:
+            print(f"⚠️  {missing} products with changed metadata are not in Pinecone; re-run with a full upsert")
+    for start in range(0, len(removed), UPSERT_BATCH_SIZE):
+        index.delete(ids=removed[start:start + UPSERT_BATCH_SIZE])
+    print(f"📤 Pinecone: upserted {len(ids)}, updated metadata {len(metadata_only)}, deleted {len(removed)}")
+
+
+def run_ingest(raw_products: List[Dict[str, Any]], source: str, snapshot_dir: str = LOCAL_INDEX_DIR,
+               dtype: str = "float16", workers: int = 1, pinecone_index=None,
+               delete_missing: bool = False, dry_run: bool = False) -> Dict[str, Any]:
+    """
+    Normalize products, re-embed only changed ones, and write the snapshot / index.
+
+    Args:
+        raw_products: Rows from the portal API or an export
+        source: Label stored in the snapshot manifest
+        snapshot_dir: Local snapshot directory (also the source of previous vectors)
+        dtype: Snapshot dtype ("float16", "int8" or "float32")
+        workers: Encoder processes
+        pinecone_index: Index to upsert into, or None to only write the snapshot
+        delete_missing: Drop products absent from this source (use with full exports only)
+        dry_run: Report the plan without encoding or writing anything
+    """
+    start = time.perf_counter()
+    records = {}
+    skipped = 0
+    for raw in raw_products:
+        record = to_index_record(raw)
+        if record is None:
+            skipped += 1
+            continue
+        records[record[0]] = record[1]
+
+    previous = _load_previous(snapshot_dir)
+    previous_rows = {vector_id: row for row, vector_id in enumerate(previous.ids)} if previous is not None else {}
+
+    to_embed, metadata_only, unchanged = [], [], []
+    for vector_id, metadata in records.items():
+        # The hash covers exactly the embedded text, so a product is re-embedded whenever its
+        # vector would change (including a brand or category re-tag) and never otherwise
+        metadata["content_hash"] = content_hash(embedding_text(metadata))
+        row = previous_rows.get(vector_id)
+        # Hashed from the previous metadata rather than its stored hash, so snapshots written
+        # with another hash definition are compared on their actual text
+        if row is None or content_hash(embedding_text(previous.metadatas[row])) != metadata["content_hash"]:
+            to_embed.append(vector_id)
+        elif _without_hash(previous.metadatas[row]) != _without_hash(metadata):
+            metadata_only.append(vector_id)
+        else:
+            unchanged.append(vector_id)
+
+    missing = [vector_id for vector_id in previous_rows if vector_id not in records]
+    removed = missing if delete_missing else []
+    report = {
+        "source": source,
+        "products": len(records),
+        "skipped_invalid": skipped,
+        "re_embedded": len(to_embed),
+        "metadata_updated": len(metadata_only),
+        "unchanged": len(unchanged),
+        "removed": len(removed),
+        "kept_from_previous": len(missing) - len(removed),
+    }
+    print(f"🧮 Plan: {json.dumps(report)}")
+    if dry_run:
+        return report
+
+    encode_start = time.perf_counter()
+    new_vectors = encode_texts([embedding_text(records[i]) for i in to_embed], workers=workers)
+    report["encode_seconds"] = round(time.perf_counter() - encode_start, 2)
+    new_rows = {vector_id: i for i, vector_id in enumerate(to_embed)}
+
+    ids, vectors, metadatas = [], [], []
+    for vector_id, metadata in records.items():
+        if vector_id in new_rows:
+            vectors.append(new_vectors[new_rows[vector_id]])
+        else:
+            vectors.append(_previous_vector(previous, previous_rows[vector_id]))
+        ids.append(vector_id)
+        metadatas.append(metadata)
+    for vector_id in missing:
+        if vector_id not in removed:
+            row = previous_rows[vector_id]
+            ids.append(vector_id)
+            vectors.append(_previous_vector(previous, row))
+            metadatas.append(previous.metadatas[row])
+
+    if ids:
+        write_snapshot(snapshot_dir, ids, np.vstack(vectors), metadatas, dtype=dtype,
+                       extra_manifest={"source": source, "ingest": report})
+    if pinecone_index is not None:
+        upsert_to_pinecone(
+            pinecone_index, to_embed, new_vectors, [records[i] for i in to_embed],
+            [(i, records[i]) for i in metadata_only], removed
+        )
+
+    from tools.search_result_cache import bump_catalog_version
+    bump_catalog_version()
+
+    report["seconds"] = round(time.perf_counter() - start, 2)
+    print(f"✅ Ingest finished: {json.dumps(report)}")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest the product catalog into the local snapshot and vector index")
+    parser.add_argument("--source", choices=["file", "api"], required=True)
+    parser.add_argument("--input", help="Exported catalog file (--source file)")
+    parser.add_argument("--terms", nargs="+", default=[keywords[0] for _, keywords in CATEGORY_KEYWORDS],
+                        help="Portal search terms to crawl (--source api)")
+    parser.add_argument("--details", action="store_true", help="Fetch product_detail for every product (--source api)")
+    parser.add_argument("--snapshot-dir", default=LOCAL_INDEX_DIR)
+    parser.add_argument("--dtype", choices=["float16", "int8", "float32"], default="float16")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument("--upsert", action="store_true", help="Also upsert changes into the Pinecone product index")
+    parser.add_argument("--delete-missing", action="store_true", help="Remove products absent from this source")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    if args.source == "file":
+        if not args.input:
+            parser.error("--input is required with --source file")
+        raw_products = load_products_from_file(args.input)
+        source = f"file:{os.path.basename(args.input)}"
+    else:
+        raw_products = fetch_products_from_api(args.terms, details=args.details)
+        source = "portal-api"
+    print(f"📦 Loaded {len(raw_products)} raw products from {source}")
+
+    pinecone_index = None
+    if args.upsert and not args.dry_run:
+        from tools.product_search_tool import product_search_instance
+        product_search_instance.ensure_initialized()
+        pinecone_index = product_search_instance.pinecone_index
+        if pinecone_index is None:
+            raise SystemExit("❌ Pinecone index is not reachable")
+
+    run_ingest(raw_products, source, snapshot_dir=args.snapshot_dir, dtype=args.dtype, workers=args.workers,
+               pinecone_index=pinecone_index, delete_missing=args.delete_missing, dry_run=args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+Catalog Metadata Normalization
+Shared helpers that guarantee product metadata has the fields the search path relies on
+(numeric price so Pinecone range filters work, plus the product card fields brand,
+category, features, canonical URL and image URL, derived once at ingest) and build the
+matching query filters.
+
+Fix existing records in the Pinecone product index with:
+    python -m tools.catalog_normalize fix-metadata [--dry-run]
+"""
+
+import re
+from typing import Optional, List, Dict, Any
+
+from tools.brand_lexicon import detect_brand
+from tools.catalog_categories import detect_category
+
+_PRICE_NUMBER_RE = re.compile(r'\d[\d,]*(?:\.\d+)?')  # first number, so the dot of "Rs." is ignored
+
+PRODUCT_URL_TEMPLATE = "https://www.lotuselectronics.com/product/{slug}/{product_id}"
+CDN_IMAGE_TEMPLATE = "https://cdn.lotuselectronics.com/webpimages/{product_id}IM.webp"
+CARD_FEATURE_COUNT = 3
+FEATURE_SKIP_TERMS = ['processor:', 'operating system:', 'camera back:', 'internal memory:', 'network:']
+FEATURE_INVALID_TERMS = ['undefined', 'null', 'n/a', '...']
+
+
+def coerce_price(value) -> Optional[float]:
+    """Convert a price such as 12999, "12999.00", "₹1,23,456" or "Rs. 12,999" to a positive float, else None."""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        price = float(value)
+    else:
+        match = _PRICE_NUMBER_RE.search(str(value))
+        if not match:
+            return None
+        price = float(match.group().replace(',', ''))
+    return price if price > 0 else None
+
+
+def product_description(text: str) -> str:
+    """The short description shown for a product (first 200 characters of its text)."""
+    return text[:200] + "..." if text else ""
+
+
+def extract_features(description: str, limit: int = 3) -> List[str]:
+    """Pick up to `limit` short feature phrases from a product description."""
+    features = []
+    if description and len(description) > 20:
+        clean_desc = description.replace('|', ',').replace(':', ',')
+        for feature in clean_desc.split(','):
+            cleaned = feature.strip().rstrip('.,;:')
+            lowered = cleaned.lower()
+            if (5 <= len(cleaned) <= 40 and
+                    not any(skip in lowered for skip in FEATURE_SKIP_TERMS) and
+                    not any(invalid in lowered for invalid in FEATURE_INVALID_TERMS)):
+                features.append(cleaned)
+                if len(features) >= limit:
+                    break
+    return features
+
+
+# (name keywords, defaults) used when a description yields fewer than CARD_FEATURE_COUNT features
+DEFAULT_FEATURES = [
+    (['smartphone', 'phone', 'mobile', 'galaxy', 'redmi', 'oneplus'], ["High Resolution Camera", "Fast Performance", "Long Battery Life"]),
+    (['earphone', 'headphone', 'buds', 'speaker'], ["Premium Sound Quality", "Wireless Connectivity", "Comfortable Design"]),
+    (['tv', 'television', 'smart tv'], ["Full HD Display", "Smart Features", "Energy Efficient"]),
+    (['laptop', 'computer'], ["High Performance", "Portable Design", "Latest Technology"]),
+]
+GENERIC_FEATURES = ["Latest Technology", "High Quality Build", "Great Value for Money"]
+
+
+def card_features(product_name: str, description: str) -> List[str]:
+    """Features shown on a product card: extracted ones topped up with category defaults."""
+    features = extract_features(description, CARD_FEATURE_COUNT)
+    if len(features) < CARD_FEATURE_COUNT:
+        name = (product_name or "").lower()
+        defaults = next((d for keywords, d in DEFAULT_FEATURES if any(k in name for k in keywords)), GENERIC_FEATURES)
+        features.extend(defaults[:CARD_FEATURE_COUNT - len(features)])
+    return features
+
+
+def default_image_url(product_id) -> str:
+    """CDN image for numeric product ids, or "" when none can be synthesized."""
+    product_id = str(product_id or "")
+    return CDN_IMAGE_TEMPLATE.format(product_id=product_id) if product_id.isdigit() else ""
+
+
+def canonical_product_url(slug: str, product_id) -> str:
+    """Storefront URL for a product, or "" when the slug or id is missing."""
+    slug = (slug or "").strip()
+    if not slug or not product_id:
+        return ""
+    return PRODUCT_URL_TEMPLATE.format(slug=slug, product_id=product_id)
+
+
+def normalize_product_metadata(metadata: Dict[str, Any], product_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Return a copy of product metadata with a numeric price (dropped when invalid) and the
+    derived product card fields brand, category, features, product_url and image_url
+    (kept when already present).
+    """
+    normalized = dict(metadata or {})
+    price = coerce_price(normalized.get("price"))
+    if price is None:
+        normalized.pop("price", None)
+    else:
+        normalized["price"] = price
+
+    product_name = normalized.get("product_name", "")
+    if not normalized.get("brand"):
+        normalized["brand"] = detect_brand(product_name)
+    if not normalized.get("category"):
+        normalized["category"] = detect_category(product_name)
+    if not normalized.get("features"):
+        normalized["features"] = card_features(product_name, product_description(normalized.get("text", "")))
+    if not normalized.get("product_url"):
+        url = canonical_product_url(normalized.get("url", ""), normalized.get("product_id") or product_id)
+        if url:
+            normalized["product_url"] = url
+    if not normalized.get("image_url"):
+        image_url = default_image_url(normalized.get("product_id"))
+        if image_url:
+            normalized["image_url"] = image_url
+    return normalized
+
+
+def build_price_filter(price_min: Optional[float] = None, price_max: Optional[float] = None) -> Optional[Dict[str, Any]]:
+    """Pinecone metadata filter for a price range, or None when there are no bounds."""
+    bounds = {}
+    if price_min is not None:
+        bounds["$gte"] = float(price_min)
+    if price_max is not None:
+        bounds["$lte"] = float(price_max)
+    return {"price": bounds} if bounds else None
+
+
+def fix_pinecone_metadata(index, dry_run: bool = False, batch_size: int = 100) -> Dict[str, int]:
+    """Rewrite price and derived metadata in place so search uses ingest-time values."""
+    counts = {"checked": 0, "fixed": 0, "invalid_price": 0}
+    for id_batch in index.list():
+        id_batch = list(id_batch)
+        for start in range(0, len(id_batch), batch_size):
+            rewrites = []
+            fetched = index.fetch(ids=id_batch[start:start + batch_size])
+            for vector_id, record in fetched.vectors.items():
+                counts["checked"] += 1
+                original = dict(record.metadata or {})
+                normalized = normalize_product_metadata(original, vector_id)
+                if "price" not in normalized:
+                    counts["invalid_price"] += 1
+                if "price" in original and "price" not in normalized:
+                    # set_metadata cannot delete a key, so rewrite the record without the invalid
+                    # price; left in place it hides the product from every $gte/$lte price filter
+                    counts["fixed"] += 1
+                    rewrites.append({"id": vector_id, "values": list(record.values), "metadata": normalized})
+                    continue
+                changes = {k: v for k, v in normalized.items() if original.get(k) != v}
+                if not changes:
+                    continue
+                counts["fixed"] += 1
+                if not dry_run:
+                    index.update(id=vector_id, set_metadata=changes)
+            if rewrites and not dry_run:
+                index.upsert(vectors=rewrites)
+        print(f"🔧 Checked {counts['checked']} products, fixed {counts['fixed']}, invalid price {counts['invalid_price']}")
+    return counts
+
+
+def main():
+    import argparse
+    from tools.product_search_tool import product_search_instance
+
+    parser = argparse.ArgumentParser(description="Normalize product metadata in the vector index")
+    parser.add_argument("command", choices=["fix-metadata"])
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    product_search_instance.ensure_initialized()
+    if product_search_instance.pinecone_index is None:
+        raise SystemExit("❌ Pinecone index is not reachable")
+    counts = fix_pinecone_metadata(product_search_instance.pinecone_index, dry_run=args.dry_run)
+    if counts["fixed"] and not args.dry_run:
+        from tools.search_result_cache import bump_catalog_version
+        bump_catalog_version()
+
+
+if __name__ == "__main__":
+    main()
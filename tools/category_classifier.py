@@ -0,0 +1,95 @@
+"""
+Query Category Classifier
+Each catalog category is represented by the normalized mean of its products' vectors
+(computed when a snapshot is written). A query is classified by comparing the
+embedding search already produced against these centroids, which costs one small
+matrix-vector product, and search keeps only candidates in the predicted categories.
+"""
+
+import os
+import json
+from typing import Optional, List, Dict, Any, Tuple
+
+import numpy as np
+
+from tools.catalog_categories import UNKNOWN_CATEGORY
+
+CENTROIDS_FILE = "centroids.npy"
+CATEGORIES_FILE = "categories.json"
+MIN_CATEGORY_PRODUCTS = 5
+CATEGORY_MIN_SIMILARITY = float(os.getenv("CATEGORY_MIN_SIMILARITY", "0.30"))
+CATEGORY_MARGIN = float(os.getenv("CATEGORY_MARGIN", "0.05"))
+MAX_PREDICTED_CATEGORIES = 3
+
+
+def compute_category_centroids(vectors: np.ndarray, metadatas: List[Dict[str, Any]]) -> Tuple[List[str], np.ndarray]:
+    """Normalized mean vector per category with at least MIN_CATEGORY_PRODUCTS products."""
+    rows_by_category = {}
+    for row, metadata in enumerate(metadatas):
+        category = metadata.get("category")
+        if category and category != UNKNOWN_CATEGORY:
+            rows_by_category.setdefault(category, []).append(row)
+
+    categories, centroids = [], []
+    for category, rows in sorted(rows_by_category.items()):
+        if len(rows) < MIN_CATEGORY_PRODUCTS:
+            continue
+        centroid = np.asarray(vectors[rows], dtype=np.float32).mean(axis=0)
+        centroids.append(centroid / max(float(np.linalg.norm(centroid)), 1e-12))
+        categories.append(category)
+    dimension = vectors.shape[1] if len(vectors) else 0
+    return categories, np.asarray(centroids, dtype=np.float32).reshape(len(categories), dimension)
+
+
+def write_centroids(output_dir: str, vectors: np.ndarray, metadatas: List[Dict[str, Any]]) -> List[str]:
+    categories, centroids = compute_category_centroids(vectors, metadatas)
+    np.save(os.path.join(output_dir, CENTROIDS_FILE), centroids)
+    with open(os.path.join(output_dir, CATEGORIES_FILE), "w", encoding="utf-8") as f:
+        json.dump(categories, f)
+    return categories
+
+
+class CategoryClassifier:
+    """Nearest-centroid classification of query embeddings."""
+
+    def __init__(self, categories: List[str], centroids: np.ndarray,
+                 min_similarity: float = CATEGORY_MIN_SIMILARITY, margin: float = CATEGORY_MARGIN):
+        self.categories = categories
+        self.centroids = centroids
+        self.min_similarity = min_similarity
+        self.margin = margin
+
+    def similarities(self, vector) -> np.ndarray:
+        query = np.asarray(vector, dtype=np.float32)
+        return self.centroids @ (query / max(float(np.linalg.norm(query)), 1e-12))
+
+    def predict(self, vector) -> List[str]:
+        """Categories within `margin` of the best match, or [] when no category is close enough."""
+        if not self.categories:
+            return []
+        scores = self.similarities(vector)
+        best = float(scores.max())
+        if best < self.min_similarity:
+            return []
+        order = np.argsort(-scores)[:MAX_PREDICTED_CATEGORIES]
+        return [self.categories[i] for i in order if scores[i] >= best - self.margin]
+
+
+def load_category_classifier(snapshot_dir: str) -> Optional[CategoryClassifier]:
+    """Load the centroids written with the snapshot, or None if there are none."""
+    centroids_path = os.path.join(snapshot_dir, CENTROIDS_FILE)
+    categories_path = os.path.join(snapshot_dir, CATEGORIES_FILE)
+    if not (os.path.exists(centroids_path) and os.path.exists(categories_path)):
+        return None
+    try:
+        with open(categories_path, encoding="utf-8") as f:
+            categories = json.load(f)
+        classifier = CategoryClassifier(categories, np.load(centroids_path))
+        print(f"✅ Category classifier loaded: {len(categories)} category centroids")
+        return classifier
+    except Exception as e:
+        print(f"❌ Error loading category centroids: {e}")
+        return None
+
+
+__all__ = ['CategoryClassifier', 'compute_category_centroids', 'write_centroids', 'load_category_classifier']
@@ -0,0 +1,119 @@
+"""
+Micro-batching for query embeddings
+Collects queries that arrive within a short window (from many gevent greenlets or
+threads) and encodes them with a single batched model call, then hands every caller
+its own vector.
+"""
+
+import os
+import time
+import queue
+import threading
+from typing import Callable, List, Dict, Any
+
+EMBEDDING_BATCH_WINDOW_MS = float(os.getenv("EMBEDDING_BATCH_WINDOW_MS", "5"))
+EMBEDDING_MAX_BATCH = int(os.getenv("EMBEDDING_MAX_BATCH", "32"))
+
+
+class _PendingQuery:
+    """A single caller waiting for its embedding."""
+    __slots__ = ("text", "event", "vector", "error")
+
+    def __init__(self, text: str):
+        self.text = text
+        self.event = threading.Event()
+        self.vector = None
+        self.error = None
+
+
+class EmbeddingBatcher:
+    """Queue that coalesces concurrent encode requests into batches."""
+
+    def __init__(self, encode_batch: Callable[[List[str]], List[List[float]]],
+                 window_ms: float = EMBEDDING_BATCH_WINDOW_MS, max_batch: int = EMBEDDING_MAX_BATCH):
+        """
+        Args:
+            encode_batch: Function taking a list of texts and returning one vector per text
+            window_ms: How long to wait for more queries after the first one arrives
+            max_batch: Maximum number of distinct texts encoded in one call
+        """
+        self.encode_batch = encode_batch
+        self.window_seconds = window_ms / 1000.0
+        self.max_batch = max(1, max_batch)
+        self.batches = 0
+        self.queries = 0
+        self.largest_batch = 0
+        self._queue = None
+        self._worker = None
+        self._worker_pid = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_worker(self):
+        """Start the collector on first use, and again in each forked worker process."""
+        if self._worker_pid == os.getpid() and self._worker is not None and self._worker.is_alive():
+            return
+        with self._start_lock:
+            if self._worker_pid == os.getpid() and self._worker is not None and self._worker.is_alive():
+                return
+            self._queue = queue.Queue()
+            self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+            self._worker_pid = os.getpid()
+            self._worker.start()
+
+    def submit(self, text: str) -> List[float]:
+        """Queue a text and block (cooperatively under gevent) until its vector is ready."""
+        self._ensure_worker()
+        pending = _PendingQuery(text)
+        self._queue.put(pending)
+        pending.event.wait()
+        if pending.error is not None:
+            raise pending.error
+        return pending.vector
+
+    def _collect(self) -> List[_PendingQuery]:
+        """Wait for one query, then gather more until the window closes or the batch is full."""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window_seconds
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+
+            # Identical queries in the same window are encoded once
+            texts = list(dict.fromkeys(p.text for p in batch))
+            try:
+                vectors = self.encode_batch(texts)
+                by_text = dict(zip(texts, vectors))
+                for pending in batch:
+                    pending.vector = by_text[pending.text]
+            except Exception as e:
+                for pending in batch:
+                    pending.error = e
+
+            self.batches += 1
+            self.queries += len(batch)
+            self.largest_batch = max(self.largest_batch, len(texts))
+            for pending in batch:
+                pending.event.set()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "window_ms": round(self.window_seconds * 1000, 2),
+            "max_batch": self.max_batch,
+            "batches": self.batches,
+            "queries": self.queries,
+            "avg_batch_size": round(self.queries / self.batches, 2) if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+        }
+
+
+__all__ = ['EmbeddingBatcher', 'EMBEDDING_BATCH_WINDOW_MS', 'EMBEDDING_MAX_BATCH']
@@ -0,0 +1,351 @@
+"""
+Shared Embedding Service
+Holds a single sentence-transformer model per process so that the product search
+and the Terms & Conditions search tools encode queries with the same weights.
+"""
+
+import os
+import re
+import json
+import time
+import socket
+import threading
+from collections import OrderedDict
+from typing import Optional, Dict, Any, List, Union
+
+try:
+    from sentence_transformers import SentenceTransformer
+    DEPENDENCIES_AVAILABLE = True
+except ImportError as e:
+    print(f"⚠️ Missing dependencies for embedding service: {e}")
+    DEPENDENCIES_AVAILABLE = False
+
+from memory_utils import get_memory_usage
+from worker_pools import run_in_pool
+from tools.embedding_batcher import EmbeddingBatcher, EMBEDDING_BATCH_WINDOW_MS
+
+EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "all-MiniLM-L6-v2")
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch").lower()  # "torch" or "onnx" (int8 quantized)
+# When set, workers ask the embedding sidecar (embedding_server.py) instead of loading the model
+EMBEDDING_SERVER_SOCKET = os.getenv("EMBEDDING_SERVER_SOCKET", "")
+EMBEDDING_SERVER_TIMEOUT = float(os.getenv("EMBEDDING_SERVER_TIMEOUT", "5"))
+EMBEDDING_SERVER_RETRY_SECONDS = 30
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "2048"))
+EMBEDDING_CACHE_TTL = int(os.getenv("EMBEDDING_CACHE_TTL", "86400"))  # 24 hours
+
+
+def normalize_query(text: str) -> str:
+    """Normalize query text for cache keys (MiniLM is uncased, so lowercasing is safe)."""
+    return re.sub(r'\s+', ' ', text or '').strip().lower()
+
+
+class EmbeddingCache:
+    """Bounded LRU cache of query embeddings with a per-entry TTL."""
+
+    def __init__(self, max_size: int = EMBEDDING_CACHE_SIZE, ttl_seconds: int = EMBEDDING_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._entries = OrderedDict()  # key -> (stored_at, vector)
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            stored_at, vector = entry
+            if time.monotonic() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return vector
+
+    def put(self, key: str, vector: List[float]):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic(), vector)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+class EmbeddingService:
+    """Process-wide wrapper around one SentenceTransformer instance."""
+
+    def __init__(self, model_name: str = EMBEDDING_MODEL_NAME, backend: str = EMBEDDING_BACKEND):
+        self.model_name = model_name
+        self.backend = backend
+        self.model = None
+        self.is_available = False
+        self.load_seconds = 0.0
+        self.model_rss_mb = 0.0
+        self.encode_calls = 0
+        self.encode_seconds = 0.0
+        self.cache = EmbeddingCache()
+        # Concurrent cache misses are coalesced into one batched encode (0 disables batching)
+        self.batcher = EmbeddingBatcher(self._encode_batch) if EMBEDDING_BATCH_WINDOW_MS > 0 else None
+        self._load_lock = threading.Lock()
+        self._encode_lock = threading.Lock()
+
+    def _create_model(self):
+        """Build the encoder for the configured backend, falling back to PyTorch."""
+        if self.backend == "onnx":
+            try:
+                from tools.onnx_encoder import OnnxSentenceEncoder
+                return OnnxSentenceEncoder()
+            except Exception as e:
+                print(f"⚠️ ONNX embedding backend unavailable ({e}), falling back to PyTorch")
+                self.backend = "torch"
+        if not DEPENDENCIES_AVAILABLE:
+            raise RuntimeError("sentence-transformers is not installed")
+        return SentenceTransformer(self.model_name)
+
+    def _load(self, in_pool: bool = False):
+        """Load the model once; later callers reuse the same instance."""
+        if self.model is not None:
+            return
+        with self._load_lock:
+            if self.model is not None:
+                return
+            try:
+                rss_before = get_memory_usage()
+                start = time.perf_counter()
+                self.model = run_in_pool("embedding", self._create_model) if in_pool else self._create_model()
+                self.load_seconds = time.perf_counter() - start
+                self.model_rss_mb = get_memory_usage() - rss_before
+                self.is_available = True
+                print(f"✅ Embedding model '{self.model_name}' ({self.backend}) loaded in {self.load_seconds:.1f}s (+{self.model_rss_mb:.1f} MB RSS)")
+            except Exception as e:
+                print(f"❌ Error loading embedding model: {e}")
+                self.is_available = False
+
+    def encode(self, text: Union[str, List[str]]):
+        """
+        Encode text with the shared model.
+
+        Encoding is serialized with a lock so concurrent callers never run the
+        model at the same time, and the model itself runs on the native "embedding"
+        pool so a gevent worker can keep serving other greenlets meanwhile.
+        """
+        self._load()
+        if self.model is None:
+            raise RuntimeError("Embedding model is not available")
+
+        with self._encode_lock:
+            start = time.perf_counter()
+            vector = run_in_pool("embedding", self.model.encode, text)
+            self.encode_seconds += time.perf_counter() - start
+            self.encode_calls += 1
+        return vector
+
+    def warm_up(self) -> bool:
+        """
+        Load the model on the native "embedding" pool and run one encode.
+
+        Called from the warm-up greenlet; the micro-batcher is not started here, it
+        starts on the first query from the request path.
+        """
+        self._load(in_pool=True)
+        if self.model is None:
+            return False
+        self.encode("warm up")
+        return True
+
+    def _encode_batch(self, texts: List[str]) -> List[List[float]]:
+        """Encode several texts in one model call (used by the micro-batcher)."""
+        return self.encode(texts).tolist()
+
+    def encode_query(self, query: str) -> List[float]:
+        """
+        Encode a single search query, serving repeated queries from the cache.
+
+        Returns a plain list of floats ready to send to Pinecone.
+        """
+        key = normalize_query(query)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return list(cached)
+
+        if self.batcher is not None:
+            vector = self.batcher.submit(key)
+        else:
+            vector = self.encode(key).tolist()
+        self.cache.put(key, vector)
+        return list(vector)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return model load and usage figures for health reporting."""
+        return {
+            "mode": "in_process",
+            "model_name": self.model_name,
+            "backend": self.backend,
+            "loaded": self.model is not None,
+            "load_seconds": round(self.load_seconds, 3),
+            "model_rss_mb": round(self.model_rss_mb, 1),
+            "process_rss_mb": round(get_memory_usage(), 1),
+            "encode_calls": self.encode_calls,
+            "avg_encode_ms": round(self.encode_seconds * 1000 / self.encode_calls, 2) if self.encode_calls else 0.0,
+            "query_cache": self.cache.stats(),
+            "batching": self.batcher.stats() if self.batcher is not None else None,
+        }
+
+
+class RemoteEmbeddingService:
+    """
+    Client for the shared embedding sidecar, with an in-process fallback.
+
+    Exposes the same encode/encode_query/stats interface as EmbeddingService. If the
+    sidecar is unreachable, the local model is loaded and used, and the sidecar is
+    retried after EMBEDDING_SERVER_RETRY_SECONDS.
+    """
+
+    def __init__(self, socket_path: str = EMBEDDING_SERVER_SOCKET, timeout: float = EMBEDDING_SERVER_TIMEOUT):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.is_available = True
+        self.cache = EmbeddingCache()
+        self.remote_calls = 0
+        self.remote_errors = 0
+        self.fallback_calls = 0
+        self._server_down_until = 0.0
+        self._local = None
+        self._local_lock = threading.Lock()
+
+    def _local_service(self) -> EmbeddingService:
+        if self._local is None:
+            with self._local_lock:
+                if self._local is None:
+                    self._local = EmbeddingService()
+        return self._local
+
+    def _request(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Send one JSON request over a fresh Unix socket connection."""
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+            sock.sendall((json.dumps(payload) + "\n").encode("utf-8"))
+            with sock.makefile("rb") as reader:
+                line = reader.readline()
+        response = json.loads(line)
+        if not response.get("ok"):
+            raise RuntimeError(response.get("error", "embedding server error"))
+        return response
+
+    def _remote_encode(self, texts: List[str]) -> Optional[List[List[float]]]:
+        """Encode on the sidecar, or return None if it is unavailable."""
+        if time.monotonic() < self._server_down_until:
+            return None
+        try:
+            vectors = self._request({"op": "encode", "texts": texts})["vectors"]
+            self.remote_calls += 1
+            return vectors
+        except Exception as e:
+            self.remote_errors += 1
+            self._server_down_until = time.monotonic() + EMBEDDING_SERVER_RETRY_SECONDS
+            print(f"⚠️ Embedding server unavailable ({e}), using in-process model")
+            return None
+
+    def encode(self, text: Union[str, List[str]]):
+        texts = [text] if isinstance(text, str) else list(text)
+        vectors = self._remote_encode(texts)
+        if vectors is None:
+            self.fallback_calls += 1
+            return self._local_service().encode(text)
+
+        import numpy as np
+        array = np.asarray(vectors, dtype=np.float32)
+        return array[0] if isinstance(text, str) else array
+
+    def warm_up(self) -> bool:
+        """Check the sidecar answers; load the local model instead if it does not."""
+        if self._remote_encode(["warm up"]) is None:
+            return self._local_service().warm_up()
+        return True
+
+    def encode_query(self, query: str) -> List[float]:
+        key = normalize_query(query)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return list(cached)
+
+        vectors = self._remote_encode([key])
+        if vectors is None:
+            self.fallback_calls += 1
+            vector = self._local_service().encode_query(key)
+        else:
+            vector = vectors[0]
+        self.cache.put(key, vector)
+        return list(vector)
+
+    def stats(self) -> Dict[str, Any]:
+        stats = {
+            "mode": "client",
+            "socket_path": self.socket_path,
+            "server_reachable": time.monotonic() >= self._server_down_until,
+            "remote_calls": self.remote_calls,
+            "remote_errors": self.remote_errors,
+            "fallback_calls": self.fallback_calls,
+            "process_rss_mb": round(get_memory_usage(), 1),
+            "query_cache": self.cache.stats(),
+            "local_model": self._local.stats() if self._local is not None else None,
+        }
+        if stats["server_reachable"]:
+            try:
+                stats["server"] = self._request({"op": "health"})["stats"]
+            except Exception as e:
+                stats["server_reachable"] = False
+                stats["server_error"] = str(e)
+        return stats
+
+
+_embedding_service = None
+_embedding_service_lock = threading.Lock()
+
+
+def get_embedding_service():
+    """
+    Return the process-wide embedding service, creating it on first use.
+
+    With EMBEDDING_SERVER_SOCKET set this is a client of the shared sidecar,
+    otherwise the model is loaded in this process.
+    """
+    global _embedding_service
+    if _embedding_service is None:
+        with _embedding_service_lock:
+            if _embedding_service is None:
+                if EMBEDDING_SERVER_SOCKET:
+                    _embedding_service = RemoteEmbeddingService()
+                else:
+                    _embedding_service = EmbeddingService()
+    return _embedding_service
+
+
+__all__ = ['EmbeddingService', 'RemoteEmbeddingService', 'EmbeddingCache', 'get_embedding_service',
+           'normalize_query', 'EMBEDDING_MODEL_NAME', 'EMBEDDING_SERVER_SOCKET']
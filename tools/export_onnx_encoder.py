@@ -0,0 +1,103 @@
+"""
+Export all-MiniLM-L6-v2 to ONNX and quantize it to int8 for the CPU embedding backend.
+
+Usage:
+    python -m tools.export_onnx_encoder [--output-dir models/all-MiniLM-L6-v2-onnx] [--min-cosine 0.99]
+
+Writes model.onnx, model_quantized.onnx and tokenizer.json, then checks that the
+quantized model agrees with the PyTorch model on a set of sample queries.
+"""
+
+import os
+import sys
+import argparse
+
+import numpy as np
+import torch
+from transformers import AutoModel, AutoTokenizer
+from onnxruntime.quantization import quantize_dynamic, QuantType
+
+from tools.onnx_encoder import OnnxSentenceEncoder, ONNX_MODEL_DIR, ONNX_MODEL_FILE
+
+HF_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+
+SAMPLE_QUERIES = [
+    "samsung ac",
+    "iphone 15",
+    "return policy",
+    "gaming laptop under 80000",
+    "5 star split ac 1.5 ton",
+    "front load washing machine",
+    "55 inch 4k smart tv",
+    "wireless earbuds with noise cancellation",
+    "warranty terms for refrigerator",
+    "delivery charges",
+]
+
+
+def export(output_dir: str):
+    """Export the transformer to ONNX with dynamic batch/sequence axes and quantize it."""
+    os.makedirs(output_dir, exist_ok=True)
+
+    tokenizer = AutoTokenizer.from_pretrained(HF_MODEL_NAME)
+    model = AutoModel.from_pretrained(HF_MODEL_NAME)
+    model.eval()
+
+    dummy = tokenizer(["export sample"], return_tensors="pt")
+    fp32_path = os.path.join(output_dir, "model.onnx")
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            (dummy["input_ids"], dummy["attention_mask"], dummy["token_type_ids"]),
+            fp32_path,
+            input_names=["input_ids", "attention_mask", "token_type_ids"],
+            output_names=["last_hidden_state"],
+            dynamic_axes={
+                "input_ids": {0: "batch", 1: "sequence"},
+                "attention_mask": {0: "batch", 1: "sequence"},
+                "token_type_ids": {0: "batch", 1: "sequence"},
+                "last_hidden_state": {0: "batch", 1: "sequence"},
+            },
+            opset_version=14,
+        )
+    print(f"✅ Exported FP32 model to {fp32_path}")
+
+    quantized_path = os.path.join(output_dir, ONNX_MODEL_FILE)
+    quantize_dynamic(fp32_path, quantized_path, weight_type=QuantType.QInt8)
+    print(f"✅ Quantized int8 model written to {quantized_path}")
+
+    # tokenizer.json is all the ONNX encoder needs at runtime
+    tokenizer.save_pretrained(output_dir)
+
+
+def verify(output_dir: str, min_cosine: float) -> bool:
+    """Compare the quantized model against the PyTorch sentence-transformer."""
+    from sentence_transformers import SentenceTransformer
+
+    reference = SentenceTransformer("all-MiniLM-L6-v2").encode(SAMPLE_QUERIES, normalize_embeddings=True)
+    candidate = OnnxSentenceEncoder(output_dir).encode(SAMPLE_QUERIES)
+    cosines = (reference * candidate).sum(axis=1)
+
+    print(f"📊 Cosine agreement: min={cosines.min():.4f} mean={cosines.mean():.4f}")
+    if cosines.min() < min_cosine:
+        worst = SAMPLE_QUERIES[int(np.argmin(cosines))]
+        print(f"❌ Quantized model below tolerance ({min_cosine}) on query: '{worst}'")
+        return False
+    print("✅ Quantized model is within tolerance")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export and quantize the MiniLM encoder for ONNX Runtime")
+    parser.add_argument("--output-dir", default=ONNX_MODEL_DIR)
+    parser.add_argument("--min-cosine", type=float, default=0.99)
+    parser.add_argument("--skip-verify", action="store_true")
+    args = parser.parse_args()
+
+    export(args.output_dir)
+    if not args.skip_verify and not verify(args.output_dir, args.min_cosine):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
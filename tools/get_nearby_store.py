@@ -2,6 +2,24 @@ import sqlite3
 from typing import Optional
 from pydantic import BaseModel, Field
 from langchain_core.tools import tool
+
+STORES_DB_PATH = "tools/lotus_stores.db"
+
+# Read-only store table, loaded once per process (or once in the gunicorn master when preloaded)
+_store_table = None
+
+def load_store_table():
+    """Load all stores into an immutable in-memory table."""
+    global _store_table
+    if _store_table is None:
+        conn = sqlite3.connect(STORES_DB_PATH)
+        c = conn.cursor()
+        c.execute("SELECT store_name, address, city, state, zipcode, timing FROM stores")
+        _store_table = tuple(tuple(row) for row in c.fetchall())
+        conn.close()
+    return _store_table
+
+
 # Input schema
 class StoreSearchInput(BaseModel):
     city: Optional[str] = Field(None, description="City name of the store location (e.g., 'Indore')")
@@ -23,21 +41,17 @@ def get_near_store(city: Optional[str] = None, zipcode: Optional[str] = None) ->
         - get_near_store(city="Indore")
         - get_near_store(zipcode="452001")
     """
-    conn = sqlite3.connect("tools/lotus_stores.db")
-    c = conn.cursor()
+    stores = load_store_table()
 
-    # Build query based on inputs
+    # Filter based on inputs
     if city:
-        c.execute("SELECT store_name, address, city, state, zipcode, timing FROM stores WHERE LOWER(city) = LOWER(?)", (city,))
+        city_lower = city.lower()
+        results = [store for store in stores if (store[2] or "").lower() == city_lower]
     elif zipcode:
-        c.execute("SELECT store_name, address, city, state, zipcode, timing FROM stores WHERE zipcode = ?", (zipcode,))
+        results = [store for store in stores if str(store[4]) == str(zipcode)]
     else:
-        conn.close()
         return "Please provide either a city or a zip code to search for the nearest store."
 
-    results = c.fetchall()
-    conn.close()
-
     if not results:
         return "No store found for the given location."
 
@@ -0,0 +1,164 @@
+"""
+In-Process Lexical Product Index
+BM25 over product_name and sku, built from the catalog snapshot metadata. MiniLM
+embeddings place model numbers such as "SM-A546" or "55UQ7500" poorly, so
+ProductSearchTool fuses these lexical ranks with the vector ranks (reciprocal rank
+fusion), and an exact SKU or product_id hit skips the embedding call altogether.
+"""
+
+import os
+import re
+import json
+import math
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Optional, List, Dict, Any, Tuple
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+(?:[-/.][a-z0-9]+)*')
+_SEPARATOR_RE = re.compile(r'[-/.]')
+_HAS_ALPHA_RE = re.compile(r'[a-z]')
+_HAS_DIGIT_RE = re.compile(r'\d')
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+MAX_PREFIX_EXPANSIONS = 50
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase alphanumeric tokens; "SM-A546E" yields "sm", "a546e" and "sma546e"."""
+    tokens = []
+    for match in _TOKEN_RE.finditer((text or "").lower()):
+        parts = [p for p in _SEPARATOR_RE.split(match.group(0)) if p]
+        tokens.extend(parts)
+        if len(parts) > 1:
+            tokens.append("".join(parts))
+    return tokens
+
+
+def is_model_token(token: str) -> bool:
+    """Tokens mixing letters and digits ("a54", "55uq7500") look like model numbers."""
+    return len(token) >= 3 and bool(_HAS_ALPHA_RE.search(token)) and bool(_HAS_DIGIT_RE.search(token))
+
+
+def has_model_token(query: str) -> bool:
+    return any(is_model_token(t) for t in tokenize(query))
+
+
+class LexicalIndex:
+    """BM25 inverted index plus exact SKU / product_id lookup tables."""
+
+    def __init__(self, ids: List[str], metadatas: List[Dict[str, Any]]):
+        start = time.perf_counter()
+        self.ids = ids
+        self.metadatas = metadatas
+        self.postings = defaultdict(list)   # token -> [(doc, term frequency)]
+        self.doc_lengths = []
+        self.by_sku = {}
+        self.by_product_id = {}
+
+        for doc, metadata in enumerate(metadatas):
+            sku = str(metadata.get("sku") or "").strip().lower()
+            product_id = str(metadata.get("product_id") or ids[doc]).strip().lower()
+            if sku and sku != "n/a":
+                self.by_sku.setdefault(sku, []).append(doc)
+            if product_id:
+                self.by_product_id.setdefault(product_id, []).append(doc)
+
+            counts = defaultdict(int)
+            tokens = tokenize(metadata.get("product_name", "")) + tokenize(sku)
+            for token in tokens:
+                counts[token] += 1
+            for token, tf in counts.items():
+                self.postings[token].append((doc, tf))
+            self.doc_lengths.append(len(tokens))
+
+        self.postings = dict(self.postings)
+        self.vocabulary = sorted(self.postings)
+        self.avg_length = (sum(self.doc_lengths) / len(self.doc_lengths)) if self.doc_lengths else 0.0
+        count = len(self.doc_lengths)
+        self.idf = {t: math.log(1 + (count - len(p) + 0.5) / (len(p) + 0.5)) for t, p in self.postings.items()}
+        self.build_seconds = round(time.perf_counter() - start, 3)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def exact_matches(self, query: str) -> List[int]:
+        """Rows whose SKU or product_id equals the query, or whose SKU equals a model-like query term."""
+        normalized = (query or "").strip().lower()
+        docs = self.by_sku.get(normalized) or self.by_product_id.get(normalized)
+        if docs:
+            return list(docs)
+        hits = []
+        for term in normalized.split():
+            term = term.strip(".,;:!?()[]\"'")
+            if is_model_token(term):
+                hits.extend(d for d in self.by_sku.get(term, []) if d not in hits)
+        return hits
+
+    def _expand(self, token: str) -> List[str]:
+        """The token itself, plus indexed tokens it prefixes when it looks like a model number."""
+        if not is_model_token(token):
+            return [token] if token in self.postings else []
+        expanded = []
+        position = bisect_left(self.vocabulary, token)
+        while position < len(self.vocabulary) and len(expanded) < MAX_PREFIX_EXPANSIONS:
+            candidate = self.vocabulary[position]
+            if not candidate.startswith(token):
+                break
+            expanded.append(candidate)
+            position += 1
+        return expanded
+
+    def search(self, query: str, top_k: int = 50) -> List[Tuple[int, float]]:
+        """BM25 ranking as (row, score), best first."""
+        scores = defaultdict(float)
+        for token in set(tokenize(query)):
+            for term in self._expand(token):
+                idf = self.idf[term]
+                for doc, tf in self.postings[term]:
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lengths[doc] / self.avg_length)
+                    scores[doc] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "documents": len(self.ids),
+            "terms": len(self.vocabulary),
+            "skus": len(self.by_sku),
+            "build_seconds": self.build_seconds,
+        }
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = 60, weights: Optional[List[float]] = None) -> List[Tuple[str, float]]:
+    """Fuse ranked id lists: score(id) = sum(weight / (k + rank))."""
+    weights = weights or [1.0] * len(rankings)
+    fused = defaultdict(float)
+    for ranking, weight in zip(rankings, weights):
+        for rank, item_id in enumerate(ranking, start=1):
+            fused[item_id] += weight / (k + rank)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
+
+
+def load_lexical_index(snapshot_dir: str, local_index=None) -> Optional[LexicalIndex]:
+    """Build the index from an open local snapshot, or from the snapshot's metadata file."""
+    try:
+        if local_index is not None:
+            ids, metadatas = local_index.ids, local_index.metadatas
+        else:
+            path = os.path.join(snapshot_dir, "metadata.json")
+            if not os.path.exists(path):
+                return None
+            with open(path, encoding="utf-8") as f:
+                rows = json.load(f)
+            ids = [row["id"] for row in rows]
+            metadatas = [row.get("metadata") or {} for row in rows]
+        index = LexicalIndex(ids, metadatas)
+        print(f"✅ Lexical product index built: {len(index)} products, {len(index.vocabulary)} terms in {index.build_seconds}s")
+        return index
+    except Exception as e:
+        print(f"❌ Error building lexical product index: {e}")
+        return None
+
+
+__all__ = ['LexicalIndex', 'tokenize', 'has_model_token', 'reciprocal_rank_fusion', 'load_lexical_index']
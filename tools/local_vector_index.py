@@ -0,0 +1,319 @@
+"""
+Local Memory-Mapped Vector Index
+A snapshot of the product vectors and metadata stored on disk and scored with NumPy.
+The vector matrix is opened with mmap, so every gunicorn worker shares the same page
+cache copy instead of holding its own. Query responses mimic the Pinecone client
+(response.matches[i].id / .score / .metadata) so it is a drop-in backend for
+ProductSearchTool.
+
+Snapshot layout (directory):
+    manifest.json   - dtype, dimension, count, source, created_at
+    vectors.npy     - (count, dimension) float16, int8 or float32 matrix of L2-normalized vectors
+    scales.npy      - (count,) float32 per-row scales, int8 snapshots only
+    metadata.json   - list of {"id": ..., "metadata": {...}} in row order
+    centroids.npy   - (categories, dimension) float32 category centroids, see category_classifier
+    categories.json - category name per centroid row
+
+float16 halves the page-cache footprint and int8 quarters it, but both are converted
+to float32 chunk by chunk while scoring. float32 is scored straight from the mmap with
+BLAS and gives the lowest latency when the catalog fits comfortably in memory.
+
+Build a snapshot from the live Pinecone index with:
+    python -m tools.local_vector_index build [--dtype float16|int8|float32] [--output data/product_snapshot]
+"""
+
+import os
+import json
+import time
+import threading
+from datetime import datetime
+from typing import Optional, List, Dict, Any
+
+import numpy as np
+
+from tools.catalog_normalize import normalize_product_metadata
+from tools.category_classifier import write_centroids
+
+LOCAL_INDEX_DIR = os.getenv("LOCAL_INDEX_DIR", "data/product_snapshot")
+SCORE_CHUNK_ROWS = 8192  # rows converted to float32 at a time while scoring
+
+
+class LocalMatch:
+    """One query match, shaped like a Pinecone ScoredVector."""
+    __slots__ = ("id", "score", "metadata", "values")
+
+    def __init__(self, id: str, score: float, metadata: Optional[Dict[str, Any]] = None, values=None):
+        self.id = id
+        self.score = score
+        self.metadata = metadata
+        self.values = values
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def __getitem__(self, key):
+        return getattr(self, key)
+
+
+class LocalQueryResponse:
+    """Query response, shaped like a Pinecone QueryResponse."""
+
+    def __init__(self, matches: List[LocalMatch]):
+        self.matches = matches
+
+    def get(self, key, default=None):
+        return self.matches if key == "matches" else default
+
+    def __getitem__(self, key):
+        if key == "matches":
+            return self.matches
+        raise KeyError(key)
+
+
+def _quantize_int8(vectors: np.ndarray):
+    """Symmetric per-row int8 quantization."""
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    quantized = np.round(vectors / scales[:, None]).astype(np.int8)
+    return quantized, scales.astype(np.float32)
+
+
+def write_snapshot(output_dir: str, ids: List[str], vectors, metadatas: List[Dict[str, Any]],
+                   dtype: str = "float16", extra_manifest: Optional[Dict[str, Any]] = None):
+    """
+    Write a snapshot directory atomically (files are written to a temp dir, then swapped in).
+
+    Args:
+        output_dir: Snapshot directory
+        ids: Vector ids in row order
+        vectors: (count, dimension) array-like of embeddings
+        metadatas: Metadata dict per row
+        dtype: "float16", "int8" or "float32"
+        extra_manifest: Additional manifest fields (e.g. catalog_version)
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    vectors = vectors / np.clip(norms, 1e-12, None)
+
+    tmp_dir = f"{output_dir.rstrip('/')}.tmp-{os.getpid()}"
+    os.makedirs(tmp_dir, exist_ok=True)
+
+    if dtype == "int8":
+        quantized, scales = _quantize_int8(vectors)
+        np.save(os.path.join(tmp_dir, "vectors.npy"), quantized)
+        np.save(os.path.join(tmp_dir, "scales.npy"), scales)
+    elif dtype in ("float16", "float32"):
+        np.save(os.path.join(tmp_dir, "vectors.npy"), vectors.astype(dtype))
+    else:
+        raise ValueError(f"Unsupported snapshot dtype: {dtype}")
+
+    with open(os.path.join(tmp_dir, "metadata.json"), "w", encoding="utf-8") as f:
+        json.dump([{"id": str(i), "metadata": m} for i, m in zip(ids, metadatas)], f, ensure_ascii=False)
+    categories = write_centroids(tmp_dir, vectors, metadatas)
+
+    manifest = {
+        "dtype": dtype,
+        "dimension": int(vectors.shape[1]) if len(vectors) else 0,
+        "count": len(ids),
+        "categories": len(categories),
+        "created_at": datetime.now().isoformat(),
+    }
+    manifest.update(extra_manifest or {})
+    with open(os.path.join(tmp_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+    # Swap the new snapshot in; readers holding the old mmap keep their (unlinked) files
+    old_dir = f"{output_dir.rstrip('/')}.old-{os.getpid()}"
+    if os.path.exists(output_dir):
+        os.rename(output_dir, old_dir)
+    os.rename(tmp_dir, output_dir)
+    if os.path.exists(old_dir):
+        import shutil
+        shutil.rmtree(old_dir, ignore_errors=True)
+    print(f"✅ Wrote {dtype} snapshot with {len(ids)} vectors to {output_dir}")
+    return manifest
+
+
+class LocalVectorIndex:
+    """Brute-force cosine search over a memory-mapped snapshot."""
+
+    def __init__(self, snapshot_dir: str = LOCAL_INDEX_DIR):
+        self.snapshot_dir = snapshot_dir
+        with open(os.path.join(snapshot_dir, "manifest.json"), encoding="utf-8") as f:
+            self.manifest = json.load(f)
+
+        # mmap_mode='r' keeps the matrix in the shared page cache rather than private heap
+        self.vectors = np.load(os.path.join(snapshot_dir, "vectors.npy"), mmap_mode="r")
+        scales_path = os.path.join(snapshot_dir, "scales.npy")
+        self.scales = np.load(scales_path) if self.manifest.get("dtype") == "int8" and os.path.exists(scales_path) else None
+
+        with open(os.path.join(snapshot_dir, "metadata.json"), encoding="utf-8") as f:
+            rows = json.load(f)
+        self.ids = [row["id"] for row in rows]
+        self.metadatas = [row.get("metadata") or {} for row in rows]
+        self._columns = {}
+        self._columns_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def column(self, field: str) -> np.ndarray:
+        """Metadata field as an array (float when numeric, object otherwise), built once."""
+        array = self._columns.get(field)
+        if array is None:
+            with self._columns_lock:
+                array = self._columns.get(field)
+                if array is None:
+                    values = [m.get(field) for m in self.metadatas]
+                    try:
+                        array = np.array([float(v) if v not in (None, "") else np.nan for v in values], dtype=np.float32)
+                    except (TypeError, ValueError):
+                        array = np.array(values, dtype=object)
+                    self._columns[field] = array
+        return array
+
+    def _filter_mask(self, filter: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        """Evaluate a Pinecone-style metadata filter ($eq/$ne/$gt/$gte/$lt/$lte/$in/$nin)."""
+        if not filter:
+            return None
+        mask = np.ones(len(self.ids), dtype=bool)
+        for field, condition in filter.items():
+            if field == "$and":
+                for sub in condition:
+                    sub_mask = self._filter_mask(sub)
+                    if sub_mask is not None:
+                        mask &= sub_mask
+                continue
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+            column = self.column(field)
+            for op, value in condition.items():
+                if op == "$eq":
+                    mask &= column == value
+                elif op == "$ne":
+                    mask &= column != value
+                elif op == "$gt":
+                    mask &= column > value
+                elif op == "$gte":
+                    mask &= column >= value
+                elif op == "$lt":
+                    mask &= column < value
+                elif op == "$lte":
+                    mask &= column <= value
+                elif op == "$in":
+                    mask &= np.isin(column, list(value))
+                elif op == "$nin":
+                    mask &= ~np.isin(column, list(value))
+                else:
+                    raise ValueError(f"Unsupported filter operator: {op}")
+        return mask
+
+    def score(self, vector) -> np.ndarray:
+        """Cosine similarity of the query against every row."""
+        query = np.asarray(vector, dtype=np.float32)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+        if self.vectors.dtype == np.float32:
+            return np.asarray(self.vectors) @ query
+
+        scores = np.empty(len(self.ids), dtype=np.float32)
+        for start in range(0, len(self.ids), SCORE_CHUNK_ROWS):
+            chunk = np.asarray(self.vectors[start:start + SCORE_CHUNK_ROWS], dtype=np.float32)
+            scores[start:start + len(chunk)] = chunk @ query
+        if self.scales is not None:
+            scores *= self.scales
+        return scores
+
+    def query(self, vector, top_k: int = 10, include_metadata: bool = True,
+              include_values: bool = False, filter: Optional[Dict[str, Any]] = None, **kwargs) -> LocalQueryResponse:
+        """Return the top_k most similar rows, optionally restricted by a metadata filter."""
+        scores = self.score(vector)
+        mask = self._filter_mask(filter)
+        if mask is not None:
+            scores = np.where(mask, scores, -np.inf)
+
+        k = min(top_k, len(scores))
+        if k <= 0:
+            return LocalQueryResponse([])
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+        matches = []
+        for row in top:
+            if not np.isfinite(scores[row]):
+                break
+            values = None
+            if include_values:
+                values = np.asarray(self.vectors[row], dtype=np.float32)
+                if self.scales is not None:
+                    values = values * self.scales[row]
+                values = values.tolist()
+            matches.append(LocalMatch(
+                id=self.ids[row],
+                score=float(scores[row]),
+                metadata=self.metadatas[row] if include_metadata else None,
+                values=values,
+            ))
+        return LocalQueryResponse(matches)
+
+    def describe_index_stats(self) -> Dict[str, Any]:
+        return {
+            "dimension": self.manifest.get("dimension"),
+            "total_vector_count": len(self.ids),
+            "dtype": self.manifest.get("dtype"),
+            "created_at": self.manifest.get("created_at"),
+        }
+
+
+def load_local_index(snapshot_dir: str = LOCAL_INDEX_DIR) -> Optional[LocalVectorIndex]:
+    """Open the snapshot if it exists, otherwise return None."""
+    if not os.path.exists(os.path.join(snapshot_dir, "manifest.json")):
+        return None
+    try:
+        start = time.perf_counter()
+        index = LocalVectorIndex(snapshot_dir)
+        print(f"✅ Local vector index loaded: {len(index)} vectors ({index.manifest.get('dtype')}) in {time.perf_counter() - start:.2f}s")
+        return index
+    except Exception as e:
+        print(f"❌ Error loading local vector index: {e}")
+        return None
+
+
+def build_snapshot_from_pinecone(index, output_dir: str = LOCAL_INDEX_DIR, dtype: str = "float16", batch_size: int = 100):
+    """Download every vector and its metadata from a Pinecone (serverless) index."""
+    ids, vectors, metadatas = [], [], []
+    for id_batch in index.list():
+        id_batch = list(id_batch)
+        for start in range(0, len(id_batch), batch_size):
+            fetched = index.fetch(ids=id_batch[start:start + batch_size])
+            for vector_id, record in fetched.vectors.items():
+                ids.append(vector_id)
+                vectors.append(record.values)
+                metadatas.append(normalize_product_metadata(record.metadata, vector_id))
+        print(f"📥 Fetched {len(ids)} vectors...")
+    return write_snapshot(output_dir, ids, vectors, metadatas, dtype=dtype, extra_manifest={"source": "pinecone"})
+
+
+def main():
+    import argparse
+    from tools.product_search_tool import product_search_instance
+
+    parser = argparse.ArgumentParser(description="Manage the local product vector snapshot")
+    parser.add_argument("command", choices=["build", "info"])
+    parser.add_argument("--dtype", choices=["float16", "int8", "float32"], default="float16")
+    parser.add_argument("--output", default=LOCAL_INDEX_DIR)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        product_search_instance.ensure_initialized()
+        if product_search_instance.pinecone_index is None:
+            raise SystemExit("❌ Pinecone index is not reachable")
+        build_snapshot_from_pinecone(product_search_instance.pinecone_index, args.output, args.dtype)
+        from tools.search_result_cache import bump_catalog_version
+        bump_catalog_version()
+    else:
+        index = load_local_index(args.output)
+        print(json.dumps(index.describe_index_stats() if index else {"error": "no snapshot"}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
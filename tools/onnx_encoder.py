@@ -0,0 +1,79 @@
+"""
+ONNX Runtime encoder for all-MiniLM-L6-v2
+Runs an exported (optionally int8-quantized) copy of the sentence-transformer on CPU
+and reproduces its mean pooling + L2 normalization, so the vectors stay compatible
+with the existing Pinecone indexes.
+
+Export the model first with: python -m tools.export_onnx_encoder
+"""
+
+import os
+from typing import List, Union
+
+try:
+    import numpy as np
+    import onnxruntime as ort
+    from tokenizers import Tokenizer
+    DEPENDENCIES_AVAILABLE = True
+except ImportError as e:
+    print(f"⚠️ Missing dependencies for ONNX encoder: {e}")
+    DEPENDENCIES_AVAILABLE = False
+
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", "models/all-MiniLM-L6-v2-onnx")
+ONNX_MODEL_FILE = os.getenv("ONNX_MODEL_FILE", "model_quantized.onnx")
+MAX_SEQ_LENGTH = 256  # Same limit sentence-transformers uses for all-MiniLM-L6-v2
+
+
+class OnnxSentenceEncoder:
+    """Drop-in replacement for SentenceTransformer.encode backed by ONNX Runtime."""
+
+    def __init__(self, model_dir: str = ONNX_MODEL_DIR, model_file: str = ONNX_MODEL_FILE, num_threads: int = None):
+        if not DEPENDENCIES_AVAILABLE:
+            raise RuntimeError("onnxruntime, numpy and tokenizers are required for the ONNX backend")
+
+        model_path = os.path.join(model_dir, model_file)
+        tokenizer_path = os.path.join(model_dir, "tokenizer.json")
+        if not os.path.exists(model_path) or not os.path.exists(tokenizer_path):
+            raise FileNotFoundError(f"ONNX model not found in {model_dir}; run python -m tools.export_onnx_encoder")
+
+        self.tokenizer = Tokenizer.from_file(tokenizer_path)
+        self.tokenizer.enable_truncation(max_length=MAX_SEQ_LENGTH)
+        self.tokenizer.enable_padding(pad_id=0, pad_token="[PAD]")
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads is None:
+            num_threads = int(os.getenv("ONNX_NUM_THREADS", "1"))
+        options.intra_op_num_threads = num_threads
+        options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(model_path, sess_options=options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.model_path = model_path
+
+    def encode(self, text: Union[str, List[str]]):
+        """Encode one string (returns a 1-D array) or a list of strings (returns a 2-D array)."""
+        single = isinstance(text, str)
+        sentences = [text] if single else list(text)
+
+        encodings = self.tokenizer.encode_batch(sentences)
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.zeros_like(input_ids)
+
+        token_embeddings = self.session.run(None, feeds)[0]
+
+        # Mean pooling over real tokens, then L2 normalization (as in the sentence-transformers pipeline)
+        mask = attention_mask[..., None].astype(np.float32)
+        summed = (token_embeddings * mask).sum(axis=1)
+        counts = np.clip(mask.sum(axis=1), 1e-9, None)
+        embeddings = summed / counts
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        embeddings = (embeddings / np.clip(norms, 1e-12, None)).astype(np.float32)
+
+        return embeddings[0] if single else embeddings
+
+
+__all__ = ['OnnxSentenceEncoder', 'ONNX_MODEL_DIR', 'ONNX_MODEL_FILE']
@@ -0,0 +1,292 @@
+"""
+Policy Answer Cache
+Most policy questions are one of a handful of intents: the return window, refunds,
+warranty, delivery charges and privacy. Each intent has a canonical question whose full
+search result (already cleaned sections) is stored in Redis and shared by every worker.
+An incoming query is mapped to an intent by cosine similarity between its embedding and
+the intents' example questions. A keyword rule can pick the intent of a short, general
+query ("return policy?"), but only when the similarity to that intent also clears the
+threshold, so detailed questions that merely mention a keyword ("documents needed to
+return a TV bought on EMI") still run a full policy search, as do queries that match no
+intent or more than one.
+
+Stored answers live under a generation number and the version of the corpus they were
+searched in. Invalidating increments the generation, so every worker immediately stops
+serving the old answers, and each intent is rebuilt on its next hit or all at once with
+rebuild(). The admin dashboard does both, and the policy ingest invalidates after
+writing a new corpus. A worker still holding the previous corpus stores its answers
+under the previous version, so they are never served once workers reload.
+"""
+
+import os
+import re
+import json
+import time
+import threading
+from typing import Optional, List, Dict, Any, Callable
+
+import numpy as np
+import redis
+
+POLICY_ANSWER_CACHE_ENABLED = os.getenv("POLICY_ANSWER_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+POLICY_INTENT_MIN_SIMILARITY = float(os.getenv("POLICY_INTENT_MIN_SIMILARITY", "0.75"))
+POLICY_INTENT_MARGIN = 0.05  # the best intent must beat the runner-up by this much
+KEYWORD_RULE_MAX_WORDS = 6  # longer queries are detailed questions, not the canonical one
+POLICY_ANSWER_TTL = 7 * 24 * 3600  # stale generations age out on their own
+POLICY_ANSWER_RETRY_SECONDS = 30
+GENERATION_KEY = "policy_answers:generation"
+KEY_PREFIX = "policy_answers"
+CACHED_SECTIONS = 5  # stored per intent; requests take the first max_results
+
+# Intent -> canonical question (searched to build the answer), keyword rule, example questions
+POLICY_INTENTS = [
+    {
+        "intent": "return_window",
+        "question": "What is the return policy and within how many days can a product be returned?",
+        "keywords": r'\breturn(?:s|ed|ing)?\b|\bexchange\b|\breplace(?:ment)?\b',
+        "examples": ["how many days do I have to return a product", "can I return my phone",
+                     "what is your return policy", "return window for TV", "can I exchange a product"],
+    },
+    {
+        "intent": "refund",
+        "question": "How are refunds processed and how long does a refund take?",
+        "keywords": r'\brefund(?:s|ed|able)?\b|\bmoney\s+back\b',
+        "examples": ["when will I get my refund", "how long does a refund take", "refund policy",
+                     "how do I get my money back"],
+    },
+    {
+        "intent": "warranty",
+        "question": "What warranty do products have and how is a warranty claim handled?",
+        "keywords": r'\bwarrant(?:y|ies)\b|\bguarantee\b',
+        "examples": ["what is the warranty on products", "how do I claim warranty", "warranty terms",
+                     "is there a guarantee on my purchase"],
+    },
+    {
+        "intent": "delivery_charges",
+        "question": "What are the delivery charges and how long does delivery take?",
+        "keywords": r'\b(?:deliver(?:y|ies)?|shipping|installation)\b.*\b(?:charges?|fees?|cost|free|paid|time|days?)\b'
+                    r'|\b(?:charges?|fees?|cost|free)\b.*\b(?:deliver(?:y|ies)?|shipping|installation)\b',
+        "examples": ["are there any delivery charges", "is delivery free", "how long does delivery take",
+                     "shipping charges", "do you charge for installation"],
+    },
+    {
+        "intent": "privacy",
+        "question": "How does Lotus Electronics collect, use and protect personal data under its privacy policy?",
+        "keywords": r'\bprivacy\b|\bpersonal\s+(?:data|information|details)\b|\bdata\s+(?:protection|security|sharing)\b|\bcookies?\b',
+        "examples": ["what is your privacy policy", "how is my personal data used", "do you share my data",
+                     "data protection policy"],
+    },
+]
+
+_INTENT_RULES = [(entry["intent"], re.compile(entry["keywords"], re.IGNORECASE)) for entry in POLICY_INTENTS]
+_INTENT_QUESTIONS = {entry["intent"]: entry["question"] for entry in POLICY_INTENTS}
+_WORD_RE = re.compile(r"\w+")
+
+
+def match_intent_by_keywords(query: str) -> Optional[str]:
+    """The single intent whose keyword rule matches a short query, or None."""
+    if len(_WORD_RE.findall(query or "")) > KEYWORD_RULE_MAX_WORDS:
+        return None
+    matched = [intent for intent, pattern in _INTENT_RULES if pattern.search(query or "")]
+    return matched[0] if len(matched) == 1 else None
+
+
+def mentions_policy_intent(query: str) -> bool:
+    """Whether any intent's keyword rule matches ("Can I return my phone?")."""
+    return any(pattern.search(query or "") for _, pattern in _INTENT_RULES)
+
+
+class PolicyAnswerCache:
+    """Canonical policy answers in Redis, keyed by intent and generation."""
+
+    def __init__(self, redis_host='localhost', redis_port=6379, redis_db=0,
+                 enabled: bool = POLICY_ANSWER_CACHE_ENABLED, min_similarity: float = POLICY_INTENT_MIN_SIMILARITY):
+        self.redis_client = redis.Redis(
+            host=redis_host,
+            port=redis_port,
+            db=redis_db,
+            decode_responses=True,
+            socket_timeout=0.5,
+            socket_connect_timeout=0.5
+        )
+        self.enabled = enabled
+        self.min_similarity = min_similarity
+        self._unavailable_until = 0.0
+        self._lock = threading.Lock()
+        self._example_intents: List[str] = []
+        self._example_vectors: Optional[np.ndarray] = None
+        self.hits = 0
+        self.misses = 0
+        self.unmatched = 0
+        self.errors = 0
+
+    def _available(self) -> bool:
+        return self.enabled and time.time() >= self._unavailable_until
+
+    def _record_error(self, e: Exception):
+        with self._lock:
+            self.errors += 1
+        self._unavailable_until = time.time() + POLICY_ANSWER_RETRY_SECONDS
+        print(f"⚠️  Policy answer cache unavailable ({type(e).__name__}: {e}), retrying in {POLICY_ANSWER_RETRY_SECONDS}s")
+
+    def generation(self) -> str:
+        return self.redis_client.get(GENERATION_KEY) or "0"
+
+    def _key(self, generation: str, corpus_version: str, intent: str) -> str:
+        return f"{KEY_PREFIX}:{generation}:{corpus_version}:{intent}"
+
+    # -- intent matching ---------------------------------------------------
+
+    def _examples(self, encode: Callable[[str], List[float]]) -> np.ndarray:
+        """Embeddings of every example question, encoded once per process."""
+        if self._example_vectors is None:
+            with self._lock:
+                if self._example_vectors is None:
+                    intents, vectors = [], []
+                    for entry in POLICY_INTENTS:
+                        for example in [entry["question"]] + entry["examples"]:
+                            intents.append(entry["intent"])
+                            vectors.append(encode(example))
+                    vectors = np.asarray(vectors, dtype=np.float32)
+                    self._example_intents = intents
+                    self._example_vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        return self._example_vectors
+
+    def match_intent(self, query: str, encode: Optional[Callable[[str], List[float]]] = None) -> Optional[str]:
+        """
+        Intent for a query by embedding similarity to the examples. A keyword rule match on
+        a short query settles a close call between intents, but still needs the similarity
+        to its intent to clear the threshold. Without an encoder only keyword rules apply.
+        """
+        intent = match_intent_by_keywords(query)
+        if encode is None:
+            return intent
+        examples = self._examples(encode)
+        vector = np.asarray(encode(query), dtype=np.float32)
+        scores = examples @ (vector / max(float(np.linalg.norm(vector)), 1e-12))
+        best_by_intent = {}
+        for example_intent, score in zip(self._example_intents, scores):
+            best_by_intent[example_intent] = max(best_by_intent.get(example_intent, -1.0), float(score))
+        if intent is not None:
+            return intent if best_by_intent[intent] >= self.min_similarity else None
+        ranked = sorted(best_by_intent.items(), key=lambda item: item[1], reverse=True)
+        best_intent, best_score = ranked[0]
+        runner_up = ranked[1][1] if len(ranked) > 1 else -1.0
+        if best_score >= self.min_similarity and best_score - runner_up >= POLICY_INTENT_MARGIN:
+            return best_intent
+        return None
+
+    # -- answers -----------------------------------------------------------
+
+    def get(self, intent: str, corpus_version: str = "") -> Optional[Dict[str, Any]]:
+        if not self._available():
+            return None
+        try:
+            data = self.redis_client.get(self._key(self.generation(), corpus_version, intent))
+        except redis.RedisError as e:
+            self._record_error(e)
+            return None
+        return json.loads(data) if data else None
+
+    def set(self, intent: str, answer: Dict[str, Any], corpus_version: str = ""):
+        if not self._available():
+            return
+        try:
+            self.redis_client.setex(self._key(self.generation(), corpus_version, intent), POLICY_ANSWER_TTL,
+                                    json.dumps(answer, ensure_ascii=False))
+        except redis.RedisError as e:
+            self._record_error(e)
+
+    def lookup(self, query: str, max_results: int, search: Callable[[str, int], Dict[str, Any]],
+               encode: Optional[Callable[[str], List[float]]] = None,
+               corpus_version: str = "") -> Optional[Dict[str, Any]]:
+        """
+        Serve a policy query from its intent's stored answer.
+
+        On an intent match without a stored answer the canonical question is searched
+        with `search(question, CACHED_SECTIONS)` and stored under corpus_version, the
+        version of the index `search` reads. Returns None when the query matches no
+        intent (the caller then runs its own search).
+        """
+        if not self.enabled:
+            return None
+        intent = self.match_intent(query, encode)
+        if intent is None:
+            with self._lock:
+                self.unmatched += 1
+            return None
+
+        answer = self.get(intent, corpus_version)
+        with self._lock:
+            if answer is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if answer is None:
+            answer = search(_INTENT_QUESTIONS[intent], CACHED_SECTIONS)
+            if not answer.get("success") or not answer.get("policy_sections"):
+                return None
+            self.set(intent, answer, corpus_version)
+
+        sections = answer["policy_sections"][:max_results]
+        return {**answer, "query": query, "intent": intent, "cached": True,
+                "policy_sections": sections, "total_found": len(sections)}
+
+    def invalidate(self) -> Optional[str]:
+        """Stop serving every stored answer (all workers) by moving to a new generation."""
+        try:
+            generation = str(self.redis_client.incr(GENERATION_KEY))
+            print(f"🔄 Policy answer cache generation is now {generation}")
+            return generation
+        except redis.RedisError as e:
+            print(f"⚠️  Could not invalidate policy answer cache: {e}")
+            return None
+
+    def rebuild(self, search: Callable[[str, int], Dict[str, Any]], corpus_version: str = "") -> Dict[str, Any]:
+        """Invalidate, then search and store the answer for every intent."""
+        generation = self.invalidate()
+        built, failed = [], []
+        for intent, question in _INTENT_QUESTIONS.items():
+            answer = search(question, CACHED_SECTIONS)
+            if answer.get("success") and answer.get("policy_sections"):
+                self.set(intent, answer, corpus_version)
+                built.append(intent)
+            else:
+                failed.append(intent)
+        print(f"✅ Policy answer cache rebuilt: {len(built)} intents" + (f", failed: {failed}" if failed else ""))
+        return {"generation": generation, "corpus_version": corpus_version, "built": built, "failed": failed}
+
+    def stats(self, corpus_version: str = "") -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        stats = {
+            "enabled": self.enabled,
+            "available": self._available(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "unmatched": self.unmatched,
+            "errors": self.errors,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+        if self._available():
+            try:
+                generation = self.generation()
+                pipe = self.redis_client.pipeline(transaction=False)
+                for intent in _INTENT_QUESTIONS:
+                    pipe.exists(self._key(generation, corpus_version, intent))
+                stats["generation"] = generation
+                stats["corpus_version"] = corpus_version
+                stats["intents"] = {intent: bool(cached) for intent, cached in zip(_INTENT_QUESTIONS, pipe.execute())}
+            except redis.RedisError as e:
+                self._record_error(e)
+        return stats
+
+
+policy_answer_cache = PolicyAnswerCache()
+
+
+def invalidate_policy_answers() -> Optional[str]:
+    return policy_answer_cache.invalidate()
+
+
+__all__ = ['PolicyAnswerCache', 'policy_answer_cache', 'invalidate_policy_answers', 'match_intent_by_keywords',
+           'mentions_policy_intent', 'POLICY_INTENTS']
@@ -0,0 +1,302 @@
+"""
+Policy Chunk Refinement
+The refinement prompt (fix OCR artifacts, spelling and grammar, keep every policy
+detail) is too slow to run per request. This job runs it once per policy chunk instead,
+offline or in a background thread, and stores the refined text keyed by
+(chunk id, document version) in data/policy_refinements.db. The database is separate
+from the policy index, so a re-ingest keeps the refinements of unchanged documents.
+Refinements that fail the sanity check are recorded as rejected under the same key, so
+the job does not pay for the same chunk again until its document changes.
+
+search_policies serves the stored refinement when there is one and the cleaned text
+otherwise, so nothing waits on the LLM and pending chunks simply show cleaned text
+until the job reaches them. Each worker keeps the refinements in a dict and reloads
+it when the database changes.
+
+Usage:
+    python -m tools.policy_refinement run [--limit 50]    # refine every pending chunk
+    python -m tools.policy_refinement status
+
+With POLICY_REFINEMENT_BACKGROUND=true one gunicorn worker (whichever takes the lock
+file first) runs the job in a background thread after warm-up.
+"""
+
+import os
+import time
+import fcntl
+import sqlite3
+import hashlib
+import argparse
+import threading
+from datetime import datetime, timezone
+from typing import Optional, List, Dict, Any, Tuple
+
+POLICY_REFINEMENTS_PATH = os.getenv("POLICY_REFINEMENTS_PATH", "data/policy_refinements.db")
+POLICY_REFINEMENT_BACKGROUND = os.getenv("POLICY_REFINEMENT_BACKGROUND", "false").lower() in ("1", "true", "yes")
+POLICY_REFINEMENT_MODEL = os.getenv("POLICY_REFINEMENT_MODEL", "gemini-2.5-flash")
+REFINEMENT_DELAY_SECONDS = float(os.getenv("POLICY_REFINEMENT_DELAY", "1.0"))  # between LLM calls
+RELOAD_CHECK_SECONDS = 10
+
+REFINEMENT_PROMPT = """
+You are a customer service assistant for Lotus Electronics. Clean up and refine this raw policy text to make it clear and user-friendly.
+
+Raw Policy Text:
+{content}
+
+Instructions:
+1. Fix spelling errors, spacing issues, and formatting problems
+2. Make the text clear and easy to understand
+3. Keep all important policy details intact
+4. Use proper punctuation and grammar
+5. Make it conversational but professional
+6. Remove any OCR artifacts or garbled text
+
+Provide only the refined policy text, no additional commentary:
+"""
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS refinements (
+    chunk_id TEXT NOT NULL,
+    version TEXT NOT NULL,
+    refined TEXT NOT NULL,
+    model TEXT,
+    created_at TEXT NOT NULL,
+    PRIMARY KEY (chunk_id, version)
+);
+CREATE TABLE IF NOT EXISTS rejections (
+    chunk_id TEXT NOT NULL,
+    version TEXT NOT NULL,
+    model TEXT,
+    created_at TEXT NOT NULL,
+    PRIMARY KEY (chunk_id, version)
+);
+"""
+
+
+def chunk_version(metadata: Dict[str, Any]) -> str:
+    """The chunk's document version, or a hash of its text for chunks without one (Pinecone)."""
+    return metadata.get("document_version") or hashlib.sha1((metadata.get("text") or "").encode("utf-8")).hexdigest()[:12]
+
+
+def accept_refinement(refined: str, original: str) -> bool:
+    """The same sanity check the synchronous refinement used."""
+    return 50 < len(refined) < len(original) * 3
+
+
+class RefinementStore:
+    """Refined chunk texts in SQLite, mirrored in memory for serving."""
+
+    def __init__(self, db_path: str = POLICY_REFINEMENTS_PATH):
+        self.db_path = db_path
+        self._refined: Dict[Tuple[str, str], str] = {}
+        self._loaded_mtime = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.db_path)
+        conn.executescript(SCHEMA)
+        return conn
+
+    def _reload_if_changed(self):
+        now = time.time()
+        if now - self._checked_at < RELOAD_CHECK_SECONDS:
+            return
+        self._checked_at = now
+        try:
+            mtime = os.path.getmtime(self.db_path)
+        except OSError:
+            return
+        if mtime == self._loaded_mtime:
+            return
+        with self._lock:
+            conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+            try:
+                rows = conn.execute("SELECT chunk_id, version, refined FROM refinements").fetchall()
+            finally:
+                conn.close()
+            self._refined = {(chunk_id, version): refined for chunk_id, version, refined in rows}
+            self._loaded_mtime = mtime
+
+    def get(self, chunk_id: str, version: str) -> Optional[str]:
+        """Stored refinement for this chunk version, or None while it is pending."""
+        try:
+            self._reload_if_changed()
+        except sqlite3.Error as e:
+            print(f"⚠️  Could not read policy refinements: {e}")
+        return self._refined.get((chunk_id, version))
+
+    def put(self, chunk_id: str, version: str, refined: str, model: str):
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO refinements (chunk_id, version, refined, model, created_at) VALUES (?, ?, ?, ?, ?)",
+                    (chunk_id, version, refined, model, datetime.now(timezone.utc).isoformat())
+                )
+        finally:
+            conn.close()
+
+    def put_rejection(self, chunk_id: str, version: str, model: str):
+        """Mark this chunk version as refused by the sanity check so the job skips it."""
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO rejections (chunk_id, version, model, created_at) VALUES (?, ?, ?, ?)",
+                    (chunk_id, version, model, datetime.now(timezone.utc).isoformat())
+                )
+        finally:
+            conn.close()
+
+    def _keys(self, table: str) -> set:
+        if not os.path.exists(self.db_path):
+            return set()
+        conn = self._connect()
+        try:
+            return {(chunk_id, version) for chunk_id, version in conn.execute(f"SELECT chunk_id, version FROM {table}")}
+        finally:
+            conn.close()
+
+    def stored_keys(self) -> set:
+        return self._keys("refinements")
+
+    def rejected_keys(self) -> set:
+        return self._keys("rejections")
+
+    def stats(self) -> Dict[str, Any]:
+        return {"path": self.db_path, "loaded": len(self._refined)}
+
+
+policy_refinements = RefinementStore()
+
+
+# ---------------------------------------------------------------------------
+# Refinement job
+# ---------------------------------------------------------------------------
+
+def _create_llm(model: str = POLICY_REFINEMENT_MODEL):
+    google_api_key = os.getenv("GOOGLE_API_KEY")
+    if not google_api_key:
+        raise RuntimeError("GOOGLE_API_KEY is not set; policy refinement needs a Gemini API key")
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
+    return ChatGoogleGenerativeAI(model=model, temperature=0.1, google_api_key=google_api_key)
+
+
+def pending_chunks(index, store: RefinementStore = policy_refinements) -> List[Tuple[str, Dict[str, Any]]]:
+    """(chunk id, metadata) of every chunk in the local policy index without a refinement or rejection."""
+    stored = store.stored_keys() | store.rejected_keys()
+    return [(chunk_id, metadata) for chunk_id, metadata in zip(index.ids, index.metadatas)
+            if (chunk_id, chunk_version(metadata)) not in stored]
+
+
+def run_refinement(limit: Optional[int] = None, store: RefinementStore = policy_refinements,
+                   model: str = POLICY_REFINEMENT_MODEL, delay: float = REFINEMENT_DELAY_SECONDS) -> Dict[str, int]:
+    """Refine pending chunks of the local policy index, one LLM call each."""
+    from tools.policy_store import load_policy_index
+
+    index = load_policy_index()
+    if index is None:
+        print("❌ No local policy index to refine; run python -m tools.policy_store ingest first")
+        return {"refined": 0, "rejected": 0, "failed": 0, "pending": 0}
+
+    pending = pending_chunks(index, store)
+    todo = pending[:limit] if limit else pending
+    print(f"📝 {len(pending)} policy chunks pending refinement, refining {len(todo)}")
+    llm = _create_llm(model) if todo else None
+    counts = {"refined": 0, "rejected": 0, "failed": 0}
+    for chunk_id, metadata in todo:
+        cleaned = metadata.get("cleaned") or metadata.get("text", "")
+        try:
+            refined = llm.invoke(REFINEMENT_PROMPT.format(content=cleaned)).content.strip()
+        except Exception as e:
+            counts["failed"] += 1
+            print(f"⚠️  Refinement failed for {chunk_id}: {e}")
+            continue
+        if accept_refinement(refined, cleaned):
+            store.put(chunk_id, chunk_version(metadata), refined, model)
+            counts["refined"] += 1
+        else:
+            store.put_rejection(chunk_id, chunk_version(metadata), model)
+            counts["rejected"] += 1
+            print(f"⚠️  Unusual refinement for {chunk_id} ({len(refined)} chars), keeping cleaned text")
+        if delay:
+            time.sleep(delay)
+
+    if counts["refined"]:
+        # Stored policy answers were built from the cleaned text
+        from tools.policy_answer_cache import invalidate_policy_answers
+        invalidate_policy_answers()
+    counts["pending"] = len(pending) - counts["refined"] - counts["rejected"]
+    print(f"✅ Policy refinement: {counts}")
+    return counts
+
+
+_background_thread = None
+_background_lock_file = None
+
+
+def start_background_refinement() -> bool:
+    """
+    Refine pending chunks in a daemon thread, in at most one process per host.
+
+    Does nothing unless POLICY_REFINEMENT_BACKGROUND is set. The process that takes
+    the lock file runs the job; the others keep serving cleaned text meanwhile.
+    """
+    global _background_thread, _background_lock_file
+    if not POLICY_REFINEMENT_BACKGROUND or _background_thread is not None:
+        return True
+    os.makedirs(os.path.dirname(POLICY_REFINEMENTS_PATH) or ".", exist_ok=True)
+    lock_file = open(f"{POLICY_REFINEMENTS_PATH}.lock", "w")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return True
+    _background_lock_file = lock_file  # held for the life of the process
+
+    def job():
+        try:
+            run_refinement()
+        except Exception as e:
+            print(f"❌ Background policy refinement stopped: {e}")
+
+    _background_thread = threading.Thread(target=job, name="policy-refinement", daemon=True)
+    _background_thread.start()
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Refine policy chunks with the LLM and store the results")
+    parser.add_argument("command", choices=["run", "status"])
+    parser.add_argument("--limit", type=int, default=None, help="Refine at most this many chunks")
+    parser.add_argument("--model", default=POLICY_REFINEMENT_MODEL)
+    parser.add_argument("--delay", type=float, default=REFINEMENT_DELAY_SECONDS)
+    args = parser.parse_args()
+
+    if args.command == "run":
+        try:
+            run_refinement(args.limit, model=args.model, delay=args.delay)
+        except RuntimeError as e:
+            raise SystemExit(f"❌ {e}")
+        return
+
+    from tools.policy_store import load_policy_index
+    index = load_policy_index()
+    if index is None:
+        raise SystemExit("❌ No local policy index")
+    pending = pending_chunks(index)
+    rejected = {(chunk_id, chunk_version(metadata)) for chunk_id, metadata in zip(index.ids, index.metadatas)}
+    rejected &= policy_refinements.rejected_keys()
+    print(f"{len(index) - len(pending) - len(rejected)}/{len(index)} chunks refined, "
+          f"{len(rejected)} rejected, {len(pending)} pending")
+
+
+__all__ = ['RefinementStore', 'policy_refinements', 'run_refinement', 'start_background_refinement',
+           'chunk_version', 'POLICY_REFINEMENTS_PATH']
+
+
+if __name__ == "__main__":
+    main()
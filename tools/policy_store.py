@@ -0,0 +1,384 @@
+"""
+Local Policy Index
+The Terms & Conditions and Privacy Policy corpus is small and almost static, so it is
+kept in a single SQLite file next to the app instead of only in the lotus-tc Pinecone
+index. Policy search then needs no network call: the query embedding is scored against
+the stored embedding matrix with NumPy, the FTS5 table ranks the same chunks by BM25,
+and the two rankings are fused with reciprocal rank fusion.
+
+Database layout (data/policy_index.db):
+    documents  - one row per source document with its content hash as version
+    chunks     - id, row, document, section_type, text (raw), cleaned (clean_and_format_text
+                 output, served as is), embedding (float32 blob)
+    chunks_fts - FTS5 over chunks.cleaned (porter stemming), rowid = chunks.row
+    meta       - embedding model, dimension, corpus version, ingested_at
+
+Build it from the source documents (.txt, .md or .pdf) or from the live index:
+    python -m tools.policy_store ingest --input terms.pdf privacy_policy.pdf
+    python -m tools.policy_store ingest --from-pinecone
+    python -m tools.policy_store search "how many days to return"
+"""
+
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import argparse
+import threading
+from datetime import datetime, timezone
+from typing import Optional, List, Dict, Any, Tuple
+
+import numpy as np
+
+from tools.local_vector_index import LocalMatch, LocalQueryResponse
+from tools.lexical_index import reciprocal_rank_fusion
+from tools.policy_text import clean_and_format_text
+
+POLICY_DB_PATH = os.getenv("POLICY_DB_PATH", "data/policy_index.db")
+POLICY_INDEX_NAME = "lotus-tc"
+CHUNK_CHARS = 900
+CHUNK_OVERLAP_SENTENCES = 1
+HYBRID_CANDIDATES = 20
+RRF_K = 60
+
+# Section type by keyword, first match wins (stored in metadata like the lotus-tc index)
+SECTION_KEYWORDS = [
+    ("return_refund", ("return", "refund", "replacement", "exchange")),
+    ("warranty", ("warranty", "guarantee")),
+    ("cancellation", ("cancel",)),
+    ("delivery", ("delivery", "shipping", "dispatch", "installation")),
+    ("payment", ("payment", "emi", "credit card", "debit card", "upi")),
+    ("privacy", ("privacy", "personal data", "personal information", "cookie")),
+]
+
+_SENTENCE_RE = re.compile(r'(?<=[.!?])\s+(?=[A-Z0-9•(])')
+_FTS_TOKEN_RE = re.compile(r'[A-Za-z0-9]+')
+_FTS_STOPWORDS = {"what", "is", "the", "a", "an", "of", "for", "to", "in", "on", "and", "or", "do", "does",
+                  "can", "i", "my", "you", "your", "how", "me", "about", "are", "it", "with", "if"}
+
+SCHEMA = """
+CREATE TABLE documents (
+    document TEXT PRIMARY KEY,
+    version TEXT NOT NULL,
+    source TEXT,
+    chunks INTEGER NOT NULL,
+    ingested_at TEXT NOT NULL
+);
+CREATE TABLE chunks (
+    row INTEGER PRIMARY KEY,
+    id TEXT UNIQUE NOT NULL,
+    document TEXT NOT NULL,
+    section_type TEXT NOT NULL,
+    text TEXT NOT NULL,
+    cleaned TEXT NOT NULL,
+    embedding BLOB NOT NULL
+);
+CREATE VIRTUAL TABLE chunks_fts USING fts5(
+    cleaned, content='chunks', content_rowid='row', tokenize='porter unicode61'
+);
+CREATE TABLE meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+# ---------------------------------------------------------------------------
+# Chunking
+# ---------------------------------------------------------------------------
+
+def detect_section_type(text: str) -> str:
+    lowered = text.lower()
+    for section_type, keywords in SECTION_KEYWORDS:
+        if any(keyword in lowered for keyword in keywords):
+            return section_type
+    return "general"
+
+
+def document_name(path: str) -> str:
+    return "privacy_policy" if "privacy" in os.path.basename(path).lower() else "terms_conditions"
+
+
+def read_document(path: str) -> str:
+    """Plain text of a .txt/.md file or, with pypdf installed, a .pdf."""
+    if path.lower().endswith(".pdf"):
+        from pypdf import PdfReader
+        return "\n".join(page.extract_text() or "" for page in PdfReader(path).pages)
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+def chunk_text(text: str, max_chars: int = CHUNK_CHARS, overlap: int = CHUNK_OVERLAP_SENTENCES) -> List[str]:
+    """Sentence-aligned windows of about max_chars, sharing `overlap` sentences."""
+    sentences = [s.strip() for s in _SENTENCE_RE.split(re.sub(r'\s+', ' ', text or "").strip()) if s.strip()]
+    chunks, current = [], []
+    for sentence in sentences:
+        if current and sum(len(s) + 1 for s in current) + len(sentence) > max_chars:
+            chunks.append(" ".join(current))
+            current = current[-overlap:] if overlap else []
+        current.append(sentence)
+    if current and (not chunks or len(current) > overlap):
+        chunks.append(" ".join(current))
+    return chunks
+
+
+def chunks_from_documents(paths: List[str]) -> List[Dict[str, Any]]:
+    chunks = []
+    for path in paths:
+        document = document_name(path)
+        for n, text in enumerate(chunk_text(read_document(path))):
+            chunks.append({"id": f"{document}:{n}", "document": document,
+                           "section_type": detect_section_type(text), "text": text, "source": path})
+    return chunks
+
+
+def chunks_from_pinecone(index_name: str = POLICY_INDEX_NAME) -> List[Dict[str, Any]]:
+    """The chunks already in the lotus-tc index, with their stored metadata."""
+    from pinecone import Pinecone
+
+    pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
+    index = pc.Index(index_name)
+    chunks = []
+    for ids in index.list():
+        response = index.fetch(ids=list(ids))
+        for vector_id, record in response.vectors.items():
+            metadata = record.metadata or {}
+            text = re.sub(r'\s+', ' ', metadata.get("text", "")).strip()
+            if text:
+                chunks.append({"id": vector_id, "document": metadata.get("document", "terms_conditions"),
+                               "section_type": metadata.get("section_type") or detect_section_type(text),
+                               "text": text, "source": f"pinecone:{index_name}"})
+    return sorted(chunks, key=lambda chunk: chunk["id"])
+
+
+# ---------------------------------------------------------------------------
+# Ingest
+# ---------------------------------------------------------------------------
+
+def _version(texts: List[str]) -> str:
+    return hashlib.sha1("\n".join(texts).encode("utf-8")).hexdigest()[:12]
+
+
+def write_policy_db(chunks: List[Dict[str, Any]], vectors: np.ndarray, db_path: str = POLICY_DB_PATH,
+                    model_name: str = "") -> str:
+    """
+    Write these chunks as a new database and swap it in; returns the corpus version.
+
+    The file is built beside the old one and renamed over it, so running workers keep
+    reading the previous corpus until they notice the new file (see policy_db_version).
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+    now = datetime.now(timezone.utc).isoformat()
+    version = _version([chunk["text"] for chunk in chunks])
+
+    tmp_path = f"{db_path}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.executescript(SCHEMA)
+        with conn:
+            for row, (chunk, vector) in enumerate(zip(chunks, vectors)):
+                cleaned = clean_and_format_text(chunk["text"])
+                conn.execute(
+                    "INSERT INTO chunks (row, id, document, section_type, text, cleaned, embedding) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (row, chunk["id"], chunk["document"], chunk["section_type"], chunk["text"], cleaned, vector.tobytes())
+                )
+                conn.execute("INSERT INTO chunks_fts (rowid, cleaned) VALUES (?, ?)", (row, cleaned))
+            by_document = {}
+            for chunk in chunks:
+                by_document.setdefault(chunk["document"], []).append(chunk)
+            for document, document_chunks in by_document.items():
+                conn.execute(
+                    "INSERT INTO documents (document, version, source, chunks, ingested_at) VALUES (?, ?, ?, ?, ?)",
+                    (document, _version([c["text"] for c in document_chunks]), document_chunks[0].get("source"),
+                     len(document_chunks), now)
+                )
+            meta = {"embedding_model": model_name, "dimension": str(vectors.shape[1] if len(vectors) else 0),
+                    "version": version, "ingested_at": now}
+            conn.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", meta.items())
+    finally:
+        conn.close()
+    os.replace(tmp_path, db_path)
+    return version
+
+
+def ingest(chunks: List[Dict[str, Any]], db_path: str = POLICY_DB_PATH, workers: int = 1) -> str:
+    from tools.catalog_ingest import encode_texts
+    from tools.embedding_service import EMBEDDING_MODEL_NAME
+
+    if not chunks:
+        raise SystemExit("❌ No policy text found to ingest")
+    start = time.perf_counter()
+    vectors = encode_texts([chunk["text"] for chunk in chunks], workers=workers)
+    version = write_policy_db(chunks, vectors, db_path, EMBEDDING_MODEL_NAME)
+    print(f"✅ Ingested {len(chunks)} policy chunks into {db_path} (version {version}) "
+          f"in {time.perf_counter() - start:.1f}s")
+
+    # Stored answers were built from the previous corpus
+    from tools.policy_answer_cache import invalidate_policy_answers
+    invalidate_policy_answers()
+    return version
+
+
+# ---------------------------------------------------------------------------
+# Search
+# ---------------------------------------------------------------------------
+
+def fts_query(text: str) -> str:
+    """OR of the query's quoted terms, so FTS5 syntax characters in user input are inert."""
+    terms = [t.lower() for t in _FTS_TOKEN_RE.findall(text or "") if t.lower() not in _FTS_STOPWORDS]
+    return " OR ".join(f'"{term}"' for term in dict.fromkeys(terms))
+
+
+class PolicyIndex:
+    """The policy chunks and embedding matrix in memory, with the FTS5 table for BM25."""
+
+    def __init__(self, db_path: str = POLICY_DB_PATH):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, check_same_thread=False)
+        self._lock = threading.Lock()
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(chunks)")}
+        # Databases ingested before cleaned text was stored are cleaned once here
+        cleaned_column = "cleaned" if "cleaned" in columns else "NULL"
+        rows = self.conn.execute(
+            f"SELECT row, id, document, section_type, text, {cleaned_column}, embedding FROM chunks ORDER BY row"
+        ).fetchall()
+        self.meta = dict(self.conn.execute("SELECT key, value FROM meta").fetchall())
+        self.version = self.meta.get("version", "")
+        # Refinements are stored per document version, so unchanged documents keep theirs across ingests
+        document_versions = dict(self.conn.execute("SELECT document, version FROM documents").fetchall())
+        self.ids = [row[1] for row in rows]
+        self.row_by_id = {chunk_id: i for i, chunk_id in enumerate(self.ids)}
+        self.row_by_db_row = {row[0]: i for i, row in enumerate(rows)}
+        self.metadatas = [{"document": row[2], "section_type": row[3], "text": row[4],
+                           "cleaned": row[5] if row[5] is not None else clean_and_format_text(row[4]),
+                           "document_version": document_versions.get(row[2], self.version)}
+                          for row in rows]
+        dimension = int(self.meta.get("dimension") or 0)
+        self.vectors = (np.frombuffer(b"".join(row[6] for row in rows), dtype=np.float32).reshape(len(rows), dimension)
+                        if rows else np.zeros((0, dimension), dtype=np.float32))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def lexical_rows(self, text: str, limit: int = HYBRID_CANDIDATES) -> List[int]:
+        query = fts_query(text)
+        if not query:
+            return []
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT rowid FROM chunks_fts WHERE chunks_fts MATCH ? ORDER BY bm25(chunks_fts) LIMIT ?",
+                (query, limit)
+            ).fetchall()
+        return [self.row_by_db_row[row[0]] for row in rows if row[0] in self.row_by_db_row]
+
+    def dense_rows(self, vector, limit: int = HYBRID_CANDIDATES) -> Tuple[List[int], np.ndarray]:
+        query = np.asarray(vector, dtype=np.float32)
+        scores = self.vectors @ (query / max(float(np.linalg.norm(query)), 1e-12))
+        limit = min(limit, len(scores))
+        top = np.argpartition(-scores, limit - 1)[:limit] if limit else np.array([], dtype=int)
+        return top[np.argsort(-scores[top])].tolist(), scores
+
+    def query(self, vector, top_k: int = 3, include_metadata: bool = True, text: Optional[str] = None,
+              **_ignored) -> LocalQueryResponse:
+        """
+        Hybrid query shaped like a Pinecone response.
+
+        Chunks are ranked by RRF of the dense and BM25 rankings; each match's score is
+        its cosine similarity, so relevance scores stay comparable with Pinecone's.
+        """
+        if not len(self):
+            return LocalQueryResponse([])
+        dense, scores = self.dense_rows(vector)
+        rankings = [[self.ids[row] for row in dense]]
+        if text:
+            rankings.append([self.ids[row] for row in self.lexical_rows(text)])
+        matches = []
+        for chunk_id, _fused in reciprocal_rank_fusion(rankings, k=RRF_K)[:top_k]:
+            row = self.row_by_id[chunk_id]
+            matches.append(LocalMatch(chunk_id, float(scores[row]),
+                                      dict(self.metadatas[row]) if include_metadata else None))
+        return LocalQueryResponse(matches)
+
+    def describe_index_stats(self) -> Dict[str, Any]:
+        return {"total_vector_count": len(self), "dimension": int(self.vectors.shape[1]), "version": self.version,
+                "source": self.db_path}
+
+
+def policy_db_version(db_path: str = POLICY_DB_PATH) -> Optional[str]:
+    """Corpus version of the database file, read without loading it (None if unreadable)."""
+    try:
+        conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+        try:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return None
+    return row[0] if row else None
+
+
+def load_policy_index(db_path: str = POLICY_DB_PATH) -> Optional[PolicyIndex]:
+    """Open the local policy database, or None if it has not been ingested."""
+    if not os.path.exists(db_path):
+        return None
+    try:
+        start = time.perf_counter()
+        index = PolicyIndex(db_path)
+        print(f"✅ Local policy index loaded: {len(index)} chunks (version {index.version}) "
+              f"in {(time.perf_counter() - start) * 1000:.0f} ms")
+        return index
+    except Exception as e:
+        print(f"❌ Error loading local policy index: {e}")
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the local policy index")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("ingest", help="Chunk, embed and store the policy documents")
+    source = build.add_mutually_exclusive_group(required=True)
+    source.add_argument("--input", nargs="+", help="Policy documents (.txt, .md, .pdf); 'privacy' in a file name marks the privacy policy")
+    source.add_argument("--from-pinecone", action="store_true", help=f"Copy the chunks of the {POLICY_INDEX_NAME} index")
+    build.add_argument("--workers", type=int, default=1)
+    for command in (build, sub.add_parser("info"), sub.add_parser("search")):
+        command.add_argument("--db", default=POLICY_DB_PATH)
+    sub.choices["search"].add_argument("query")
+    sub.choices["search"].add_argument("--top-k", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.command == "ingest":
+        chunks = chunks_from_pinecone() if args.from_pinecone else chunks_from_documents(args.input)
+        ingest(chunks, args.db, args.workers)
+        return
+
+    index = load_policy_index(args.db)
+    if index is None:
+        raise SystemExit(f"❌ No policy index at {args.db}")
+    if args.command == "info":
+        with index._lock:
+            documents = index.conn.execute("SELECT document, version, chunks, source, ingested_at FROM documents").fetchall()
+        print(json.dumps({"meta": index.meta, "documents": [dict(zip(("document", "version", "chunks", "source", "ingested_at"), d))
+                                                           for d in documents]}, indent=2))
+    else:
+        from tools.embedding_service import get_embedding_service
+        vector = get_embedding_service().encode_query(args.query)
+        start = time.perf_counter()
+        response = index.query(vector=vector, top_k=args.top_k, text=args.query)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        for match in response.matches:
+            print(f"{match.score:.4f} [{match.metadata['section_type']}] {match.metadata['text'][:160]}")
+        print(f"⏱️  {elapsed_ms:.2f} ms (excluding query embedding)")
+
+
+__all__ = ['PolicyIndex', 'load_policy_index', 'policy_db_version', 'write_policy_db', 'chunk_text',
+           'detect_section_type', 'POLICY_DB_PATH']
+
+
+if __name__ == "__main__":
+    main()
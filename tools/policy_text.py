@@ -0,0 +1,85 @@
+"""
+Policy Text Cleaning
+Turns raw policy chunks (PDF text with OCR splits such as "cust omer") into readable
+paragraphs. The policy ingest runs this once per chunk and stores the result beside the
+raw text, so policy search only projects stored text. Chunks from Pinecone, which has
+no cleaned copy, go through the same function at query time, memoised per chunk.
+
+All OCR fixes are one precompiled alternation (longest fix first) applied in a single
+pass, and every other pattern is compiled at import.
+"""
+
+import re
+from functools import lru_cache
+
+# OCR splits found in the source PDFs -> replacement
+OCR_FIXES = {
+    'cust omer': 'customer',
+    'lotuselectr onics': 'Lotus Electronics',
+    'deliv ery': 'delivery',
+    'ser vices': 'services',
+    'transpor tation': 'transportation',
+    'Howe ver': 'However',
+    'effor t': 'effort',
+    'conv enience': 'convenience',
+    'befor e': 'before',
+    'receiv e': 'receive',
+    'tamper ed': 'tampered',
+    'char ges': 'charges',
+    'defectiv e': 'defective',
+    'contr ol': 'control',
+    'speciﬁcation': 'specification',
+    'entir e': 'entire',
+    'unlik ely': 'unlikely',
+    'Certiﬁcate': 'Certificate',
+    'wa y': 'way',
+    'v e': 've',
+    'Lotuselectr onics.com': 'Lotus Electronics',
+    'lotuselectr onics.com': 'Lotus Electronics'
+}
+
+_OCR_FIX_RE = re.compile('|'.join(re.escape(k) for k in sorted(OCR_FIXES, key=len, reverse=True)))
+_WHITESPACE_RE = re.compile(r'\s+')
+_SENTENCE_BREAK_RE = re.compile(r'([.!?])\s*([A-Z])')
+_SPACE_BEFORE_PUNCT_RE = re.compile(r'\s+([,.!?;:])')
+_SPACE_AFTER_PUNCT_RE = re.compile(r'([.!?])\s*')
+
+# Return policy highlights, as (phrase, bullet) rewrites
+_RETURN_BULLETS = [
+    ('within 7 days', '\n• Within 7 days'),
+    ('unopened item', '\n• Unopened items only'),
+    ('original packaging', '\n• In original packaging'),
+]
+
+
+def clean_and_format_text(text: str) -> str:
+    """Fix OCR splits, break sentences into paragraphs and bullet return policy conditions."""
+    cleaned = _WHITESPACE_RE.sub(' ', text or '').strip()
+    cleaned = _OCR_FIX_RE.sub(lambda m: OCR_FIXES[m.group(0)], cleaned)
+
+    cleaned = _SENTENCE_BREAK_RE.sub(r'\1\n\n\2', cleaned)
+    cleaned = _SPACE_BEFORE_PUNCT_RE.sub(r'\1', cleaned)
+    cleaned = _SPACE_AFTER_PUNCT_RE.sub(r'\1 ', cleaned)
+
+    lowered = cleaned.lower()
+    if 'return' in lowered or 'refund' in lowered:
+        cleaned = _format_return_policy(cleaned)
+    # Warranty and privacy sections keep the paragraph formatting only
+    return cleaned.strip()
+
+
+def _format_return_policy(text: str) -> str:
+    formatted = text
+    for phrase, bullet in _RETURN_BULLETS:
+        if phrase in text:
+            formatted = formatted.replace(phrase, bullet)
+    return formatted
+
+
+@lru_cache(maxsize=2048)
+def cached_clean(text: str) -> str:
+    """clean_and_format_text memoised by raw text, for chunks without a stored cleaned copy."""
+    return clean_and_format_text(text)
+
+
+__all__ = ['clean_and_format_text', 'cached_clean', 'OCR_FIXES']
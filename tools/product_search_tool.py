@@ -5,11 +5,41 @@ This tool provides semantic search functionality for products with price filteri
 
 import json
 import os
-from typing import Optional, List, Dict, Any
-from sentence_transformers import SentenceTransformer
+import time
+import threading
+from typing import Optional, List, Dict, Any, Set
 from pinecone import Pinecone
 from pydantic import BaseModel, Field
 from langchain_core.tools import tool
+from tools.embedding_service import get_embedding_service
+from tools.catalog_normalize import build_price_filter, card_features, canonical_product_url, default_image_url
+from tools.catalog_categories import detect_query_category, UNKNOWN_CATEGORY
+from tools.local_vector_index import LocalMatch
+from tools.result_selection import select_products, in_categories, default_max_per_brand, default_relaxed_max_per_brand
+from tools.lexical_index import has_model_token, reciprocal_rank_fusion
+from tools.search_result_cache import search_result_cache
+from tools.search_facets import facets_from_matches, facets_from_local_index, has_stored_categories
+from tools.search_cursor import search_cursors, current_session_id, product_key, MAX_CURSOR_CANDIDATES
+
+# Vector query sizing: fetch top_k * INITIAL_OVERFETCH, doubling (up to MAX_FETCH) when diversity fails
+INITIAL_OVERFETCH = int(os.getenv("PRODUCT_SEARCH_OVERFETCH", "3"))
+MAX_FETCH = 200
+
+# "pinecone" (default), "local" (memory-mapped snapshot only) or "auto" (Pinecone, local snapshot as fallback)
+PRODUCT_INDEX_BACKEND = os.getenv("PRODUCT_INDEX_BACKEND", "pinecone").lower()
+
+# Drop candidates stored under categories other than the query's predicted ones: snapshot
+# centroids when loaded, else the category keywords in the query. Uncategorized products pass.
+PRODUCT_CATEGORY_FILTER = os.getenv("PRODUCT_CATEGORY_FILTER", "true").lower() in ("1", "true", "yes")
+
+# Lexical (BM25) fusion: "auto" (queries with model-number-like terms), "always" or "off"
+PRODUCT_LEXICAL_SEARCH = os.getenv("PRODUCT_LEXICAL_SEARCH", "auto").lower()
+LEXICAL_TOP_K = 50
+RRF_K = int(os.getenv("PRODUCT_RRF_K", "60"))
+LEXICAL_WEIGHT = float(os.getenv("PRODUCT_LEXICAL_WEIGHT", "1.0"))
+
+# How often a worker checks whether the local snapshot was rewritten (ingest or snapshot build)
+SNAPSHOT_RELOAD_SECONDS = 10
 
 class ProductSearchInput(BaseModel):
     """Input schema for product search tool."""
@@ -17,11 +47,13 @@ class ProductSearchInput(BaseModel):
     top_k: int = Field(default=5, description="Number of products to return (1-20)", ge=1, le=20)
     price_min: Optional[float] = Field(default=None, description="Minimum price filter in rupees (e.g., 15000)")
     price_max: Optional[float] = Field(default=None, description="Maximum price filter in rupees (e.g., 100000)")
+    include_facets: bool = Field(default=False, description="Also return brand counts and price range/buckets over all matching products (use for 'which brands' or 'what price range' questions)")
+    cursor: Optional[str] = Field(default=None, description="next_cursor from a previous search_products result, to show more products from that search without repeating any already shown")
 
 class ProductSearchTool:
-    """Product search tool using Pinecone vector database."""
+    """Product search tool using Pinecone vector database or a local snapshot of it."""
     
-    def __init__(self):
+    def __init__(self, backend: str = PRODUCT_INDEX_BACKEND):
         # Pinecone configuration - prioritize environment variable
         self.pinecone_api_key = os.getenv("PINECONE_API_KEY")
         if not self.pinecone_api_key:
@@ -31,33 +63,139 @@ class ProductSearchTool:
         self.pinecone_index_name = "all-products-lotus"
         self.pinecone_host = "https://all-products-lotus-imbj1oj.svc.aped-4627-b74a.pinecone.io"
         
-        # Initialize components
-        self.model = None
-        self.index = None
+        # Components are initialized lazily (on first search or during startup warm-up)
+        self.model = get_embedding_service()
+        self.backend = backend
+        self.index = None            # index used for searches (Pinecone or local)
+        self.pinecone_index = None
+        self.local_index = None
+        self.lexical_index = None    # BM25 over product_name / sku, built from the local snapshot
+        self.category_classifier = None  # category centroids written with the local snapshot
         self.is_available = False
-        self._initialize()
+        self._initialized = False
+        self._init_lock = threading.Lock()
+        self._snapshot_version = None  # created_at of the snapshot the local components came from
+        self._loaded_mtime = None
+        self._checked_at = 0.0
+    
+    def ensure_initialized(self) -> bool:
+        """Initialize the Pinecone index once per process. Returns availability."""
+        if not self._initialized:
+            with self._init_lock:
+                if not self._initialized:
+                    self._initialize()
+                    self._initialized = True
+        else:
+            self.reload_if_changed()
+        return self.is_available
+    
+    @staticmethod
+    def _snapshot_state():
+        """(manifest mtime, snapshot version) of the local snapshot, or (None, None) without one."""
+        from tools.local_vector_index import LOCAL_INDEX_DIR
+        path = os.path.join(LOCAL_INDEX_DIR, "manifest.json")
+        try:
+            mtime = os.path.getmtime(path)
+            with open(path, encoding="utf-8") as f:
+                return mtime, json.load(f).get("created_at")
+        except (OSError, ValueError):
+            return None, None
+    
+    def reload_if_changed(self, force: bool = False) -> bool:
+        """
+        Reopen the local snapshot, lexical index and category centroids after the
+        snapshot directory was rewritten.
+
+        The manifest's mtime is checked at most every SNAPSHOT_RELOAD_SECONDS (or now with
+        force); components are rebuilt only when the manifest's created_at differs.
+        Returns whether new components were swapped in.
+        """
+        now = time.time()
+        if not force and now - self._checked_at < SNAPSHOT_RELOAD_SECONDS:
+            return False
+        self._checked_at = now
+        mtime, version = self._snapshot_state()
+        if mtime is None or mtime == self._loaded_mtime:
+            return False
+        with self._init_lock:
+            if mtime == self._loaded_mtime:
+                return False
+            self._loaded_mtime = mtime
+            if version == self._snapshot_version:
+                return False
+            local_index, lexical_index, category_classifier = self._load_snapshot_components()
+            if self.backend in ("local", "auto") and local_index is None:
+                return False
+            # Searches already running keep the objects they started with
+            if self.index is self.local_index:
+                self.index = local_index
+            self.local_index = local_index
+            self.lexical_index = lexical_index
+            self.category_classifier = category_classifier
+            self.is_available = self.index is not None
+            previous, self._snapshot_version = self._snapshot_version, version
+            print(f"🔄 Product snapshot reloaded: {previous} -> {version}")
+            return True
+    
+    def _load_snapshot_components(self):
+        """Open the local snapshot (for the local/auto backends) and build what derives from it."""
+        from tools.local_vector_index import load_local_index, LOCAL_INDEX_DIR
+        local_index = load_local_index() if self.backend in ("local", "auto") else None
+        lexical_index = None
+        if PRODUCT_LEXICAL_SEARCH != "off":
+            from tools.lexical_index import load_lexical_index
+            lexical_index = load_lexical_index(LOCAL_INDEX_DIR, local_index)
+        category_classifier = None
+        if PRODUCT_CATEGORY_FILTER:
+            from tools.category_classifier import load_category_classifier
+            category_classifier = load_category_classifier(LOCAL_INDEX_DIR)
+        return local_index, lexical_index, category_classifier
     
     def _initialize(self):
-        """Initialize the sentence transformer model and Pinecone index."""
+        """Open the configured index backends (the shared embedding model loads separately)."""
+        self._loaded_mtime, self._snapshot_version = self._snapshot_state()
+        if self.backend in ("local", "auto") and self.local_index is None:
+            from tools.local_vector_index import load_local_index
+            self.local_index = load_local_index()
+        
+        if PRODUCT_LEXICAL_SEARCH != "off" and self.lexical_index is None:
+            from tools.local_vector_index import LOCAL_INDEX_DIR
+            from tools.lexical_index import load_lexical_index
+            self.lexical_index = load_lexical_index(LOCAL_INDEX_DIR, self.local_index)
+        
+        if PRODUCT_CATEGORY_FILTER and self.category_classifier is None:
+            from tools.local_vector_index import LOCAL_INDEX_DIR
+            from tools.category_classifier import load_category_classifier
+            self.category_classifier = load_category_classifier(LOCAL_INDEX_DIR)
+        
+        if self.backend != "local":
+            try:
+                # Initialize Pinecone
+                pc = Pinecone(api_key=self.pinecone_api_key)
+                self.pinecone_index = pc.Index(self.pinecone_index_name, host=self.pinecone_host)
+                
+                # Test the connection without waiting for the embedding model
+                self.pinecone_index.describe_index_stats()
+                print("✅ Pinecone vector search initialized successfully!")
+                
+            except Exception as e:
+                print(f"❌ Error initializing vector search: {e}")
+                self.pinecone_index = None
+        
+        self.index = self.pinecone_index if self.pinecone_index is not None else self.local_index
+        if self.index is not None and self.index is self.local_index and self.backend == "auto":
+            print("⚠️  Pinecone unavailable - serving product search from the local snapshot")
+        self.is_available = self.index is not None
+    
+    def _query_index(self, **kwargs):
+        """Query the active index, falling back to the local snapshot if Pinecone fails."""
         try:
-            # Load sentence transformer model
-            self.model = SentenceTransformer("all-MiniLM-L6-v2")
-            print("✅ Sentence transformer model loaded successfully!")
-            
-            # Initialize Pinecone
-            pc = Pinecone(api_key=self.pinecone_api_key)
-            self.index = pc.Index(self.pinecone_index_name, host=self.pinecone_host)
-            
-            # Test the connection
-            test_query = self.model.encode("test").tolist()
-            self.index.query(vector=test_query, top_k=1, include_metadata=False)
-            
-            self.is_available = True
-            print("✅ Pinecone vector search initialized successfully!")
-            
+            return self.index.query(**kwargs)
         except Exception as e:
-            print(f"❌ Error initializing vector search: {e}")
-            self.is_available = False
+            if self.local_index is None or self.index is self.local_index:
+                raise
+            print(f"⚠️  Pinecone query failed ({e}), using local snapshot")
+            return self.local_index.query(**kwargs)
     
     def search_products(self, query: str, top_k: int = 5, price_min: Optional[float] = None, price_max: Optional[float] = None) -> List[Dict[str, Any]]:
         """
@@ -72,265 +210,215 @@ class ProductSearchTool:
         Returns:
             List of product dictionaries with metadata
         """
-        if not self.is_available:
-            return []
+        return self.search(query, top_k, price_min, price_max)[0]
+    
+    def search(self, query: str, top_k: int = 5, price_min: Optional[float] = None, price_max: Optional[float] = None,
+               include_facets: bool = False, with_candidates: bool = False):
+        """
+        Search for products and optionally summarize the whole candidate set.
+        
+        Returns:
+            (products, facets, candidates) - facets (brand counts, price range and histogram)
+            is None unless include_facets is set; candidates (every ranked match in the
+            predicted categories, for "show more" cursors) is None unless with_candidates is set
+        """
+        if not self.ensure_initialized():
+            return [], None, None
             
         try:
-            # Embed the query
-            query_vec = self.model.encode(query).tolist()
+            # An exact SKU or product_id needs no embedding at all
+            exact, exact_matches = self._exact_results(query, top_k, price_min, price_max)
+            if exact:
+                facets = facets_from_matches(exact_matches, price_min, price_max) if include_facets else None
+                return exact, facets, exact_matches if with_candidates else None
             
-            # Query Pinecone vector database
-            response = self.index.query(
-                vector=query_vec,
-                top_k=top_k * 10,  # Get many more results for better diversity
-                include_metadata=True
-            )
+            # Embed the query (repeat queries are served from the shared embedding cache)
+            query_vec = self.model.encode_query(query)
+            lexical_hits = self._lexical_hits(query)
+            categories = self._predict_categories(query, query_vec)
             
-            # Filter and format results with brand diversity
-            results = []
-            brand_counts = {}  # Track brands to ensure diversity
+            price_filter = build_price_filter(price_min, price_max)
             
-            for match in response.matches:
-                metadata = match.metadata or {}
-                
-                # Validate product name
-                product_name = metadata.get("product_name", "").strip()
-                if not product_name or product_name.lower() in ['unknown', 'n/a', 'null']:
-                    continue
-                
-                # Extract brand from product name for diversity
-                brand = "Unknown"
-                product_name_lower = product_name.lower()
-                if any(b in product_name_lower for b in ['samsung']):
-                    brand = "Samsung"
-                elif any(b in product_name_lower for b in ['oneplus', 'one plus']):
-                    brand = "OnePlus"
-                elif any(b in product_name_lower for b in ['xiaomi', 'redmi', 'mi ']):
-                    brand = "Xiaomi"
-                elif any(b in product_name_lower for b in ['oppo']):
-                    brand = "Oppo"
-                elif any(b in product_name_lower for b in ['vivo']):
-                    brand = "Vivo"
-                elif any(b in product_name_lower for b in ['iphone', 'apple']):
-                    brand = "Apple"
-                elif any(b in product_name_lower for b in ['nothing']):
-                    brand = "Nothing"
-                elif any(b in product_name_lower for b in ['realme']):
-                    brand = "Realme"
-                elif any(b in product_name_lower for b in ['motorola']):
-                    brand = "Motorola"
-                elif any(b in product_name_lower for b in ['philips']):
-                    brand = "Philips"
-                elif any(b in product_name_lower for b in ['braun']):
-                    brand = "Braun"
-                elif any(b in product_name_lower for b in ['panasonic']):
-                    brand = "Panasonic"
-                elif any(b in product_name_lower for b in ['havells']):
-                    brand = "Havells"
-                elif any(b in product_name_lower for b in ['syska']):
-                    brand = "Syska"
-                elif any(b in product_name_lower for b in ['nova']):
-                    brand = "Nova"
-                elif any(b in product_name_lower for b in ['kemei']):
-                    brand = "Kemei"
-                elif any(b in product_name_lower for b in ['lg']):
-                    brand = "LG"
-                elif any(b in product_name_lower for b in ['daikin']):
-                    brand = "Daikin"
-                elif any(b in product_name_lower for b in ['voltas']):
-                    brand = "Voltas"
-                elif any(b in product_name_lower for b in ['hitachi']):
-                    brand = "Hitachi"
-                elif any(b in product_name_lower for b in ['carrier']):
-                    brand = "Carrier"
-                elif any(b in product_name_lower for b in ['blue star', 'bluestar']):
-                    brand = "Blue Star"
-                elif any(b in product_name_lower for b in ['godrej']):
-                    brand = "Godrej"
-                elif any(b in product_name_lower for b in ['whirlpool']):
-                    brand = "Whirlpool"
-                elif any(b in product_name_lower for b in ['lloyd']):
-                    brand = "Lloyd"
-                elif any(b in product_name_lower for b in ['o general', 'ogeneral']):
-                    brand = "O General"
-                elif any(b in product_name_lower for b in ['mitsubishi']):
-                    brand = "Mitsubishi"
-                elif any(b in product_name_lower for b in ['haier']):
-                    brand = "Haier"
-                
-                # Extract and validate price
-                try:
-                    price_val = float(metadata.get("price", 0))
-                    if price_val <= 0:
-                        continue
-                except (ValueError, TypeError):
-                    continue
-                
-                # Apply price filtering
-                if price_min is not None and price_val < price_min:
-                    continue
-                if price_max is not None and price_val > price_max:
-                    continue
-                
-                # Enforce brand diversity - but allow more products if needed
-                # For small result sets (top_k <= 5), allow up to 3 products per brand
-                # For larger result sets, limit to 2 per brand for better diversity
-                max_per_brand = 3 if top_k <= 5 else 2
-                if brand_counts.get(brand, 0) >= max_per_brand:
+            # Enforce brand diversity; relax the cap only once no larger fetch is possible
+            max_per_brand = default_max_per_brand(top_k)
+            relaxed_max_per_brand = default_relaxed_max_per_brand(top_k)
+            
+            # Facets come from the snapshot columns when the query has a category the snapshot
+            # stores; otherwise they summarize the fetched matches, so fetch the maximum straight away
+            catalog_facets = include_facets and categories is not None and has_stored_categories(self.local_index)
+            
+            # Price bounds are applied inside the vector query, so only a small over-fetch is
+            # needed; it grows only when brand diversity cannot fill top_k from what came back
+            overfetch = INITIAL_OVERFETCH if not include_facets or catalog_facets else MAX_FETCH
+            fetch_k = min(top_k * overfetch, MAX_FETCH)
+            while True:
+                response = self._query_index(
+                    vector=query_vec,
+                    top_k=fetch_k,
+                    include_metadata=True,
+                    filter=price_filter
+                )
+                if price_filter and not response.matches and self.index is not self.local_index:
+                    # Pinecone records whose price is still a string never match $gte/$lte;
+                    # select_products checks the bounds on the coerced price instead
+                    print(f"⚠️  No matches with price filter {price_filter}, filtering prices after the query")
+                    price_filter = None
                     continue
-                
-                # Format result
-                product = {
-                    "id": match.id,
-                    "product_id": metadata.get("product_id", match.id),
-                    "score": round(match.score, 4),
-                    "product_name": product_name,
-                    "brand": brand,
-                    "sku": metadata.get("sku", "N/A"),
-                    "price": price_val,
-                    "url": metadata.get("url", "").strip(),
-                    "image_url": metadata.get("image_url", "").strip(),
-                    "description": metadata.get("text", "")[:200] + "..." if metadata.get("text", "") else ""
-                }
-                
-                results.append(product)
-                
-                # Update brand count for diversity
-                brand_counts[brand] = brand_counts.get(brand, 0) + 1
-                
-                # Stop when we have enough results
-                if len(results) >= top_k:
+                last_fetch = len(response.matches) < fetch_k or fetch_k >= MAX_FETCH
+                matches = self._fuse(response.matches, lexical_hits) if lexical_hits else response.matches
+                results = self._select_results(
+                    matches, top_k, price_min, price_max, max_per_brand,
+                    relaxed_max_per_brand if last_fetch else max_per_brand, categories
+                )
+                if len(results) >= top_k or last_fetch:
                     break
+                fetch_k = min(fetch_k * 2, MAX_FETCH)
             
-            # If we don't have enough results due to brand diversity constraints, 
-            # do a second pass with relaxed brand limits
-            if len(results) < top_k and len(response.matches) > len(results):
-                print(f"🔄 Only found {len(results)} products with brand diversity. Relaxing constraints to reach {top_k} products...")
-                
-                # Reset and try again with higher brand limits
-                results = []
-                brand_counts = {}
-                max_per_brand = top_k  # Allow more products per brand
-                
-                for match in response.matches:
-                    metadata = match.metadata or {}
-                    
-                    # Validate product name
-                    product_name = metadata.get("product_name", "").strip()
-                    if not product_name or product_name.lower() in ['unknown', 'n/a', 'null']:
-                        continue
-                    
-                    # Extract brand from product name for diversity
-                    brand = "Unknown"
-                    product_name_lower = product_name.lower()
-                    if any(b in product_name_lower for b in ['samsung']):
-                        brand = "Samsung"
-                    elif any(b in product_name_lower for b in ['oneplus', 'one plus']):
-                        brand = "OnePlus"
-                    elif any(b in product_name_lower for b in ['xiaomi', 'redmi', 'mi ']):
-                        brand = "Xiaomi"
-                    elif any(b in product_name_lower for b in ['oppo']):
-                        brand = "Oppo"
-                    elif any(b in product_name_lower for b in ['vivo']):
-                        brand = "Vivo"
-                    elif any(b in product_name_lower for b in ['iphone', 'apple']):
-                        brand = "Apple"
-                    elif any(b in product_name_lower for b in ['nothing']):
-                        brand = "Nothing"
-                    elif any(b in product_name_lower for b in ['realme']):
-                        brand = "Realme"
-                    elif any(b in product_name_lower for b in ['motorola']):
-                        brand = "Motorola"
-                    elif any(b in product_name_lower for b in ['philips']):
-                        brand = "Philips"
-                    elif any(b in product_name_lower for b in ['braun']):
-                        brand = "Braun"
-                    elif any(b in product_name_lower for b in ['panasonic']):
-                        brand = "Panasonic"
-                    elif any(b in product_name_lower for b in ['havells']):
-                        brand = "Havells"
-                    elif any(b in product_name_lower for b in ['syska']):
-                        brand = "Syska"
-                    elif any(b in product_name_lower for b in ['nova']):
-                        brand = "Nova"
-                    elif any(b in product_name_lower for b in ['kemei']):
-                        brand = "Kemei"
-                    elif any(b in product_name_lower for b in ['lg']):
-                        brand = "LG"
-                    elif any(b in product_name_lower for b in ['daikin']):
-                        brand = "Daikin"
-                    elif any(b in product_name_lower for b in ['voltas']):
-                        brand = "Voltas"
-                    elif any(b in product_name_lower for b in ['hitachi']):
-                        brand = "Hitachi"
-                    elif any(b in product_name_lower for b in ['carrier']):
-                        brand = "Carrier"
-                    elif any(b in product_name_lower for b in ['blue star', 'bluestar']):
-                        brand = "Blue Star"
-                    elif any(b in product_name_lower for b in ['godrej']):
-                        brand = "Godrej"
-                    elif any(b in product_name_lower for b in ['whirlpool']):
-                        brand = "Whirlpool"
-                    elif any(b in product_name_lower for b in ['lloyd']):
-                        brand = "Lloyd"
-                    elif any(b in product_name_lower for b in ['o general', 'ogeneral']):
-                        brand = "O General"
-                    elif any(b in product_name_lower for b in ['mitsubishi']):
-                        brand = "Mitsubishi"
-                    elif any(b in product_name_lower for b in ['haier']):
-                        brand = "Haier"
-                    
-                    # Extract and validate price
-                    try:
-                        price_val = float(metadata.get("price", 0))
-                        if price_val <= 0:
-                            continue
-                    except (ValueError, TypeError):
-                        continue
-                    
-                    # Apply price filtering
-                    if price_min is not None and price_val < price_min:
-                        continue
-                    if price_max is not None and price_val > price_max:
-                        continue
-                    
-                    # Relaxed brand diversity - allow more products per brand
-                    if brand_counts.get(brand, 0) >= max_per_brand:
-                        continue
-                    
-                    # Format result
-                    product = {
-                        "id": match.id,
-                        "product_id": metadata.get("product_id", match.id),
-                        "score": round(match.score, 4),
-                        "product_name": product_name,
-                        "brand": brand,
-                        "sku": metadata.get("sku", "N/A"),
-                        "price": price_val,
-                        "url": metadata.get("url", "").strip(),
-                        "image_url": metadata.get("image_url", "").strip(),
-                        "description": metadata.get("text", "")[:200] + "..." if metadata.get("text", "") else ""
-                    }
-                    
-                    results.append(product)
-                    
-                    # Update brand count for diversity
-                    brand_counts[brand] = brand_counts.get(brand, 0) + 1
-                    
-                    # Stop when we have enough results
-                    if len(results) >= top_k:
-                        break
+            # A wrong category guess must not hide every product
+            if not results and categories:
+                print(f"⚠️  No products in predicted categories {categories}, ignoring category filter")
+                results = self._select_results(matches, top_k, price_min, price_max, max_per_brand, relaxed_max_per_brand)
+                categories = None
+                catalog_facets = False
             
-            return results
+            facets = None
+            if include_facets:
+                if catalog_facets:
+                    facets = facets_from_local_index(self.local_index, price_min, price_max, categories)
+                else:
+                    facets = facets_from_matches(matches, price_min, price_max, categories)
+            candidates = [m for m in matches if in_categories(m, categories)] if with_candidates else None
+            return results, facets, candidates
             
         except Exception as e:
             print(f"❌ Vector search error: {e}")
+            return [], None, None
+    
+    def next_page(self, cursor: str, top_k: int = 5, session_id: Optional[str] = None) -> str:
+        """Next products from a stored candidate pool, skipping any already shown in the session."""
+        state = search_cursors.load_pool(cursor)
+        if state is None:
+            return json.dumps({
+                "cursor": cursor,
+                "error": "These search results have expired. Run a new search_products query instead."
+            }, ensure_ascii=False, indent=2)
+        
+        shown = search_cursors.shown(session_id)
+        remaining = self._unshown(state, shown)
+        results = self._select_results(
+            remaining, top_k, state["price_min"], state["price_max"],
+            default_max_per_brand(top_k), default_relaxed_max_per_brand(top_k)
+        )
+        if len(remaining) - len(results) < top_k and not state.get("extended"):
+            # The pool is the search's own over-fetch; once it runs dry, extend it once
+            if self._extend_pool(cursor, state):
+                remaining = self._unshown(state, shown)
+                results = self._select_results(
+                    remaining, top_k, state["price_min"], state["price_max"],
+                    default_max_per_brand(top_k), default_relaxed_max_per_brand(top_k)
+                )
+        search_cursors.mark_shown(session_id, [str(r["product_id"]) for r in results])
+        print(f"📄 Cursor {cursor}: {len(results)} more products, {len(remaining) - len(results)} left")
+        
+        return self.format_results(
+            results=results,
+            query=state["query"],
+            top_k=top_k,
+            price_min=state["price_min"],
+            price_max=state["price_max"],
+            next_cursor=cursor if len(remaining) > len(results) else None
+        )
+    
+    @staticmethod
+    def _unshown(state: Dict[str, Any], shown) -> List[LocalMatch]:
+        return [
+            LocalMatch(c["id"], c["score"], c["metadata"])
+            for c in state["candidates"] if product_key(c["metadata"], c["id"]) not in shown
+        ]
+    
+    def _extend_pool(self, cursor: str, state: Dict[str, Any]) -> bool:
+        """Fetch up to MAX_FETCH candidates (metadata only) for a cursor's search and store them in its pool."""
+        if not self.ensure_initialized():
+            return False
+        try:
+            response = self._query_index(
+                vector=self.model.encode_query(state["query"]),  # served from the embedding cache
+                top_k=MAX_FETCH,
+                include_metadata=True,
+                include_values=False,
+                filter=build_price_filter(state["price_min"], state["price_max"])
+            )
+        except Exception as e:
+            print(f"⚠️  Could not extend cursor {cursor}: {e}")
+            return False
+        query_vec = self.model.encode_query(state["query"])
+        categories = self._predict_categories(state["query"], query_vec)
+        pooled = {c["id"] for c in state["candidates"]}
+        extra = [m for m in response.matches if m.id not in pooled and in_categories(m, categories)]
+        added = search_cursors.pool_entries(extra, MAX_CURSOR_CANDIDATES - len(state["candidates"]))
+        state["candidates"].extend(added)
+        state["extended"] = True
+        search_cursors.update_pool(cursor, state)
+        print(f"📄 Cursor {cursor}: pool extended by {len(added)} candidates")
+        return True
+    
+    def _exact_results(self, query: str, top_k: int, price_min: Optional[float], price_max: Optional[float]):
+        """Products whose SKU or product_id is the query (or a model-like term in it), and their matches."""
+        if self.lexical_index is None:
+            return [], []
+        rows = self.lexical_index.exact_matches(query)
+        if not rows:
+            return [], []
+        matches = [LocalMatch(self.lexical_index.ids[row], 1.0, self.lexical_index.metadatas[row]) for row in rows]
+        results = self._select_results(matches, top_k, price_min, price_max, max_per_brand=top_k)
+        if results:
+            print(f"🎯 Exact SKU/product id match for '{query}' - skipped embedding")
+        return results, matches
+    
+    def _lexical_hits(self, query: str) -> List[int]:
+        """Snapshot rows ranked by BM25, when lexical fusion applies to this query."""
+        if self.lexical_index is None or PRODUCT_LEXICAL_SEARCH == "off":
+            return []
+        if PRODUCT_LEXICAL_SEARCH == "auto" and not has_model_token(query):
             return []
+        return [row for row, _ in self.lexical_index.search(query, LEXICAL_TOP_K)]
     
-    def format_results(self, results: List[Dict[str, Any]], query: str = "", top_k: int = 5, price_min: Optional[float] = None, price_max: Optional[float] = None) -> str:
-        """Format search results for JSON response."""
+    def _fuse(self, vector_matches, lexical_rows: List[int]) -> List[LocalMatch]:
+        """Reciprocal rank fusion of vector and lexical rankings; score becomes the fused score."""
+        metadata_by_id = {m.id: m.metadata for m in vector_matches}
+        lexical_ids = []
+        for row in lexical_rows:
+            item_id = self.lexical_index.ids[row]
+            lexical_ids.append(item_id)
+            metadata_by_id.setdefault(item_id, self.lexical_index.metadatas[row])
+        fused = reciprocal_rank_fusion([[m.id for m in vector_matches], lexical_ids], k=RRF_K, weights=[1.0, LEXICAL_WEIGHT])
+        return [LocalMatch(item_id, score, metadata_by_id[item_id]) for item_id, score in fused]
+    
+    def _predict_categories(self, query: str, query_vec) -> Optional[Set[str]]:
+        """Categories the query is about: snapshot centroids, else query keywords (None if neither)."""
+        if not PRODUCT_CATEGORY_FILTER:
+            return None
+        if self.category_classifier is not None:
+            predicted = self.category_classifier.predict(query_vec)
+        else:
+            category = detect_query_category(query)
+            predicted = [category] if category != UNKNOWN_CATEGORY else []
+        if predicted:
+            print(f"🏷️  Query '{query}' classified as {predicted}")
+        return set(predicted) or None
+    
+    def _select_results(self, matches, top_k: int, price_min: Optional[float], price_max: Optional[float],
+                        max_per_brand: int, relaxed_max_per_brand: Optional[int] = None,
+                        categories: Optional[Set[str]] = None) -> List[Dict[str, Any]]:
+        """Validate matches and pick up to top_k products in one brand-bucketed pass."""
+        return select_products(matches, top_k, price_min, price_max, max_per_brand, relaxed_max_per_brand, categories)
+    
+    def format_results(self, results: List[Dict[str, Any]], query: str = "", top_k: int = 5, price_min: Optional[float] = None,
+                       price_max: Optional[float] = None, facets: Optional[Dict[str, Any]] = None,
+                       next_cursor: Optional[str] = None) -> str:
+        """Format search results (plus facets and the "show more" cursor, when present) for JSON response."""
         if not results:
-            return json.dumps({
+            response = {
                 "search_query": query,
                 "total_found": 0,
                 "price_filter": {
@@ -343,85 +431,25 @@ class ProductSearchTool:
                     "has_price_filter": price_min is not None or price_max is not None,
                     "no_results": True
                 }
-            }, ensure_ascii=False, indent=2, separators=(',', ': '))
+            }
+            if facets is not None:
+                response["facets"] = facets
+            if next_cursor:
+                response["search_metadata"]["next_cursor"] = next_cursor
+            return json.dumps(response, ensure_ascii=False, indent=2, separators=(',', ': '))
         
-        # Format products for JSON response
+        # Card fields are precomputed at ingest, so formatting is a projection; products
+        # indexed before that fall back to deriving them here. Cross-category hits were
+        # already dropped by the category filter in search_products.
         products = []
         for product in results:
-            # Extract features from description
-            description = product.get('description', '')
-            features = []
-            if description and len(description) > 20:
-                # Clean and extract meaningful features
-                clean_desc = description.replace('|', ',').replace(':', ',')
-                parts = [f.strip() for f in clean_desc.split(',') if f.strip()]
-                
-                for feature in parts:
-                    cleaned = feature.strip().rstrip('.,;:')
-                    if (5 <= len(cleaned) <= 40 and 
-                        not any(skip in cleaned.lower() for skip in ['processor:', 'operating system:', 'camera back:', 'internal memory:', 'network:']) and
-                        not any(invalid in cleaned.lower() for invalid in ['undefined', 'null', 'n/a', '...'])):
-                        features.append(cleaned)
-                        if len(features) >= 3:
-                            break
-            
-            # Add default features if needed
-            if len(features) < 3:
-                product_name_lower = product.get('product_name', '').lower()
-                if any(phone in product_name_lower for phone in ['smartphone', 'phone', 'mobile', 'galaxy', 'redmi', 'oneplus']):
-                    default_features = ["High Resolution Camera", "Fast Performance", "Long Battery Life"]
-                elif any(audio in product_name_lower for audio in ['earphone', 'headphone', 'buds', 'speaker']):
-                    default_features = ["Premium Sound Quality", "Wireless Connectivity", "Comfortable Design"]
-                elif any(tv in product_name_lower for tv in ['tv', 'television', 'smart tv']):
-                    default_features = ["Full HD Display", "Smart Features", "Energy Efficient"]
-                elif any(laptop in product_name_lower for laptop in ['laptop', 'computer']):
-                    default_features = ["High Performance", "Portable Design", "Latest Technology"]
-                else:
-                    default_features = ["Latest Technology", "High Quality Build", "Great Value for Money"]
-                
-                needed = 3 - len(features)
-                features.extend(default_features[:needed])
-            
-            # Construct product URL
-            product_url = ""
-            if product.get('url'):
-                product_id = product.get('product_id') or product.get('id', '')
-                if product_id:
-                    product_url = f"https://www.lotuselectronics.com/product/{product.get('url')}/{product_id}"
-            
-            # Validate and fix image URL if needed
-            original_image_url = product.get('image_url', '')
-            product_image_url = original_image_url
-            
-            # If no image URL, generate one using product ID
-            if not product_image_url and product.get('product_id'):
-                product_id_str = str(product.get('product_id', ''))
-                if product_id_str.isdigit():
-                    product_image_url = f"https://cdn.lotuselectronics.com/webpimages/{product_id_str}IM.webp"
-                    print(f"🖼️  Generated image URL for product {product_id_str}: {product_image_url}")
-            
-            # Add category validation to catch mismatched products
-            product_name_lower = product['product_name'].lower()
-            query_lower = query.lower()
-            
-            # Check for category mismatches (e.g., asking for smartphones but getting washing machines)
-            smartphone_keywords = ['smartphone', 'mobile', 'phone', 'android', 'iphone', 'oneplus', 'samsung galaxy', 'oppo', 'vivo', 'xiaomi']
-            washing_machine_keywords = ['washing machine', 'washer', 'laundry']
-            laptop_keywords = ['laptop', 'notebook', 'computer']
-            tv_keywords = ['tv', 'television', 'led tv', 'smart tv']
-            
-            is_query_for_smartphones = any(keyword in query_lower for keyword in smartphone_keywords)
-            is_product_washing_machine = any(keyword in product_name_lower for keyword in washing_machine_keywords)
-            
-            if is_query_for_smartphones and is_product_washing_machine:
-                print(f"🚨 CATEGORY MISMATCH DETECTED:")
-                print(f"   Query: '{query}' (smartphone search)")
-                print(f"   Product: '{product['product_name']}' (washing machine)")
-                print(f"   Skipping this product due to category mismatch")
-                continue  # Skip this product
+            product_id = product.get('product_id') or product.get('id', '')
+            features = product.get('features') or card_features(product['product_name'], product.get('description', ''))
+            product_url = product.get('product_url') or canonical_product_url(product.get('url'), product_id)
+            product_image_url = product.get('image_url') or default_image_url(product.get('product_id'))
             
             products.append({
-                "product_id":product.get('product_id') or product.get('id', ''),
+                "product_id": product_id,
                 "product_name": product['product_name'],
                 "product_mrp": f"₹{product['price']:,.0f}",
                 "product_url": product_url,
@@ -443,14 +471,20 @@ class ProductSearchTool:
                 "has_price_filter": price_min is not None or price_max is not None
             }
         }
+        if facets is not None:
+            response["facets"] = facets
+        if next_cursor:
+            response["search_metadata"]["next_cursor"] = next_cursor
         
+
         return json.dumps(response, ensure_ascii=False, indent=2, separators=(',', ': '))
 
-# Initialize the product search tool instance
+# Initialize the product search tool instance (connects lazily, see ensure_initialized)
 product_search_instance = ProductSearchTool()
 
 @tool("search_products", args_schema=ProductSearchInput, return_direct=False)
-def search_products(query: str, top_k: int = 5, price_min: Optional[float] = None, price_max: Optional[float] = None) -> str:
+def search_products(query: str, top_k: int = 5, price_min: Optional[float] = None, price_max: Optional[float] = None,
+                    include_facets: bool = False, cursor: Optional[str] = None) -> str:
     """
     Search for products using semantic similarity with optional price filtering.
     
@@ -462,6 +496,10 @@ def search_products(query: str, top_k: int = 5, price_min: Optional[float] = Non
         top_k: How many products to show (default: 5, max: 20)
         price_min: Minimum price in rupees (optional)
         price_max: Maximum price in rupees (optional)
+        include_facets: Also summarize all matching products - brand counts, min/max price and
+            price buckets - to answer "which brands" / "what price range" in one call
+        cursor: search_metadata.next_cursor of an earlier result; returns the next products
+            of that search ("show more") and never repeats products already shown
     
     Returns:
         Formatted list of matching products with prices, descriptions, and links
@@ -470,25 +508,54 @@ def search_products(query: str, top_k: int = 5, price_min: Optional[float] = Non
         - search_products("Samsung AC", top_k=3, price_min=15000, price_max=50000)
         - search_products("gaming laptop under 80010", top_k=5, price_max=80010)
         - search_products("wireless headphones", top_k=10)
+        - search_products("AC", top_k=3, price_max=40000, include_facets=True)
+        - search_products("Samsung AC", cursor="<next_cursor>")
     """
     try:
+        session_id = current_session_id.get()
+        
+        # "Show more": next slice of the stored candidate pool, no embedding or vector query
+        if cursor:
+            return product_search_instance.next_page(cursor, top_k, session_id)
+        
+        # Identical searches from any session or worker are served from the shared cache
+        cached = search_result_cache.get(query, top_k, price_min, price_max, include_facets)
+        if cached is not None:
+            search_cursors.mark_shown_from_output(session_id, cached)
+            return cached
+        
         # Perform the search
-        results = product_search_instance.search_products(
+        results, facets, candidates = product_search_instance.search(
             query=query,
             top_k=top_k,
             price_min=price_min,
-            price_max=price_max
+            price_max=price_max,
+            include_facets=include_facets,
+            with_candidates=True
         )
         
+        # Keep the ranked candidates so "show more" can page through them
+        next_cursor = None
+        if candidates and len(candidates) > len(results):
+            next_cursor = search_cursors.save_pool(query, top_k, price_min, price_max, candidates, include_facets)
+        
         # Format and return results with search parameters
-        return product_search_instance.format_results(
+        output = product_search_instance.format_results(
             results=results,
             query=query,
             top_k=top_k,
             price_min=price_min,
-            price_max=price_max
+            price_max=price_max,
+            facets=facets,
+            next_cursor=next_cursor
         )
         
+        # Empty results are not cached; they may come from a transient index error
+        if results:
+            search_result_cache.set(query, top_k, price_min, price_max, output, include_facets)
+        search_cursors.mark_shown(session_id, [str(r["product_id"]) for r in results])
+        return output
+        
     except Exception as e:
         return f"Error searching for products: {str(e)}"
 
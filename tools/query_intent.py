@@ -0,0 +1,194 @@
+"""
+Query Intent Parser
+Rule-based extraction of price bounds, category and brand from a chat message, run
+before the LLM so "under 50k", "between 20000 and 30000" or "below 1 lakh" reach
+search_products as exact price_min/price_max values on the first model call.
+
+Amounts understand Indian shorthand: 45k, 45 thousand, 1.5 lakh/lac, 2 crore, ₹/Rs
+prefixes and comma grouping (1,20,000). A number only counts as a price next to a
+bound word ("under", "above", "between", ...), a currency marker or a unit, so phone
+numbers, OTPs and "55 inch" are ignored. Category and brand come from the same
+compiled lexicons the catalog uses.
+
+Hints are only injected for a price or brand bound, or for a category on a new product
+query: follow-ups such as "compare the first two TVs" refer to products already shown
+and must not be steered into a fresh search.
+"""
+
+import re
+from typing import Optional, Dict, Any
+
+from tools.brand_lexicon import detect_brand, UNKNOWN_BRAND
+from tools.catalog_categories import detect_query_category, UNKNOWN_CATEGORY
+
+# "around X" spans X +/- AROUND_MARGIN, as the system prompt has always described it
+AROUND_MARGIN = 5000
+
+_MULTIPLIERS = {
+    "k": 1_000, "thousand": 1_000,
+    "lakh": 100_000, "lakhs": 100_000, "lac": 100_000, "lacs": 100_000,
+    "crore": 10_000_000, "crores": 10_000_000, "cr": 10_000_000,
+}
+
+_CURRENCY = r'(?:₹|rs\.?|inr)'
+_UNIT = r'(?:k|thousand|lakhs?|lacs?|crores?|cr)'
+# Spec units that make a nearby number a product attribute rather than a price
+_SPEC_UNIT = r'(?:inch(?:es)?|"|ton(?:ne)?s?|gb|tb|mp|mah|hz|w|watts?|kg|l|ltrs?|litres?|liters?|star|cm|mm|%|g\b)'
+_AMOUNT = (
+    rf'{_CURRENCY}?\s*(?P<{{n}}>\d[\d,]*(?:\.\d+)?|a|one)\s*(?P<{{u}}>{_UNIT})?\b(?!\s*{_SPEC_UNIT})'
+    r'(?:\s*(?:rupees|rs\.?|/-))?'
+)
+
+
+def _amount(num: str, unit: str) -> str:
+    return _AMOUNT.format(n=num, u=unit)
+
+
+_MAX_WORDS = r'(?:under|below|less\s+than|lesser\s+than|upto|up\s+to|within|max(?:imum)?|not\s+more\s+than|no\s+more\s+than|budget(?:\s+(?:of|is))?|cheaper\s+than|<)'
+_MIN_WORDS = r'(?:above|over|more\s+than|greater\s+than|starting\s+(?:from|at)|min(?:imum)?|at\s+least|atleast|>)'
+_AROUND_WORDS = r'(?:around|about|near|nearly|approx(?:imately)?\.?|close\s+to|roughly|~)'
+
+_RANGE_RE = re.compile(
+    rf'(?P<kw>\b(?:between|from|range(?:\s+of)?)\s*)?{_amount("lo", "lou")}\s*(?:-|–|to|and)\s*{_amount("hi", "hiu")}',
+    re.IGNORECASE
+)
+_MAX_RE = re.compile(rf'\b{_MAX_WORDS}\s*(?:of\s+|rs\.?\s+)?{_amount("n", "u")}', re.IGNORECASE)
+_MIN_RE = re.compile(rf'(?:\b|(?<=>)){_MIN_WORDS}\s*(?:of\s+|rs\.?\s+)?{_amount("n", "u")}', re.IGNORECASE)
+_AROUND_RE = re.compile(rf'(?:\b|(?<=~)){_AROUND_WORDS}\s*{_amount("n", "u")}', re.IGNORECASE)
+# Bound words after the amount: "30k budget", "40000 or less", "50k+"
+_MAX_AFTER_RE = re.compile(rf'{_amount("n", "u")}\s*(?:budget|max(?:imum)?|or\s+less|or\s+below|or\s+under)\b', re.IGNORECASE)
+_MIN_AFTER_RE = re.compile(rf'{_amount("n", "u")}\s*(?:\+|plus\b|or\s+more\b|or\s+above\b|and\s+above\b|onwards\b)', re.IGNORECASE)
+
+_CURRENCY_RE = re.compile(_CURRENCY, re.IGNORECASE)
+
+# Contact details mention "phone"/"mobile" without asking for one
+_CONTACT_RE = re.compile(r'\b(?:phone|mobile|contact|whatsapp)\s+(?:number|no\.?)\b', re.IGNORECASE)
+# Brands that are also everyday words; only trusted next to a product category
+_AMBIGUOUS_BRANDS = {"Nothing", "Nova", "Carrier"}
+# Prices below this without a unit or currency are spec values or list positions ("top 5")
+_MIN_BARE_PRICE = 500
+# References to products already shown: comparisons, list positions, "show more"
+_FOLLOW_UP_RE = re.compile(
+    r'\b(?:compare|comparison|vs\.?|versus|difference|differences|better|which\s+one|which\s+of|'
+    r'first|second|third|fourth|fifth|last\s+one|previous|these|those|them|both|this\s+one|that\s+one|'
+    r'tell\s+me\s+more|more\s+(?:about|details|options|like)|show\s+(?:me\s+)?more)\b',
+    re.IGNORECASE
+)
+
+
+def parse_amount(number: str, unit: Optional[str] = None) -> Optional[float]:
+    """'45' + 'k' -> 45000, '1.5' + 'lakh' -> 150000, '1,20,000' -> 120000."""
+    if not number:
+        return None
+    number = number.lower()
+    if number in ("a", "one"):
+        if not unit:
+            return None
+        value = 1.0
+    else:
+        try:
+            value = float(number.replace(",", ""))
+        except ValueError:
+            return None
+    if unit:
+        value *= _MULTIPLIERS[unit.lower()]
+    return value
+
+
+def _has_currency(text: str) -> bool:
+    return _CURRENCY_RE.search(text) is not None
+
+
+def _group_amount(match, num: str, unit: str) -> Optional[float]:
+    """Amount of a bound match; small bare numbers only count with a unit or currency."""
+    value = parse_amount(match.group(num), match.group(unit))
+    if value is None:
+        return None
+    if not match.group(unit) and value < _MIN_BARE_PRICE and not _has_currency(match.group(0)):
+        return None
+    return value
+
+
+def _first_amount(patterns, text: str) -> Optional[float]:
+    for pattern in patterns:
+        match = pattern.search(text)
+        if match:
+            value = _group_amount(match, "n", "u")
+            if value is not None:
+                return value
+    return None
+
+
+def parse_price_bounds(message: str) -> Dict[str, float]:
+    """price_min / price_max named by a message (either, both or neither key)."""
+    text = message or ""
+    for match in _RANGE_RE.finditer(text):
+        # A bare "695-0746" is a phone number, not a range
+        if not (match.group("kw") or match.group("hiu") or _has_currency(match.group(0))):
+            continue
+        # "20-30k": a unit on the upper bound carries over to the lower one
+        low = parse_amount(match.group("lo"), match.group("lou") or match.group("hiu"))
+        high = _group_amount(match, "hi", "hiu")
+        if low is not None and high is not None and low < high:
+            return {"price_min": low, "price_max": high}
+
+    bounds = {}
+    price_max = _first_amount((_MAX_RE, _MAX_AFTER_RE), text)
+    if price_max is not None:
+        bounds["price_max"] = price_max
+    price_min = _first_amount((_MIN_RE, _MIN_AFTER_RE), text)
+    if price_min is not None and (price_max is None or price_min < price_max):
+        bounds["price_min"] = price_min
+    if bounds:
+        return bounds
+
+    value = _first_amount((_AROUND_RE,), text)
+    if value is not None:
+        return {"price_min": max(value - AROUND_MARGIN, 0.0), "price_max": value + AROUND_MARGIN}
+    return {}
+
+
+def parse_query_intent(message: str) -> Dict[str, Any]:
+    """
+    Structured search hints for a chat message.
+
+    Returns a dict with any of price_min, price_max, category and brand that the
+    message states explicitly; an empty dict when it names none of them.
+    """
+    text = message or ""
+    intent: Dict[str, Any] = dict(parse_price_bounds(text))
+
+    product_text = _CONTACT_RE.sub(" ", text)
+    category = detect_query_category(product_text)
+    if category != UNKNOWN_CATEGORY:
+        intent["category"] = category
+    brand = detect_brand(product_text)
+    if brand != UNKNOWN_BRAND and (brand not in _AMBIGUOUS_BRANDS or "category" in intent):
+        intent["brand"] = brand
+    return intent
+
+
+def is_follow_up(message: str) -> bool:
+    """Whether a message refers to products already shown (compare, "the first two", "show more")."""
+    return _FOLLOW_UP_RE.search(message or "") is not None
+
+
+def has_search_hints(intent: Dict[str, Any], message: str = "") -> bool:
+    """
+    Worth passing to the model: a price or brand bound, or the category of a new
+    product query. A category alone in a follow-up message is not a hint.
+    """
+    if any(key in intent for key in ("price_min", "price_max", "brand")):
+        return True
+    return "category" in intent and not is_follow_up(message)
+
+
+def format_intent_hint(intent: Dict[str, Any]) -> str:
+    """One-line hint appended to the user's message for the model."""
+    values = {key: (int(value) if key.startswith("price_") and float(value).is_integer() else value)
+              for key, value in intent.items()}
+    return "[search hints: " + ", ".join(f"{key}={value}" for key, value in values.items()) + "]"
+
+
+__all__ = ['parse_query_intent', 'parse_price_bounds', 'parse_amount', 'has_search_hints', 'is_follow_up',
+           'format_intent_hint']
@@ -0,0 +1,152 @@
+"""
+Diversity-Aware Result Selection
+Turns raw vector matches into product results in one pass. Valid candidates are
+bucketed by brand while they are scanned: the first max_per_brand of each brand are
+accepted in score order, the rest are kept as overflow. When the capped selection
+cannot fill top_k, the overflow buckets are drawn round-robin (best brand first, up
+to relaxed_max_per_brand each) instead of rescanning every match.
+"""
+
+import os
+from collections import OrderedDict
+from typing import Optional, List, Dict, Any, Set
+
+from tools.brand_lexicon import brand_from_metadata
+from tools.catalog_categories import category_allowed
+
+# Per-brand caps; empty means "3 when top_k <= 5, else 2" and "top_k" respectively.
+# A relaxed cap of 0 disables relaxation.
+MAX_PER_BRAND = os.getenv("PRODUCT_SEARCH_MAX_PER_BRAND", "")
+RELAXED_MAX_PER_BRAND = os.getenv("PRODUCT_SEARCH_RELAXED_MAX_PER_BRAND", "")
+
+INVALID_PRODUCT_NAMES = {'unknown', 'n/a', 'null'}
+
+
+def default_max_per_brand(top_k: int) -> int:
+    """Per-brand cap for the first selection round."""
+    if MAX_PER_BRAND:
+        return int(MAX_PER_BRAND)
+    # Small result sets allow up to 3 products per brand, larger ones 2 for better diversity
+    return 3 if top_k <= 5 else 2
+
+
+def default_relaxed_max_per_brand(top_k: int) -> int:
+    """Per-brand cap used when the first round cannot fill top_k."""
+    return int(RELAXED_MAX_PER_BRAND) if RELAXED_MAX_PER_BRAND else top_k
+
+
+def _validate(match, price_min: Optional[float], price_max: Optional[float]):
+    """Return (product_name, price, metadata) for a usable match, else None."""
+    metadata = match.metadata or {}
+
+    product_name = metadata.get("product_name", "").strip()
+    if not product_name or product_name.lower() in INVALID_PRODUCT_NAMES:
+        return None
+
+    try:
+        price_val = float(metadata.get("price", 0))
+    except (ValueError, TypeError):
+        return None
+    if price_val <= 0:
+        return None
+    if price_min is not None and price_val < price_min:
+        return None
+    if price_max is not None and price_val > price_max:
+        return None
+    return product_name, price_val, metadata
+
+
+def _build_product(match, metadata: Dict[str, Any], product_name: str, brand: str, price_val: float) -> Dict[str, Any]:
+    text = metadata.get("text", "")
+    return {
+        "id": match.id,
+        "product_id": metadata.get("product_id", match.id),
+        "score": round(match.score, 4),
+        "product_name": product_name,
+        "brand": brand,
+        "sku": metadata.get("sku", "N/A"),
+        "price": price_val,
+        "url": metadata.get("url", "").strip(),
+        "image_url": metadata.get("image_url", "").strip(),
+        "description": text[:200] + "..." if text else "",
+        # Card fields precomputed at ingest (absent on records that predate it)
+        "category": metadata.get("category"),
+        "features": metadata.get("features"),
+        "product_url": metadata.get("product_url")
+    }
+
+
+def in_categories(match, categories: Optional[Set[str]]) -> bool:
+    """Whether a match passes the category filter: its category stored at ingest is one of
+    the categories, or it has none / "Other" (always true without categories)."""
+    return category_allowed((match.metadata or {}).get("category"), categories)
+
+
+def select_products(matches, top_k: int, price_min: Optional[float] = None, price_max: Optional[float] = None,
+                    max_per_brand: Optional[int] = None, relaxed_max_per_brand: Optional[int] = None,
+                    categories: Optional[Set[str]] = None) -> List[Dict[str, Any]]:
+    """
+    Validate matches and pick up to top_k products, balancing brands.
+
+    Args:
+        matches: Vector matches in descending score order (Pinecone or local index)
+        top_k: Number of products to return
+        price_min: Minimum price (matches below are skipped)
+        price_max: Maximum price (matches above are skipped)
+        max_per_brand: Cap per brand for the first round (default: default_max_per_brand)
+        relaxed_max_per_brand: Cap per brand when relaxing (default: default_relaxed_max_per_brand)
+        categories: Drop products stored under other categories (None keeps all)
+
+    Returns:
+        Product dictionaries in score order
+    """
+    if max_per_brand is None:
+        max_per_brand = default_max_per_brand(top_k)
+    if relaxed_max_per_brand is None:
+        relaxed_max_per_brand = default_relaxed_max_per_brand(top_k)
+
+    selected = []               # (rank, match, metadata, name, brand, price)
+    brand_counts = {}
+    overflow = OrderedDict()    # brand -> candidates over the cap, brands in order of first overflow
+
+    for rank, match in enumerate(matches):
+        valid = _validate(match, price_min, price_max)
+        if valid is None:
+            continue
+        product_name, price_val, metadata = valid
+        if categories and not in_categories(match, categories):
+            continue
+        brand = brand_from_metadata(metadata, product_name)
+
+        candidate = (rank, match, metadata, product_name, brand, price_val)
+        if brand_counts.get(brand, 0) < max_per_brand:
+            selected.append(candidate)
+            brand_counts[brand] = brand_counts.get(brand, 0) + 1
+            if len(selected) >= top_k:
+                break
+        else:
+            overflow.setdefault(brand, []).append(candidate)
+
+    if len(selected) < top_k and overflow and relaxed_max_per_brand > max_per_brand:
+        # Round-robin over the overflow buckets so no single brand takes every free slot
+        positions = {brand: 0 for brand in overflow}
+        added = []
+        while len(selected) + len(added) < top_k and positions:
+            for brand in list(positions):
+                bucket = overflow[brand]
+                position = positions[brand]
+                if position >= len(bucket) or brand_counts[brand] >= relaxed_max_per_brand:
+                    del positions[brand]
+                    continue
+                added.append(bucket[position])
+                positions[brand] = position + 1
+                brand_counts[brand] += 1
+                if len(selected) + len(added) >= top_k:
+                    break
+        if added:
+            selected = sorted(selected + added, key=lambda c: c[0])
+
+    return [_build_product(match, metadata, name, brand, price) for _, match, metadata, name, brand, price in selected]
+
+
+__all__ = ['select_products', 'in_categories', 'default_max_per_brand', 'default_relaxed_max_per_brand']
@@ -0,0 +1,147 @@
+"""
+Search Cursors ("show more")
+A product search stores the ranked candidates it already fetched in Redis under an
+opaque cursor, and the tool output carries that cursor as next_cursor. Calling
+search_products with the cursor returns the next brand-balanced slice of the pool, with
+no embedding and no vector query. When the pool runs dry it is extended once by a larger
+metadata-only query. Products already shown in the conversation are tracked per session
+and never repeated.
+
+The cursor is derived from the search parameters (like the result cache key), so the
+cached tool output stays valid for every session; only the shown-product set is per
+session. Pools are stored under the catalog version and expire with the result cache.
+"""
+
+import json
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional, List, Dict, Any, Iterable, Set
+
+import redis
+
+from tools.search_result_cache import search_result_cache, SEARCH_CACHE_TTL, SEARCH_CACHE_RETRY_SECONDS
+
+MAX_CURSOR_CANDIDATES = 100
+SHOWN_TTL_SECONDS = 1800  # same lifetime as the conversation memory
+POOL_KEY_PREFIX = "search_pool"
+SHOWN_KEY_PREFIX = "search_shown"
+
+# Metadata kept in a pool; enough to rebuild product cards without the index
+POOL_FIELDS = ("product_id", "product_name", "price", "brand", "sku", "url", "image_url",
+               "category", "features", "product_url")
+
+current_session_id: ContextVar[Optional[str]] = ContextVar("search_session_id", default=None)
+
+
+@contextmanager
+def search_session(session_id: str):
+    """Make tool calls inside the block record shown products for this session."""
+    token = current_session_id.set(session_id)
+    try:
+        yield
+    finally:
+        current_session_id.reset(token)
+
+
+def product_key(metadata: Dict[str, Any], fallback_id: str) -> str:
+    return str(metadata.get("product_id") or fallback_id)
+
+
+class SearchCursorStore:
+    """Candidate pools per cursor and shown products per session, in Redis."""
+
+    def __init__(self, cache=search_result_cache, ttl_seconds: int = SEARCH_CACHE_TTL):
+        self.cache = cache
+        self.redis_client = cache.redis_client
+        self.ttl_seconds = ttl_seconds
+        self._unavailable_until = 0.0
+
+    def _available(self) -> bool:
+        return time.time() >= self._unavailable_until
+
+    def _record_error(self, action: str, e: Exception):
+        self._unavailable_until = time.time() + SEARCH_CACHE_RETRY_SECONDS
+        print(f"⚠️  Could not {action} ({type(e).__name__}: {e}), retrying Redis in {SEARCH_CACHE_RETRY_SECONDS}s")
+
+    def _pool_key(self, cursor: str) -> str:
+        return f"{POOL_KEY_PREFIX}:{self.cache.catalog_version()}:{cursor}"
+
+    def save_pool(self, query: str, top_k: int, price_min: Optional[float], price_max: Optional[float],
+                  candidates: Iterable, include_facets: bool = False) -> Optional[str]:
+        """Store ranked candidate matches; returns the cursor, or None if Redis is unavailable."""
+        cursor = self.cache.make_cursor(query, top_k, price_min, price_max, include_facets)
+        state = {"query": query, "top_k": top_k, "price_min": price_min, "price_max": price_max,
+                 "candidates": self.pool_entries(candidates)}
+        return cursor if self.update_pool(cursor, state) else None
+
+    @staticmethod
+    def pool_entries(candidates: Iterable, limit: int = MAX_CURSOR_CANDIDATES) -> List[Dict[str, Any]]:
+        """Matches as pool entries with only the card metadata."""
+        pool = []
+        for match in candidates:
+            if len(pool) >= limit:
+                break
+            metadata = match.metadata or {}
+            trimmed = {k: metadata[k] for k in POOL_FIELDS if k in metadata}
+            trimmed["text"] = (metadata.get("text") or "")[:200]
+            pool.append({"id": match.id, "score": float(match.score), "metadata": trimmed})
+        return pool
+
+    def update_pool(self, cursor: str, state: Dict[str, Any]) -> bool:
+        """Store a cursor's pool state; False if Redis is unavailable."""
+        if not self._available():
+            return False
+        try:
+            self.redis_client.setex(self._pool_key(cursor), self.ttl_seconds, json.dumps(state, ensure_ascii=False))
+            return True
+        except redis.RedisError as e:
+            self._record_error("store search cursor", e)
+            return False
+
+    def load_pool(self, cursor: str) -> Optional[Dict[str, Any]]:
+        if not self._available():
+            return None
+        try:
+            data = self.redis_client.get(self._pool_key(cursor))
+        except redis.RedisError as e:
+            self._record_error("load search cursor", e)
+            return None
+        return json.loads(data) if data else None
+
+    def shown(self, session_id: Optional[str]) -> Set[str]:
+        if not session_id or not self._available():
+            return set()
+        try:
+            return set(self.redis_client.smembers(f"{SHOWN_KEY_PREFIX}:{session_id}"))
+        except redis.RedisError as e:
+            self._record_error("read shown products", e)
+            return set()
+
+    def mark_shown(self, session_id: Optional[str], product_ids: List[str]):
+        if not session_id or not product_ids or not self._available():
+            return
+        key = f"{SHOWN_KEY_PREFIX}:{session_id}"
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.sadd(key, *product_ids)
+            pipe.expire(key, SHOWN_TTL_SECONDS)
+            pipe.execute()
+        except redis.RedisError as e:
+            self._record_error("record shown products", e)
+
+    def mark_shown_from_output(self, session_id: Optional[str], output: str):
+        """Record the products in a (cached) tool output as shown."""
+        if not session_id:
+            return
+        try:
+            products = json.loads(output).get("products", [])
+        except (ValueError, AttributeError):
+            return
+        self.mark_shown(session_id, [str(p["product_id"]) for p in products if p.get("product_id")])
+
+
+search_cursors = SearchCursorStore()
+
+
+__all__ = ['SearchCursorStore', 'search_cursors', 'search_session', 'current_session_id', 'product_key']
@@ -0,0 +1,122 @@
+"""
+Search Facets
+Brand counts, min/max price and a price histogram over a search's candidate set, computed
+with NumPy in one pass so a single tool call can answer "which brands / what price range
+do you have" questions. With the local snapshot and a predicted category the candidate set
+is every snapshot product stored under that category (from its metadata columns);
+otherwise it is every match the vector query returned.
+"""
+
+import math
+from typing import Optional, List, Dict, Any, Iterable
+
+import numpy as np
+
+from tools.brand_lexicon import brand_from_metadata, UNKNOWN_BRAND
+from tools.catalog_categories import category_allowed
+from tools.catalog_normalize import coerce_price
+
+PRICE_BUCKET_COUNT = 5
+MAX_FACET_BRANDS = 15
+_NICE_STEPS = (1, 2, 2.5, 5)
+
+
+def _nice_step(span: float, buckets: int) -> float:
+    """Round a bucket width up to 1, 2, 2.5 or 5 times a power of ten (₹1,000, ₹2,500, ...)."""
+    raw = max(span / buckets, 1.0)
+    magnitude = 10 ** math.floor(math.log10(raw))
+    for step in _NICE_STEPS:
+        if raw <= step * magnitude:
+            return step * magnitude
+    return 10 * magnitude
+
+
+def compute_facets(prices: np.ndarray, brands: np.ndarray, mask: Optional[np.ndarray] = None,
+                   bucket_count: int = PRICE_BUCKET_COUNT) -> Dict[str, Any]:
+    """
+    Facet summary over candidates.
+
+    Args:
+        prices: float array of candidate prices (NaN or <= 0 when unknown)
+        brands: object array of candidate brands (same length)
+        mask: optional boolean array selecting the candidates to count
+        bucket_count: approximate number of price buckets
+    """
+    valid = np.isfinite(prices) & (prices > 0)
+    if mask is not None:
+        valid &= mask
+    prices = prices[valid]
+    brands = brands[valid]
+    if len(prices) == 0:
+        return {"candidates": 0, "price": None, "brands": [], "price_buckets": []}
+
+    names, counts = np.unique(brands.astype(str), return_counts=True)
+    order = np.argsort(-counts, kind="stable")
+    brand_facets = [{"brand": str(names[i]), "count": int(counts[i])} for i in order[:MAX_FACET_BRANDS]]
+
+    low, high = float(prices.min()), float(prices.max())
+    step = _nice_step(high - low, bucket_count)
+    start = math.floor(low / step) * step
+    edges = np.arange(start, high + step, step)
+    if len(edges) < 2:
+        edges = np.array([start, start + step])
+    histogram, edges = np.histogram(prices, bins=edges)
+    buckets = [
+        {"min": float(edges[i]), "max": float(edges[i + 1]), "count": int(histogram[i])}
+        for i in range(len(histogram)) if histogram[i]
+    ]
+    return {
+        "candidates": int(len(prices)),
+        "price": {"min": low, "max": high},
+        "brands": brand_facets,
+        "price_buckets": buckets,
+    }
+
+
+def facets_from_matches(matches: Iterable, price_min: Optional[float] = None, price_max: Optional[float] = None,
+                        categories: Optional[set] = None) -> Dict[str, Any]:
+    """Facets over the matches a vector query returned (after the price and category filters)."""
+    metadatas = [m.metadata or {} for m in matches]
+    names = [md.get("product_name", "") for md in metadatas]
+    prices = np.array([coerce_price(md.get("price")) or np.nan for md in metadatas], dtype=np.float64)
+    brands = np.array([brand_from_metadata(md, name) for md, name in zip(metadatas, names)], dtype=object)
+    mask = _price_mask(prices, price_min, price_max)
+    if categories:
+        mask &= np.array([category_allowed(md.get("category"), categories) for md in metadatas], dtype=bool)
+    return compute_facets(prices, brands, mask)
+
+
+def has_stored_categories(local_index) -> bool:
+    """Whether the snapshot stores product categories (a float column means none at all)."""
+    return local_index is not None and local_index.column("category").dtype == object
+
+
+def facets_from_local_index(local_index, price_min: Optional[float] = None, price_max: Optional[float] = None,
+                            categories: Optional[set] = None) -> Dict[str, Any]:
+    """
+    Facets over every snapshot product in the predicted categories and price range.
+
+    Only products stored under one of the categories are counted: uncategorized products
+    would otherwise add the whole rest of the catalog to the brand and price counts.
+    """
+    prices = np.asarray(local_index.column("price"), dtype=np.float64)
+    brands = local_index.column("brand")
+    if brands.dtype != object:  # no brand stored in this snapshot
+        brands = np.array([brand_from_metadata(md) for md in local_index.metadatas], dtype=object)
+    brands = np.where(brands == None, UNKNOWN_BRAND, brands)  # noqa: E711 (element-wise)
+    mask = _price_mask(prices, price_min, price_max)
+    if categories and has_stored_categories(local_index):
+        mask &= np.isin(local_index.column("category"), list(categories))
+    return compute_facets(prices, brands, mask)
+
+
+def _price_mask(prices: np.ndarray, price_min: Optional[float], price_max: Optional[float]) -> np.ndarray:
+    mask = np.ones(len(prices), dtype=bool)
+    if price_min is not None:
+        mask &= prices >= price_min
+    if price_max is not None:
+        mask &= prices <= price_max
+    return mask
+
+
+__all__ = ['compute_facets', 'facets_from_matches', 'facets_from_local_index', 'has_stored_categories']
@@ -0,0 +1,149 @@
+"""
+Shared Search Result Cache
+Caches the formatted output of the search_products tool in Redis, so identical
+(query, top_k, price_min, price_max, include_facets) searches from any session or gunicorn worker
+skip the encode, the vector query and the formatting.
+
+Keys carry the catalog version stored in Redis under CATALOG_VERSION_KEY. Reindexing
+calls bump_catalog_version(), after which every lookup uses new keys and the old
+entries simply expire.
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+from typing import Optional, Dict, Any
+
+import redis
+
+from tools.embedding_service import normalize_query
+
+SEARCH_CACHE_ENABLED = os.getenv("SEARCH_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+SEARCH_CACHE_TTL = int(os.getenv("SEARCH_CACHE_TTL", "900"))  # seconds
+SEARCH_CACHE_RETRY_SECONDS = 30  # back off this long after a Redis error
+CATALOG_VERSION_KEY = "catalog:version"
+KEY_PREFIX = "search_cache"
+
+
+class SearchResultCache:
+    """Redis-backed cache of formatted product search output, with hit/miss counters."""
+
+    def __init__(self, redis_host='localhost', redis_port=6379, redis_db=0,
+                 ttl_seconds: int = SEARCH_CACHE_TTL, enabled: bool = SEARCH_CACHE_ENABLED):
+        self.redis_client = redis.Redis(
+            host=redis_host,
+            port=redis_port,
+            db=redis_db,
+            decode_responses=True,
+            socket_timeout=0.5,
+            socket_connect_timeout=0.5
+        )
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        self._unavailable_until = 0.0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.errors = 0
+
+    def _available(self) -> bool:
+        return self.enabled and time.time() >= self._unavailable_until
+
+    def _record_error(self, e: Exception):
+        with self._lock:
+            self.errors += 1
+        self._unavailable_until = time.time() + SEARCH_CACHE_RETRY_SECONDS
+        print(f"⚠️  Search cache unavailable ({type(e).__name__}: {e}), retrying in {SEARCH_CACHE_RETRY_SECONDS}s")
+
+    def catalog_version(self) -> str:
+        return self.redis_client.get(CATALOG_VERSION_KEY) or "0"
+
+    @staticmethod
+    def _digest(query: str, top_k: int, price_min: Optional[float], price_max: Optional[float], *extra) -> str:
+        params = json.dumps([
+            normalize_query(query),
+            int(top_k),
+            None if price_min is None else float(price_min),
+            None if price_max is None else float(price_max),
+            *extra
+        ])
+        return hashlib.sha1(params.encode("utf-8")).hexdigest()
+
+    def make_key(self, version: str, query: str, top_k: int, price_min: Optional[float], price_max: Optional[float],
+                 include_facets: bool = False) -> str:
+        extra = ("facets",) if include_facets else ()
+        return f"{KEY_PREFIX}:{version}:{self._digest(query, top_k, price_min, price_max, *extra)}"
+
+    def make_cursor(self, query: str, top_k: int, price_min: Optional[float], price_max: Optional[float],
+                    include_facets: bool = False) -> str:
+        """Opaque, session-independent cursor for a search's candidate pool."""
+        extra = ("facets",) if include_facets else ()
+        return self._digest(query, top_k, price_min, price_max, *extra)[:16]
+
+    def get(self, query: str, top_k: int, price_min: Optional[float] = None, price_max: Optional[float] = None,
+            include_facets: bool = False) -> Optional[str]:
+        """Cached tool output, or None on a miss (or when Redis is unreachable)."""
+        if not self._available():
+            return None
+        try:
+            key = self.make_key(self.catalog_version(), query, top_k, price_min, price_max, include_facets)
+            output = self.redis_client.get(key)
+        except redis.RedisError as e:
+            self._record_error(e)
+            return None
+        with self._lock:
+            if output is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return output
+
+    def set(self, query: str, top_k: int, price_min: Optional[float], price_max: Optional[float], output: str,
+            include_facets: bool = False):
+        """Store tool output under the current catalog version with the configured TTL."""
+        if not self._available():
+            return
+        try:
+            key = self.make_key(self.catalog_version(), query, top_k, price_min, price_max, include_facets)
+            self.redis_client.setex(key, self.ttl_seconds, output)
+        except redis.RedisError as e:
+            self._record_error(e)
+            return
+        with self._lock:
+            self.stores += 1
+
+    def bump_catalog_version(self) -> Optional[str]:
+        """Invalidate every cached search by moving all workers to a new key space."""
+        try:
+            version = str(self.redis_client.incr(CATALOG_VERSION_KEY))
+            print(f"🔄 Catalog version is now {version}; search cache invalidated")
+            return version
+        except redis.RedisError as e:
+            print(f"⚠️  Could not bump catalog version: {e}")
+            return None
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "available": self._available(),
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "errors": self.errors,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+search_result_cache = SearchResultCache()
+
+
+def bump_catalog_version() -> Optional[str]:
+    return search_result_cache.bump_catalog_version()
+
+
+__all__ = ['SearchResultCache', 'search_result_cache', 'bump_catalog_version']
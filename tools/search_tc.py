@@ -2,7 +2,7 @@ import os
 import re
 from pinecone import Pinecone
 from sentence_transformers import SentenceTransformer
-from textblob import TextBlob  # pip install textblob
+from tools.spell_corrector import get_spell_corrector
 
 # ====== CONFIG ======
 PINECONE_API_KEY = os.getenv(
@@ -26,7 +26,7 @@ def clean_text(text):
 # ====== SPELL CORRECTOR ======
 def correct_spelling(text):
     """Correct simple typos in the query."""
-    return str(TextBlob(text).correct())
+    return get_spell_corrector().correct(text)
 
 # ====== SEARCH FUNCTION ======
 def search_terms(query, top_k=5):
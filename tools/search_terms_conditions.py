@@ -4,22 +4,32 @@ Provides accurate information about company policies, terms, and privacy guideli
 """
 
 import os
-import re
 import json
+import time
+import threading
 from typing import Dict, List, Any
 from langchain_core.tools import tool
 from pydantic import BaseModel, Field
+from tools.spell_corrector import get_spell_corrector
+from tools.policy_store import PolicyIndex, load_policy_index, policy_db_version, POLICY_DB_PATH
+from tools.policy_answer_cache import policy_answer_cache
+from tools.policy_text import clean_and_format_text, cached_clean
+from tools.policy_refinement import policy_refinements, chunk_version
 
 try:
     from pinecone import Pinecone
-    from sentence_transformers import SentenceTransformer
-    from textblob import TextBlob
+    from tools.embedding_service import get_embedding_service
     from langchain_google_genai import ChatGoogleGenerativeAI
     DEPENDENCIES_AVAILABLE = True
 except ImportError as e:
     print(f"⚠️ Missing dependencies for T&C search: {e}")
     DEPENDENCIES_AVAILABLE = False
 
+# "auto" (default: the local SQLite policy index when it exists, else Pinecone), "local" or "pinecone"
+POLICY_INDEX_BACKEND = os.getenv("POLICY_INDEX_BACKEND", "auto").lower()
+# How often a worker checks whether the policy database file was replaced by an ingest
+POLICY_INDEX_RELOAD_SECONDS = 10
+
 class TermsConditionsInput(BaseModel):
     """Input schema for Terms & Conditions search."""
     query: str = Field(
@@ -34,16 +44,69 @@ class TermsConditionsInput(BaseModel):
 class TermsConditionsSearchTool:
     """Tool for searching Lotus Electronics Terms & Conditions and Privacy Policy."""
     
-    def __init__(self, use_llm_refinement=False):
+    def __init__(self, use_llm_refinement=False, backend: str = POLICY_INDEX_BACKEND):
         self.is_available = DEPENDENCIES_AVAILABLE
-        self.index = None
+        self.backend = backend
+        self.index = None        # index used for searches (local policy index or Pinecone)
+        self.local_index = None
         self.model = None
         self.llm = None
         self.use_llm_refinement = use_llm_refinement
-        self._initialize_components()
+        self._initialized = False
+        self._init_lock = threading.Lock()
+        self._loaded_mtime = None
+        self._checked_at = 0.0
+    
+    def ensure_initialized(self) -> bool:
+        """Initialize components once per process, on first use or during warm-up."""
+        if not self._initialized:
+            with self._init_lock:
+                if not self._initialized:
+                    self._initialize_components()
+                    self._initialized = True
+        elif self.is_available:
+            self.reload_if_changed()
+        return self.is_available and self.index is not None
+    
+    def reload_if_changed(self, force: bool = False) -> bool:
+        """
+        Reopen the local policy index after an ingest replaced the database file.
+
+        The file's mtime is checked at most every POLICY_INDEX_RELOAD_SECONDS (or now with
+        force); the index is reloaded only when the stored corpus version differs.
+        Returns whether a new index was swapped in.
+        """
+        if self.backend == "pinecone":
+            return False
+        now = time.time()
+        if not force and now - self._checked_at < POLICY_INDEX_RELOAD_SECONDS:
+            return False
+        self._checked_at = now
+        try:
+            mtime = os.path.getmtime(POLICY_DB_PATH)
+        except OSError:
+            return False
+        if mtime == self._loaded_mtime:
+            return False
+        with self._init_lock:
+            if mtime == self._loaded_mtime:
+                return False
+            current = self.local_index.version if self.local_index is not None else None
+            if policy_db_version(POLICY_DB_PATH) == current:
+                self._loaded_mtime = mtime
+                return False
+            index = load_policy_index()
+            if index is None:
+                return False
+            # Searches already running keep the index object they started with
+            self.local_index = index
+            self.index = index
+            self._loaded_mtime = mtime
+            print(f"🔄 Policy index reloaded: version {current} -> {index.version}")
+            return True
     
     def _initialize_components(self):
-        """Initialize Pinecone, embedding model, and optionally LLM for content refinement."""
+        """Open the local policy index or Pinecone, the embedding model, and optionally the refinement LLM."""
         if not self.is_available:
             return
             
@@ -55,12 +118,25 @@ class TermsConditionsSearchTool:
             )
             self.index_name = "lotus-tc"
             
-            # Initialize embedding model
-            self.model = SentenceTransformer('all-MiniLM-L6-v2')
+            # Use the process-wide shared embedding model
+            self.model = get_embedding_service()
+            
+            if self.backend in ("local", "auto"):
+                self._checked_at = time.time()
+                if os.path.exists(POLICY_DB_PATH):
+                    self._loaded_mtime = os.path.getmtime(POLICY_DB_PATH)
+                self.local_index = load_policy_index()
+                if self.local_index is None:
+                    print(f"⚠️  No local policy index at {POLICY_DB_PATH}")
             
-            # Initialize Pinecone
-            pc = Pinecone(api_key=self.pinecone_api_key)
-            self.index = pc.Index(self.index_name)
+            if self.local_index is not None:
+                # Hybrid dense + FTS5 search in process: no network round trip
+                self.index = self.local_index
+            elif self.backend != "local":
+                # Initialize Pinecone
+                pc = Pinecone(api_key=self.pinecone_api_key)
+                self.index = pc.Index(self.index_name)
+                self.index.describe_index_stats()
             
             # Initialize LLM only if refinement is enabled
             if self.use_llm_refinement:
@@ -72,97 +148,22 @@ class TermsConditionsSearchTool:
                 )
                 print("✅ Terms & Conditions search tool initialized with LLM refinement")
             else:
-                print("✅ Terms & Conditions search tool initialized (fast mode)")
+                source = "local policy index" if self.index is self.local_index else "Pinecone"
+                print(f"✅ Terms & Conditions search tool initialized (fast mode, {source})")
             
         except Exception as e:
             print(f"❌ Failed to initialize T&C search tool: {e}")
             self.is_available = False
     
     def clean_and_format_text(self, text: str) -> str:
-        """Enhanced text cleaning and formatting for better readability."""
-        # Step 1: Basic cleaning
-        cleaned = re.sub(r'\s+', ' ', text).strip()
-        
-        # Step 2: Fix common OCR errors
-        fixes = {
-            'cust omer': 'customer',
-            'lotuselectr onics': 'Lotus Electronics',
-            'deliv ery': 'delivery',
-            'ser vices': 'services',
-            'transpor tation': 'transportation',
-            'Howe ver': 'However',
-            'effor t': 'effort',
-            'conv enience': 'convenience',
-            'befor e': 'before',
-            'receiv e': 'receive',
-            'tamper ed': 'tampered',
-            'char ges': 'charges',
-            'defectiv e': 'defective',
-            'contr ol': 'control',
-            'speci\ufb01cation': 'specification',
-            'entir e': 'entire',
-            'unlik ely': 'unlikely',
-            'Certiﬁcate': 'Certificate',
-            'wa y': 'way',
-            'v e': 've',
-            'Lotuselectr onics.com': 'Lotus Electronics',
-            'lotuselectr onics.com': 'Lotus Electronics'
-        }
-        
-        for old, new in fixes.items():
-            cleaned = cleaned.replace(old, new)
-        
-        # Step 3: Format into readable sentences
-        # Add proper sentence breaks
-        cleaned = re.sub(r'([.!?])\s*([A-Z])', r'\1\n\n\2', cleaned)
-        
-        # Fix spacing around punctuation
-        cleaned = re.sub(r'\s+([,.!?;:])', r'\1', cleaned)
-        cleaned = re.sub(r'([.!?])\s*', r'\1 ', cleaned)
-        
-        # Step 4: Structure content with bullet points where appropriate
-        # Look for policy points and format them
-        if 'return' in cleaned.lower() or 'refund' in cleaned.lower():
-            # Structure return/refund policies
-            cleaned = self._format_return_policy(cleaned)
-        elif 'warranty' in cleaned.lower():
-            cleaned = self._format_warranty_policy(cleaned)
-        elif 'privacy' in cleaned.lower() or 'data' in cleaned.lower():
-            cleaned = self._format_privacy_policy(cleaned)
-        
-        return cleaned.strip()
-    
-    def _format_return_policy(self, text: str) -> str:
-        """Format return policy text for better readability."""
-        # Extract key return policy points
-        formatted = text
-        
-        # Add structure for return timeframes
-        if '7 days' in text:
-            formatted = formatted.replace('within 7 days', '\n• Within 7 days')
-        
-        # Highlight key conditions
-        if 'unopened item' in text:
-            formatted = formatted.replace('unopened item', '\n• Unopened items only')
-        
-        if 'original packaging' in text:
-            formatted = formatted.replace('original packaging', '\n• In original packaging')
-        
-        return formatted
-    
-    def _format_warranty_policy(self, text: str) -> str:
-        """Format warranty policy text for better readability."""
-        return text  # Basic formatting for now
-    
-    def _format_privacy_policy(self, text: str) -> str:
-        """Format privacy policy text for better readability."""
-        return text  # Basic formatting for now
+        """Readable policy text; the local index stores this per chunk at ingest."""
+        return clean_and_format_text(text)
     
     def correct_spelling(self, text: str) -> str:
-        """Correct simple typos in the query."""
+        """Correct simple typos in the query against the policy and catalog vocabulary (microseconds)."""
         try:
-            return str(TextBlob(text).correct())
-        except:
+            return get_spell_corrector().correct(text)
+        except Exception:
             return text  # Return original if correction fails
     
     def refine_policy_content(self, raw_content: str, user_query: str) -> str:
@@ -225,7 +226,7 @@ Provide only the refined policy text, no additional commentary:
         Returns:
             Dictionary containing relevant policy sections
         """
-        if not self.is_available or not self.index or not self.model:
+        if not self.ensure_initialized() or not self.model:
             return {
                 "success": False,
                 "error": "Terms & Conditions search service is currently unavailable",
@@ -238,20 +239,63 @@ Provide only the refined policy text, no additional commentary:
             if max_results <= 2:  # Only show debug info for test runs
                 print(f"🔍 Searching for: '{corrected_query}'")
             
-            # Embed the query
-            query_embedding = self.model.encode(corrected_query).tolist()
+            # Common intents (return window, refund, warranty, ...) are served from stored answers
+            cached = policy_answer_cache.lookup(corrected_query, max_results, self._search_index,
+                                                self.model.encode_query, self.corpus_version())
+            if cached is not None:
+                return cached
+            
+            return self._search_index(corrected_query, max_results)
+            
+        except Exception as e:
+            print(f"❌ Error searching T&C: {e}")
+            return {
+                "success": False,
+                "error": f"Search failed: {str(e)}",
+                "policy_sections": []
+            }
+    
+    def rebuild_answer_cache(self) -> Dict[str, Any]:
+        """Re-search and store the canonical answer of every policy intent (after the documents change)."""
+        if not self.ensure_initialized() or not self.model:
+            return {"success": False, "error": "Terms & Conditions search service is currently unavailable"}
+        # Answers must come from the corpus on disk, not one this worker has yet to reload
+        self.reload_if_changed(force=True)
+        return {"success": True, **policy_answer_cache.rebuild(self._search_index, self.corpus_version())}
+    
+    def corpus_version(self) -> str:
+        """Version of the policy corpus this worker searches, which stored answers are keyed by."""
+        index = self.index
+        if isinstance(index, PolicyIndex):
+            return f"local-{index.version}"
+        return "pinecone"
+    
+    def _search_index(self, corrected_query: str, max_results: int = 3) -> Dict[str, Any]:
+        """Full search of the policy index for an already spell-corrected query."""
+        try:
+            # Embed the query (repeat queries are served from the shared embedding cache)
+            query_embedding = self.model.encode_query(corrected_query)
             if max_results <= 2:  # Only show debug info for test runs
                 print(f"📊 Query embedding dimension: {len(query_embedding)}")
             
-            # Query Pinecone - match the working search_tc.py exactly
-            results = self.index.query(
-                vector=query_embedding,
-                top_k=min(max_results, 5),
-                include_metadata=True
-            )
+            # Query the local hybrid index (also given the query text for BM25) or Pinecone
+            index = self.index
+            if isinstance(index, PolicyIndex):
+                results = index.query(
+                    vector=query_embedding,
+                    top_k=min(max_results, 5),
+                    include_metadata=True,
+                    text=corrected_query
+                )
+            else:
+                results = index.query(
+                    vector=query_embedding,
+                    top_k=min(max_results, 5),
+                    include_metadata=True
+                )
             
             if max_results <= 2:  # Only show debug info for test runs
-                print(f"🔍 Raw Pinecone results: {len(results.get('matches', []))} matches found")
+                print(f"🔍 Raw index results: {len(results.get('matches', []))} matches found")
             
             # Process results - include ALL matches like the working version
             policy_sections = []
@@ -265,14 +309,15 @@ Provide only the refined policy text, no additional commentary:
                 
                 # Include all results with text, no score filtering like search_tc.py
                 if text:
-                    # Apply enhanced text cleaning and formatting
-                    cleaned_content = self.clean_and_format_text(text)
-                    
-                    # Use LLM refinement only if enabled and for high-relevance results
-                    if self.use_llm_refinement and score >= 0.4:
-                        refined_content = self.refine_policy_content(cleaned_content, corrected_query)
-                    else:
-                        refined_content = cleaned_content
+                    # Refined offline by tools.policy_refinement; cleaned text while that is pending
+                    refined_content = policy_refinements.get(match.get('id'), chunk_version(metadata))
+                    if refined_content is None:
+                        # Cleaned at ingest for the local index; Pinecone chunks are cleaned once per process
+                        refined_content = metadata.get('cleaned') or cached_clean(text)
+                        
+                        # Synchronous LLM refinement only if enabled and for high-relevance results
+                        if self.use_llm_refinement and score >= 0.4:
+                            refined_content = self.refine_policy_content(refined_content, corrected_query)
                     
                     policy_sections.append({
                         "relevance_score": round(score, 4),
@@ -296,7 +341,8 @@ Provide only the refined policy text, no additional commentary:
                 "policy_sections": []
             }
 
-# Initialize the tool instance in fast mode (no LLM refinement for speed)
+# Initialize the tool instance in fast mode (no per-request LLM refinement; stored refinements are
+# still served); components load lazily
 tc_search_tool = TermsConditionsSearchTool(use_llm_refinement=False)
 
 @tool("search_terms_conditions", args_schema=TermsConditionsInput)
@@ -0,0 +1,367 @@
+"""
+Domain Spell Corrector
+SymSpell-style correction for policy queries. Every vocabulary word is indexed under
+all of its deletes (up to MAX_EDIT_DISTANCE characters removed from its prefix), so a
+misspelled word is corrected by generating its own deletes and looking them up: a few
+dozen dict lookups and short edit-distance checks instead of scoring the whole
+dictionary. Known words return after a single lookup.
+
+Correction is deliberately conservative, since a wrong "correction" ("my order is lost"
+-> "last", "tata sky" -> "data okay") is worse than a typo the embedding search tolerates:
+
+- Only words of MIN_CORRECTED_LENGTH+ letters that no vocabulary knows are corrected,
+  and only at edit distance 1.
+- Targets are words of the policy documents (data/policy_vocab.json, written by the
+  "build" command below) seen at least MIN_CORRECTION_COUNT times, plus the built-in
+  policy terms and the brand and category lexicons.
+- Every corpus word, the built-in question words and, when present, a general English
+  word list (data/english_words.txt) are known words and stay as typed.
+- Without a policy vocabulary file the words are counted from the local policy index,
+  or from the product snapshot without one; with none of them nothing is corrected.
+
+The corrector is built once per process (in the gunicorn master with --preload, otherwise
+during warm-up).
+
+Usage:
+    python -m tools.spell_corrector build [--input terms.txt privacy.txt] [--output data/policy_vocab.json]
+    (without --input the words come from the local policy index, or the lotus-tc index without one)
+    python -m tools.spell_corrector check "retrun polcy for samsng phone"
+"""
+
+import os
+import re
+import json
+import time
+import argparse
+import threading
+from typing import Optional, Dict, List, Iterable
+
+from tools.brand_lexicon import BRAND_ALIASES
+from tools.catalog_categories import CATEGORY_KEYWORDS
+
+POLICY_VOCAB_PATH = os.getenv("POLICY_VOCAB_PATH", "data/policy_vocab.json")
+# One word per line, optionally followed by a count (SymSpell frequency dictionary format)
+ENGLISH_WORDS_PATH = os.getenv("ENGLISH_WORDS_PATH", "data/english_words.txt")
+MAX_EDIT_DISTANCE = 1
+PREFIX_LENGTH = 7
+MIN_WORD_LENGTH = 3  # shortest word counted into the vocabulary
+MIN_CORRECTED_LENGTH = 5  # shorter words ("lost", "boat", "tata") are as often real words or brands as typos
+MIN_CORRECTION_COUNT = int(os.getenv("SPELL_MIN_CORRECTION_COUNT", "3"))
+LOOKUP_CACHE_SIZE = 50000
+
+# Policy terms users ask about, correction targets even when the corpus is thin
+POLICY_TERMS = """
+return returns returned returning refund refunds refunded replacement replace replaced exchange exchanged
+warranty warranties guarantee guaranteed extended repair repairs service services servicing serviceable
+delivery deliveries delivered deliver shipping shipment shipped dispatch courier installation install installed
+demo demonstration cancellation cancel cancelled cancellation order orders ordered purchase purchased invoice
+bill receipt payment payments paid pay emi cashback discount offer offers coupon voucher gift card cards credit
+debit upi wallet bank transfer cod cash policy policies terms conditions condition privacy personal data
+information security secure cookies consent share sharing third party parties account accounts password
+customer customers support care complaint complaints contact email phone number address store stores
+showroom online website app charges charge fee fees free cost costs price prices damaged damage defective
+defect faulty broken missing wrong tampered packaging package packed unopened original seal sealed box
+accessories manual product products item items days day week weeks month months year years period time
+eligible eligibility applicable valid validity claim claims proof manufacturer brand brands authorized
+centre center technician inspection verification approval approved rejected pickup pick collect collection
+location pincode area city transit liability responsible responsibility jurisdiction dispute law legal
+""".split()
+
+# Common question words, so everyday English in a query stays as typed
+QUERY_WORDS = """
+what when where which who whom whose why how can could would should will shall may might must does did done
+have has had having the and but for nor not yet with without within about above below after before during
+into onto from upon over under again further then once here there all any both each few more most other some
+such only own same than too very just also because while until unless since though although whether this that
+these those you your yours our ours they them their his her its get got give given take taken make made know
+want need needs like buy bought sell sold send sent tell told show shown find found keep kept check checked
+long many much well still back next last first second third please thanks thank hello okay yes sure hours
+open close closed today tomorrow available happen happens happened someone anyone something anything
+""".split()
+
+_WORD_RE = re.compile(r"\b[A-Za-z]+\b")
+
+
+def lexicon_words() -> List[str]:
+    """Single words from the brand aliases and category keywords."""
+    words = []
+    for _brand, aliases in BRAND_ALIASES:
+        for alias in aliases:
+            words.extend(alias.split())
+    for _category, keywords in CATEGORY_KEYWORDS:
+        for keyword in keywords:
+            words.extend(keyword.split())
+            words.append(keyword.split()[-1] + "s")  # queries use plurals ("tvs", "fridges")
+    return words
+
+
+def damerau_levenshtein(a: str, b: str, max_distance: int) -> int:
+    """Optimal string alignment distance, or max_distance + 1 once it is exceeded."""
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    # Only the differing middle needs the quadratic table ("refrigerat|e|r" vs "refrigerat|o|r")
+    start = 0
+    while start < len(a) and start < len(b) and a[start] == b[start]:
+        start += 1
+    end = 0
+    while end < len(a) - start and end < len(b) - start and a[-1 - end] == b[-1 - end]:
+        end += 1
+    if start:
+        start -= 1  # keep one shared character so a transposition at the edge is still seen
+    a, b = a[start:len(a) - end], b[start:len(b) - end]
+    if not a or not b:
+        return min(len(a) or len(b), max_distance + 1)
+    # Banded table: cells further than max_distance from the diagonal can only exceed it
+    too_far = max_distance + 1
+    len_b = len(b)
+    previous_previous = None
+    previous = list(range(len_b + 1))
+    for i in range(1, len(a) + 1):
+        current = [too_far] * (len_b + 1)
+        current[0] = i
+        row_min = i
+        char_a = a[i - 1]
+        for j in range(max(1, i - max_distance), min(len_b, i + max_distance) + 1):
+            value = previous[j - 1] if char_a == b[j - 1] else previous[j - 1] + 1
+            if previous[j] + 1 < value:
+                value = previous[j] + 1
+            if current[j - 1] + 1 < value:
+                value = current[j - 1] + 1
+            if (previous_previous is not None and j > 1 and char_a == b[j - 2] and a[i - 2] == b[j - 1]
+                    and previous_previous[j - 2] + 1 < value):
+                value = previous_previous[j - 2] + 1
+            current[j] = value
+            if value < row_min:
+                row_min = value
+        if row_min > max_distance:
+            return too_far
+        previous_previous, previous = previous, current
+    return min(previous[-1], max_distance + 1)
+
+
+def _deletes(word: str, max_distance: int) -> set:
+    """All strings reachable from word by removing up to max_distance characters."""
+    results = {word}
+    frontier = {word}
+    for _ in range(max_distance):
+        next_frontier = set()
+        for candidate in frontier:
+            if len(candidate) <= 1:
+                continue
+            for i in range(len(candidate)):
+                next_frontier.add(candidate[:i] + candidate[i + 1:])
+        next_frontier -= results
+        results |= next_frontier
+        frontier = next_frontier
+    return results
+
+
+class SpellCorrector:
+    """Precomputed deletion index over a word -> frequency vocabulary of correction targets."""
+
+    def __init__(self, word_counts: Dict[str, int], known_words: Iterable[str] = (),
+                 max_edit_distance: int = MAX_EDIT_DISTANCE, prefix_length: int = PREFIX_LENGTH):
+        self.word_counts = {word.lower(): count for word, count in word_counts.items() if word}
+        # Words that are never corrected, on top of the targets themselves
+        self.known_words = {word.lower() for word in known_words if word} | set(self.word_counts)
+        self.max_edit_distance = max_edit_distance
+        self.prefix_length = prefix_length
+        self.deletes: Dict[str, List[str]] = {}
+        self._cache: Dict[str, Optional[str]] = {}
+        for word in self.word_counts:
+            for key in _deletes(word[:prefix_length], max_edit_distance):
+                self.deletes.setdefault(key, []).append(word)
+
+    def lookup(self, word: str) -> Optional[str]:
+        """Best vocabulary word for a lowercase word: the word itself, a correction, or None."""
+        if word in self.known_words:
+            return word
+        if word in self._cache:
+            return self._cache[word]
+        best = self._search(word)
+        if len(self._cache) >= LOOKUP_CACHE_SIZE:
+            self._cache.clear()
+        self._cache[word] = best
+        return best
+
+    def _search(self, word: str) -> Optional[str]:
+        max_distance = self.max_edit_distance
+        best, best_distance, best_count = None, max_distance + 1, 0
+        checked = set()
+        for key in _deletes(word[:self.prefix_length], max_distance):
+            for candidate in self.deletes.get(key, ()):
+                if candidate in checked:
+                    continue
+                checked.add(candidate)
+                distance = damerau_levenshtein(word, candidate, max_distance)
+                count = self.word_counts[candidate]
+                if distance < best_distance or (distance == best_distance and count > best_count):
+                    best, best_distance, best_count = candidate, distance, count
+        return best
+
+    def correct_word(self, word: str) -> str:
+        if len(word) < MIN_CORRECTED_LENGTH or not self.word_counts:
+            return word
+        suggestion = self.lookup(word.lower())
+        if suggestion is None or suggestion == word.lower():
+            return word
+        if word.isupper():
+            return suggestion.upper()
+        if word[0].isupper():
+            return suggestion.capitalize()
+        return suggestion
+
+    def correct(self, text: str) -> str:
+        """Correct every alphabetic word; numbers and model codes ("a54", "5g") are untouched."""
+        return _WORD_RE.sub(lambda m: self.correct_word(m.group(0)), text or "")
+
+    def stats(self) -> Dict[str, int]:
+        return {"words": len(self.word_counts), "known_words": len(self.known_words), "delete_keys": len(self.deletes)}
+
+
+def count_words(texts: Iterable[str]) -> Dict[str, int]:
+    counts: Dict[str, int] = {}
+    for text in texts:
+        for word in _WORD_RE.findall(text or ""):
+            word = word.lower()
+            if len(word) >= MIN_WORD_LENGTH:
+                counts[word] = counts.get(word, 0) + 1
+    return counts
+
+
+def build_vocabulary(corpus_counts: Optional[Dict[str, int]] = None) -> Dict[str, int]:
+    """
+    Correction targets: corpus words seen at least MIN_CORRECTION_COUNT times plus the
+    built-in policy terms and lexicon words. Empty without a corpus.
+    """
+    if not corpus_counts:
+        return {}
+    counts = {word: count for word, count in corpus_counts.items() if count >= MIN_CORRECTION_COUNT}
+    for word in POLICY_TERMS + lexicon_words():
+        word = word.lower()
+        if len(word) >= MIN_WORD_LENGTH and word.isalpha():
+            counts[word] = max(counts.get(word, 0), 1)
+    return counts
+
+
+def build_corrector(corpus_counts: Optional[Dict[str, int]] = None, english_words: Iterable[str] = ()) -> SpellCorrector:
+    """A corrector over the policy corpus; every corpus, question and English word is kept as typed."""
+    known = list(corpus_counts or ()) + QUERY_WORDS + list(english_words)
+    return SpellCorrector(build_vocabulary(corpus_counts), known_words=known)
+
+
+def load_policy_vocabulary(path: str = POLICY_VOCAB_PATH) -> Dict[str, int]:
+    """Word counts from the vocabulary file, else counted from the local policy index or the catalog."""
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    for source, load_texts in (("local policy index", policy_texts_from_local_index),
+                               ("product snapshot", catalog_texts_from_snapshot)):
+        texts = load_texts()
+        if texts:
+            print(f"ℹ️  No policy vocabulary at {path}; counting words from the {source}")
+            return count_words(texts)
+    print(f"⚠️  No policy vocabulary at {path} and no local index to count; spell correction is off")
+    return {}
+
+
+def load_english_words(path: str = ENGLISH_WORDS_PATH) -> List[str]:
+    """Words of a general English word or frequency list, or [] without one."""
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return [line.split()[0].lower() for line in f if line.strip()]
+
+
+_spell_corrector = None
+_spell_corrector_lock = threading.Lock()
+
+
+def get_spell_corrector() -> SpellCorrector:
+    """Return the process-wide corrector, building its deletion index on first use."""
+    global _spell_corrector
+    if _spell_corrector is None:
+        with _spell_corrector_lock:
+            if _spell_corrector is None:
+                start = time.perf_counter()
+                corrector = build_corrector(load_policy_vocabulary(), load_english_words())
+                stats = corrector.stats()
+                print(f"✅ Spell corrector ready: {stats['words']} targets, {stats['known_words']} known words, "
+                      f"{stats['delete_keys']} delete keys "
+                      f"in {time.perf_counter() - start:.2f}s")
+                _spell_corrector = corrector
+    return _spell_corrector
+
+
+def policy_texts_from_pinecone(index_name: str = "lotus-tc") -> List[str]:
+    """Every chunk's text from the policy index."""
+    from pinecone import Pinecone
+
+    pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
+    index = pc.Index(index_name)
+    texts = []
+    for ids in index.list():
+        response = index.fetch(ids=list(ids))
+        for record in response.vectors.values():
+            texts.append((record.metadata or {}).get("text", ""))
+    return texts
+
+
+def policy_texts_from_local_index() -> Optional[List[str]]:
+    """Every chunk's text from the local policy index, or None if it has not been ingested."""
+    from tools.policy_store import load_policy_index
+
+    index = load_policy_index()
+    return [metadata["text"] for metadata in index.metadatas] if index is not None else None
+
+
+def catalog_texts_from_snapshot() -> Optional[List[str]]:
+    """Product names and descriptions from the local product snapshot, or None without one."""
+    from tools.local_vector_index import LOCAL_INDEX_DIR
+
+    path = os.path.join(LOCAL_INDEX_DIR, "metadata.json")
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        metadatas = [row.get("metadata") or {} for row in json.load(f)]
+    return [f"{metadata.get('product_name', '')} {metadata.get('text', '')}" for metadata in metadatas]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or try the policy spell corrector")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="Count the policy documents' words into the vocabulary file")
+    build.add_argument("--input", nargs="*", help="Plain-text policy documents (default: the policy index)")
+    build.add_argument("--output", default=POLICY_VOCAB_PATH)
+    check = sub.add_parser("check", help="Correct a query and time it")
+    check.add_argument("query")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        if args.input:
+            texts = []
+            for path in args.input:
+                with open(path, encoding="utf-8") as f:
+                    texts.append(f.read())
+        else:
+            texts = policy_texts_from_local_index()
+            if texts is None:
+                texts = policy_texts_from_pinecone()
+        counts = count_words(texts)
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(counts, f, ensure_ascii=False, sort_keys=True)
+        print(f"✅ Wrote {len(counts)} words from {len(texts)} texts to {args.output}")
+    else:
+        corrector = get_spell_corrector()
+        start = time.perf_counter()
+        corrected = corrector.correct(args.query)
+        print(f"{corrected!r} in {(time.perf_counter() - start) * 1e6:.0f} µs")
+
+
+__all__ = ['SpellCorrector', 'get_spell_corrector', 'build_vocabulary', 'build_corrector', 'load_policy_vocabulary',
+           'load_english_words', 'count_words']
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Native worker pools for CPU-bound work
+Under the gevent worker class every greenlet shares one OS thread, so pure CPU work
+(model.encode, response post-processing) stalls every other connection on the worker.
+These pools run that work on real OS threads and let the calling greenlet wait
+cooperatively.
+"""
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Pool sizes can be tuned per deployment, e.g. CPU_POOL_EMBEDDING=2
+DEFAULT_POOL_SIZES = {
+    "embedding": int(os.getenv("CPU_POOL_EMBEDDING", "1")),
+    "postprocess": int(os.getenv("CPU_POOL_POSTPROCESS", "2")),
+}
+
+
+def _gevent_active():
+    """True when gevent has monkey-patched threading (gunicorn --worker-class gevent)."""
+    try:
+        from gevent import monkey
+        return monkey.is_module_patched("threading")
+    except ImportError:
+        return False
+
+
+class WorkerPool:
+    """Named pool of OS threads with queue-depth and timing metrics."""
+
+    def __init__(self, name, size):
+        self.name = name
+        self.size = max(1, size)
+        self.submitted = 0
+        self.started = 0
+        self.completed = 0
+        self.failed = 0
+        self.max_queue_depth = 0
+        self.total_wait = 0.0
+        self.total_run = 0.0
+        self._executor = None
+        self._executor_pid = None
+        self._uses_gevent = False
+
+    def _get_executor(self):
+        """Create the executor lazily, and again after gunicorn forks a worker."""
+        if self._executor is None or self._executor_pid != os.getpid():
+            self._uses_gevent = _gevent_active()
+            if self._uses_gevent:
+                # gevent's threadpool runs on real OS threads even when threading is patched
+                from gevent.threadpool import ThreadPool
+                self._executor = ThreadPool(self.size)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.size, thread_name_prefix=f"pool-{self.name}")
+            self._executor_pid = os.getpid()
+        return self._executor
+
+    @property
+    def queue_depth(self):
+        """Tasks submitted but not yet picked up by a thread."""
+        return self.submitted - self.started
+
+    def run(self, fn, *args, **kwargs):
+        """Run fn(*args, **kwargs) on the pool and wait for its result."""
+        executor = self._get_executor()
+        queued_at = time.perf_counter()
+
+        def task():
+            started_at = time.perf_counter()
+            self.started += 1
+            self.total_wait += started_at - queued_at
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.total_run += time.perf_counter() - started_at
+
+        self.submitted += 1
+        self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+        try:
+            if self._uses_gevent:
+                result = executor.spawn(task).get()
+            else:
+                result = executor.submit(task).result()
+            self.completed += 1
+            return result
+        except Exception:
+            self.failed += 1
+            raise
+
+    def stats(self):
+        finished = self.completed + self.failed
+        return {
+            "size": self.size,
+            "native_threads": True,
+            "gevent_threadpool": self._uses_gevent,
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "avg_wait_ms": round(self.total_wait * 1000 / self.started, 2) if self.started else 0.0,
+            "avg_run_ms": round(self.total_run * 1000 / finished, 2) if finished else 0.0,
+        }
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(name):
+    """Return the named pool, creating it on first use."""
+    pool = _pools.get(name)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(name)
+            if pool is None:
+                pool = WorkerPool(name, DEFAULT_POOL_SIZES.get(name, 1))
+                _pools[name] = pool
+    return pool
+
+
+def run_in_pool(name, fn, *args, **kwargs):
+    """Run CPU-bound fn on the named native pool so the gevent hub stays responsive."""
+    return get_pool(name).run(fn, *args, **kwargs)
+
+
+def pool_stats():
+    """Metrics for every pool created in this process."""
+    return {name: pool.stats() for name, pool in _pools.items()}